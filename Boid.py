@@ -1,29 +1,93 @@
 import tkinter as tk
 import random
-from itertools import cycle
 import math
+import sys
+from spatial_hash import SpatialHash
+from flock import FlockEngine
+from game_loop import GameLoop
+from assets import ASSETS
+from render import SpriteRenderer
+from ai_scheduler import AIScheduler
+from sprites import SPRITES
+from entity_store import DIRECTION_NAMES, DIRECTION_CODES
+from profiler import PROFILER
 
 
 class Ghost:
+    # No per-instance dict, the position, velocity, direction and frame are in the flock arrays
+    __slots__ = ("canvas", "scheduler", "flock", "flock_index", "all_ghosts", "frame_interval", "animation_running",
+                 "max_speed", "perception_radius", "neighbor_index", "animations", "current_image", "renderer", "rng", "ai")
+
     def __init__(self, canvas, x, y, animation_frames, all_ghosts, frame_interval=100, max_speed=10,
-                 perception_radius=100):
+                 perception_radius=100, neighbor_index=None, flock=None, scheduler=None, renderer=None, rng=None, ai=None, animations=None):
         self.canvas = canvas
-        self.x = x
-        self.y = y
+        self.scheduler = scheduler if scheduler is not None else canvas  # GameLoop running the delayed actions
+        # Shared renderer flushed once per frame, or a renderer of this ghost sending its changes at once
+        self.renderer = renderer if renderer is not None else SpriteRenderer(canvas, batched=False)
+        self.rng = rng if rng is not None else random  # Seeded random.Random to replay the same moves
+        self.ai = ai  # Shared AIScheduler running the new targets within its budget, None to run them at once
+        # The position and the velocity live in the arrays of the flock engine, the ghost is a view on them
+        self.flock = flock if flock is not None else FlockEngine(max_speed, perception_radius)
+        self.flock_index = self.flock.add(x, y)
         self.all_ghosts = all_ghosts  # Keep track of all ghosts for collision detection
         self.frame_interval = frame_interval
         self.animation_running = False  # Flag to prevent multiple timers
         self.max_speed = max_speed  # Maximum speed of the ghost
         self.perception_radius = perception_radius  # Radius within which other ghosts are "perceived"
+        self.neighbor_index = neighbor_index  # Shared SpatialHash of the ghosts, None to scan all_ghosts
 
-        # Load images and store iterators for animations
-        self.animations = {
-            direction: cycle([tk.PhotoImage(file=frame) for frame in frames])
-            for direction, frames in animation_frames.items()
-        }
-        self.current_image = self.canvas.create_image(x, y, image=next(self.animations["down"]), anchor=tk.CENTER)
+        # Load images of the animations, the images are shared by all the ghosts
+        # animations gives images already made, for example the tinted variants of sprites.SPRITES
+        self.animations = animations if animations is not None else ASSETS.load_animations(animation_frames)
+        self.current_image = self.renderer.create(x, y, self.animations["down"][0], anchor=tk.CENTER)
         self.current_animation = "down"
-        self.velocity = [0, 0]  # Initial velocity of the ghost
+        if self.neighbor_index is not None:
+            self.neighbor_index.insert(self)
+
+    @property
+    def x(self):
+        return float(self.flock.x[self.flock_index])
+
+    @x.setter
+    def x(self, value):
+        self.flock.x[self.flock_index] = value
+
+    @property
+    def y(self):
+        return float(self.flock.y[self.flock_index])
+
+    @y.setter
+    def y(self, value):
+        self.flock.y[self.flock_index] = value
+
+    @property
+    def velocity(self):
+        """Copy of the velocity, assign a new [x, y] to change it."""
+        return [float(self.flock.velocity_x[self.flock_index]), float(self.flock.velocity_y[self.flock_index])]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.flock.velocity_x[self.flock_index], self.flock.velocity_y[self.flock_index] = value
+
+    @property
+    def current_animation(self):
+        return DIRECTION_NAMES[self.flock.direction[self.flock_index]]
+
+    @current_animation.setter
+    def current_animation(self, value):
+        self.flock.direction[self.flock_index] = DIRECTION_CODES[value]
+
+    def sync(self, alpha=1.0):
+        """Push the position computed by FlockEngine.step to the canvas, interpolated between the last two steps."""
+        flock, index = self.flock, self.flock_index
+        x = flock.previous_x[index] + (flock.x[index] - flock.previous_x[index]) * alpha
+        y = flock.previous_y[index] + (flock.y[index] - flock.previous_y[index]) * alpha
+        self.renderer.set(self.current_image, x, y)
+        if self.neighbor_index is not None:
+            self.neighbor_index.update(self)
+
+        if not self.animation_running:
+            self.animate()
 
     def move(self, dx, dy, direction):
         """Move the ghost and play the animation in the given direction."""
@@ -39,19 +103,23 @@ class Ghost:
         # Move the ghost
         self.x = new_x
         self.y = new_y
-        self.canvas.move(self.current_image, dx, dy)
+        if self.neighbor_index is not None:
+            self.neighbor_index.update(self)  # Keep the shared index in sync with the new position
+        self.renderer.set(self.current_image, self.x, self.y)
 
         if not self.animation_running:
             self.animate()
 
     def animate(self):
         """Update the animation frame."""
-        frame = next(self.animations[self.current_animation])
-        self.canvas.itemconfig(self.current_image, image=frame)
+        frames = self.animations[self.current_animation]
+        frame = (int(self.flock.frame[self.flock_index]) + 1) % len(frames)
+        self.flock.frame[self.flock_index] = frame
+        self.renderer.set(self.current_image, image=frames[frame])
 
         # Set a timer to call animate again after the interval
         self.animation_running = True
-        self.canvas.after(self.frame_interval, self.update_animation)
+        self.scheduler.after(self.frame_interval, self.update_animation)
 
     def update_animation(self):
         """Continue animation by calling animate."""
@@ -60,32 +128,42 @@ class Ghost:
 
     def update_velocity(self):
         """Update the ghost's velocity based on Boid behaviors."""
-        alignment = self.align()
-        cohesion = self.cohesion()
-        separation = self.separate()
+        neighbors = self.neighbors(self.perception_radius)  # One search shared by the three behaviors
+        alignment = self.align(neighbors)
+        cohesion = self.cohesion(neighbors)
+        separation = self.separate(neighbors)
 
         # Apply the behaviors to velocity
-        self.velocity[0] += alignment[0] + cohesion[0] + separation[0]
-        self.velocity[1] += alignment[1] + cohesion[1] + separation[1]
+        velocity = self.velocity
+        velocity[0] += alignment[0] + cohesion[0] + separation[0]
+        velocity[1] += alignment[1] + cohesion[1] + separation[1]
 
         # Limit velocity to max speed
-        speed = math.sqrt(self.velocity[0] ** 2 + self.velocity[1] ** 2)
+        speed = math.sqrt(velocity[0] ** 2 + velocity[1] ** 2)
         if speed > self.max_speed:
-            self.velocity[0] = (self.velocity[0] / speed) * self.max_speed
-            self.velocity[1] = (self.velocity[1] / speed) * self.max_speed
+            velocity[0] = (velocity[0] / speed) * self.max_speed
+            velocity[1] = (velocity[1] / speed) * self.max_speed
+        self.velocity = velocity
 
         # Move the ghost
-        self.move(self.velocity[0], self.velocity[1], "down" if self.velocity[1] > 0 else "up")
+        self.move(velocity[0], velocity[1], "down" if velocity[1] > 0 else "up")
+
+    def neighbors(self, radius):
+        """Return the other ghosts closer than radius, using the shared index when there is one."""
+        if self.neighbor_index is None:
+            return [ghost for ghost in self.all_ghosts if ghost != self and self.distance(ghost) < radius]
+        return [ghost for ghost in self.neighbor_index.query(self.x, self.y, radius) if ghost is not self]
 
-    def align(self):
+    def align(self, neighbors=None):
         """Align with the average direction of nearby ghosts."""
+        if neighbors is None:
+            neighbors = self.neighbors(self.perception_radius)
         steering = [0, 0]
         count = 0
-        for ghost in self.all_ghosts:
-            if ghost != self and self.distance(ghost) < self.perception_radius:
-                steering[0] += ghost.velocity[0]
-                steering[1] += ghost.velocity[1]
-                count += 1
+        for ghost in neighbors:
+            steering[0] += ghost.velocity[0]
+            steering[1] += ghost.velocity[1]
+            count += 1
 
         if count > 0:
             steering[0] /= count
@@ -99,15 +177,16 @@ class Ghost:
 
         return steering
 
-    def cohesion(self):
+    def cohesion(self, neighbors=None):
         """Move towards the average position of nearby ghosts."""
+        if neighbors is None:
+            neighbors = self.neighbors(self.perception_radius)
         center_of_mass = [0, 0]
         count = 0
-        for ghost in self.all_ghosts:
-            if ghost != self and self.distance(ghost) < self.perception_radius:
-                center_of_mass[0] += ghost.x
-                center_of_mass[1] += ghost.y
-                count += 1
+        for ghost in neighbors:
+            center_of_mass[0] += ghost.x
+            center_of_mass[1] += ghost.y
+            count += 1
 
         if count > 0:
             center_of_mass[0] /= count
@@ -118,14 +197,16 @@ class Ghost:
             return steering
         return [0, 0]
 
-    def separate(self):
+    def separate(self, neighbors=None):
         """Avoid crowding or colliding with nearby ghosts."""
+        if neighbors is None:
+            neighbors = self.neighbors(self.perception_radius)
         steering = [0, 0]
         count = 0
-        for ghost in self.all_ghosts:
-            if ghost != self and self.distance(ghost) < self.perception_radius / 2:
+        for ghost in neighbors:
+            distance = self.distance(ghost)
+            if distance < self.perception_radius / 2:
                 diff = [self.x - ghost.x, self.y - ghost.y]
-                distance = self.distance(ghost)
                 if distance > 0:
                     diff[0] /= distance
                     diff[1] /= distance
@@ -146,19 +227,29 @@ class Ghost:
 
     def check_collision(self, target_x, target_y):
         """Check if a position is already occupied by another ghost."""
+        if self.neighbor_index is not None:
+            return any(ghost is not self
+                       for ghost in self.neighbor_index.query(target_x, target_y, self.flock.collision_distance))
+        limit = self.flock.collision_distance ** 2  # Squared distances, no square root per ghost
         for ghost in self.all_ghosts:
-            if ghost != self:  # Don't check collision with itself
-                ghost_x, ghost_y = ghost.x, ghost.y
-                distance = ((target_x - ghost_x) ** 2 + (target_y - ghost_y) ** 2) ** 0.5
-                if distance < 50:  # Adjust the threshold for collision detection
+            if ghost is not self:  # Don't check collision with itself
+                dx, dy = target_x - ghost.x, target_y - ghost.y
+                if dx * dx + dy * dy < limit:  # Threshold shared with the flock engine
                     return True  # Collision detected
         return False
 
+    def retarget(self):
+        """Choose a new random target, when the AI scheduler has time for it."""
+        if self.ai is not None:
+            self.ai.request(self, self.move_to_next_random)
+        else:
+            self.move_to_next_random()
+
     def move_to_next_random(self):
         """Move the ghost to a random position, checking for collisions before moving."""
         while True:
-            target_x = random.randint(10, self.canvas.winfo_width() - 10)
-            target_y = random.randint(30, self.canvas.winfo_height() - 10)
+            target_x = self.rng.randint(10, self.canvas.winfo_width() - 10)
+            target_y = self.rng.randint(30, self.canvas.winfo_height() - 10)
 
             # Check for collision with other ghosts
             if not self.check_collision(target_x, target_y):
@@ -209,35 +300,39 @@ class Ghost:
         """Move right step by step until the x-coordinate is reached."""
         if steps > 0:
             self.move(10, 0, "right")
-            self.canvas.after(self.frame_interval, self._move_right, steps - 1, target_y)
+            self.scheduler.after(self.frame_interval, self._move_right, steps - 1, target_y)
         else:
             # Once horizontal movement is done, move vertically to target_y
-            self.canvas.after(500, self._move_vertically, target_y - self.y)
+            self.scheduler.after(500, self._move_vertically, target_y - self.y)
 
     def _move_left(self, steps, target_y):
         """Move left step by step until the x-coordinate is reached."""
         if steps > 0:
             self.move(-10, 0, "left")
-            self.canvas.after(self.frame_interval, self._move_left, steps - 1, target_y)
+            self.scheduler.after(self.frame_interval, self._move_left, steps - 1, target_y)
         else:
             # Once horizontal movement is done, move vertically to target_y
-            self.canvas.after(500, self._move_vertically, target_y - self.y)
+            self.scheduler.after(500, self._move_vertically, target_y - self.y)
 
     def _move_down(self, steps):
         """Move down step by step."""
         if steps > 0:
             self.move(0, 10, "down")
-            self.canvas.after(self.frame_interval, self._move_down, steps - 1)
+            self.scheduler.after(self.frame_interval, self._move_down, steps - 1)
         else:
-            self.canvas.after(500, self.move_to_next_random)
+            self.scheduler.after(500, self.retarget)
 
     def _move_up(self, steps):
         """Move up step by step."""
         if steps > 0:
             self.move(0, -10, "up")
-            self.canvas.after(self.frame_interval, self._move_up, steps - 1)
+            self.scheduler.after(self.frame_interval, self._move_up, steps - 1)
         else:
-            self.canvas.after(500, self.move_to_next_random)
+            self.scheduler.after(500, self.retarget)
+
+# Hot paths timed while the profiler is enabled
+PROFILER.instrument(Ghost, "update_velocity")
+PROFILER.instrument(Ghost, "sync")
 
 # Example usage
 if __name__ == "__main__":
@@ -253,18 +348,46 @@ if __name__ == "__main__":
     canvas = tk.Canvas(root, width=root.winfo_screenwidth(), height=root.winfo_screenheight(), bg="black")
     canvas.pack()
 
+    # Single loop advancing the flock, the animations and the random movements
+    loop = GameLoop(root, tick_rate=20)
+    # Seeded generator of the spawns and the random moves, the same seed gives the same demo
+    rng = random.Random(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    # The new targets and the steering of all the ghosts share 2 ms per tick
+    ai = AIScheduler(budget_ms=2.0)
+    ai.set_view(0, 0, canvas.winfo_screenwidth(), canvas.winfo_screenheight())  # The whole canvas is on screen
+    loop.add(ai.tick)
+    # Changes of all the sprites are sent to the canvas once per frame
+    renderer = SpriteRenderer(canvas)
+
+    # Shared neighbor index, the cells are as large as the perception radius
+    neighbor_index = SpatialHash(cell_size=100)
+    # Positions and velocities of the whole flock, updated in one batched step per tick
+    flock = FlockEngine(max_speed=10, perception_radius=100)
+    ai.add_flock(flock)  # The ghosts are steered by the scheduler, within its budget
+
     # Create a list of all ghosts for collision detection
+    # One ghost of each color, the colors are tints of the frames of blinky
     ghosts = [
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
+        Ghost(canvas, rng.randint(0, canvas.winfo_screenwidth()), rng.randint(0, canvas.winfo_screenheight()),
+              animation_frames, [], neighbor_index=neighbor_index, flock=flock,
+              scheduler=loop, renderer=renderer, rng=rng, ai=ai,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("blinky"))),
+        Ghost(canvas, rng.randint(0, canvas.winfo_screenwidth()), rng.randint(0, canvas.winfo_screenheight()),
+              animation_frames, [], neighbor_index=neighbor_index, flock=flock,
+              scheduler=loop, renderer=renderer, rng=rng, ai=ai,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("pinky"))),
+        Ghost(canvas, rng.randint(0, canvas.winfo_screenwidth()), rng.randint(0, canvas.winfo_screenheight()),
+              animation_frames, [], neighbor_index=neighbor_index, flock=flock,
+              scheduler=loop, renderer=renderer, rng=rng, ai=ai,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("inky"))),
+        Ghost(canvas, rng.randint(0, canvas.winfo_screenwidth()), rng.randint(0, canvas.winfo_screenheight()),
+              animation_frames, [], neighbor_index=neighbor_index, flock=flock,
+              scheduler=loop, renderer=renderer, rng=rng, ai=ai,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("clyde"))),
+        Ghost(canvas, rng.randint(0, canvas.winfo_screenwidth()), rng.randint(0, canvas.winfo_screenheight()),
+              animation_frames, [], neighbor_index=neighbor_index, flock=flock,
+              scheduler=loop, renderer=renderer, rng=rng, ai=ai,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("blinky"))),
     ]
 
     # Update the `all_ghosts` list for each ghost
@@ -283,12 +406,18 @@ if __name__ == "__main__":
 
 
     # Start Boid-like behavior
-    def update():
+    def render(alpha):
         for ghost in ghosts:
-            ghost.update_velocity()  # Update the ghost's movement based on Boid behaviors
-        root.after(50, update)  # Update every 50ms
+            ghost.sync(alpha)
+        renderer.flush()
+
+
+    def update():
+        flock.move()  # Move all the ghosts by the velocities steered by the scheduler, every 50ms
 
 
-    update()  # Start the update loop
+    loop.add(update)
+    loop.add_renderer(render)
+    loop.start()
 
     root.mainloop()
@@ -0,0 +1,188 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class AIScheduler:
+    """
+    Class to share a fixed time per tick between the decisions of many ghosts.
+
+    The decisions (new target, pathfinding) are queued and run in order until the budget of the
+    tick is spent, the rest waits for the next ticks, so many ghosts slow down their decisions
+    instead of the whole game. The neighbor scans of a FlockEngine run by chunks with what is left
+    of the budget, the ghosts in the view first. A ghost far from the view decides less often (level of detail).
+    """
+    def __init__(self, budget_ms=2.0, near_interval=1, far_interval=4, hidden_interval=16, window=300):
+        """
+        Initialisation function of the class
+
+        Args:
+            budget_ms (float, optional): milliseconds of decisions per tick, at least one decision runs. Defaults to 2.0.
+            near_interval (int, optional): ticks between two decisions of a ghost in the view. Defaults to 1.
+            far_interval (int, optional): ticks between two decisions of a ghost near the view. Defaults to 4.
+            hidden_interval (int, optional): ticks between two decisions of a ghost far from the view. Defaults to 16.
+            window (int, optional): number of ticks kept for the stats. Defaults to 300.
+        """
+        self.budget = budget_ms / 1000
+        self.near_interval = near_interval
+        self.far_interval = far_interval
+        self.hidden_interval = hidden_interval
+        self.view = None           # (x1, y1, x2, y2), None if every ghost is in the view
+        self.ticks = 0
+        self.flock = None          # FlockEngine steered within the budget, see add_flock
+        self.chunk_size = 128
+        self.last_steer = np.zeros(0, dtype=np.int64) # Tick of the last steering of each ghost of the flock
+        self.requests = deque()    # (agent, decision, args, ready tick) run once
+        self.requested = set()     # agents with a decision in the queue, one decision per agent
+        self.decisions = deque(maxlen=window)   # Decisions run in each tick
+        self.waiting = deque(maxlen=window)     # Requests left for the next ticks at the end of each tick
+        self.overruns = 0          # Ticks which ended with decisions left because of the budget
+
+    def set_view(self, x1, y1, x2, y2):
+        """
+        Function to give the region seen by the player, it can be given to Camera.add
+
+        Args:
+            x1 (int): left of the region
+            y1 (int): top of the region
+            x2 (int): right of the region
+            y2 (int): bottom of the region
+        """
+        self.view = (x1, y1, x2, y2)
+
+    def interval(self, agent):
+        """
+        Function to give the level of detail of a ghost: how many ticks between two of its decisions
+
+        Args:
+            agent (object): ghost with x and y attributes
+
+        Returns:
+            int: ticks between two decisions
+        """
+        if self.view is None:
+            return self.near_interval
+        x1, y1, x2, y2 = self.view
+        distance = max(x1 - agent.x, agent.x - x2, y1 - agent.y, agent.y - y2, 0)
+        if distance == 0:
+            return self.near_interval
+        if distance < max(x2 - x1, y2 - y1):
+            return self.far_interval
+        return self.hidden_interval
+
+    def intervals(self, x, y):
+        """
+        Function to give the level of detail of many ghosts at once, see interval
+
+        Args:
+            x (numpy array): x coords of the ghosts
+            y (numpy array): y coords of the ghosts
+
+        Returns:
+            numpy array: ticks between two decisions of each ghost
+        """
+        if self.view is None:
+            return np.full(len(x), self.near_interval)
+        x1, y1, x2, y2 = self.view
+        distance = np.maximum.reduce([x1 - x, x - x2, y1 - y, y - y2, np.zeros(len(x))])
+        return np.where(distance == 0, self.near_interval,
+                        np.where(distance < max(x2 - x1, y2 - y1), self.far_interval, self.hidden_interval))
+
+    def add_flock(self, flock, chunk_size=128):
+        """
+        Function to steer a flock within the budget instead of all at once: FlockEngine.steer runs
+        on chunks of the ghosts due at their level of detail, and the game only calls FlockEngine.move.
+        A ghost left out by the budget keeps its velocity until a next tick.
+
+        Args:
+            flock (FlockEngine): flock to steer
+            chunk_size (int, optional): ghosts steered by one call, the budget is checked between chunks. Defaults to 128.
+        """
+        self.flock = flock
+        self.chunk_size = chunk_size
+        self.last_steer = np.zeros(0, dtype=np.int64)
+
+    def request(self, agent, decision, *args):
+        """
+        Function to run a decision of a ghost once, in a coming tick
+
+        Args:
+            agent (object): ghost with x and y attributes, it has at most one decision waiting
+            decision (function): decision to run
+            args: arguments of the decision
+
+        Returns:
+            bool: True if the decision was queued, False if the ghost already has one waiting
+        """
+        if agent in self.requested:
+            return False
+        self.requested.add(agent)
+        self.requests.append((agent, decision, args, self.ticks + self.interval(agent) - 1))
+        return True
+
+    def tick(self):
+        """
+        Function to run the decisions of one tick, until the budget is spent.
+        It can be given to GameLoop.add.
+        """
+        deadline = time.perf_counter() + self.budget
+        tick = self.ticks
+        decisions = 0
+        out_of_time = False
+
+        # The decisions asked once, in the order they were asked
+        requests = self.requests
+        for _ in range(len(requests)):
+            if decisions and time.perf_counter() >= deadline:
+                out_of_time = True
+                break
+            agent, decision, args, ready = requests.popleft()
+            if ready > tick:
+                requests.append((agent, decision, args, ready)) # Far from the view, it waits its turn
+                continue
+            self.requested.discard(agent)
+            decision(*args)
+            decisions += 1
+
+        # The steering of the flock, by chunks: the ghosts in the view first, then the ones waiting for the longest
+        flock = self.flock
+        if flock is not None and flock.count and not out_of_time:
+            n = flock.count
+            if len(self.last_steer) < n:
+                added = np.full(n - len(self.last_steer), tick - self.hidden_interval) # New ghosts are due at once
+                self.last_steer = np.concatenate((self.last_steer, added))
+            last_steer = self.last_steer[:n]
+            intervals = self.intervals(flock.x[:n], flock.y[:n])
+            due = np.flatnonzero(tick - last_steer >= intervals)
+            due = due[np.lexsort((last_steer[due], intervals[due]))]
+            # Every chunk sees the flock of the start of the tick, as FlockEngine.step does
+            snapshot = flock.snapshot() if len(due) else None
+            for start in range(0, len(due), self.chunk_size):
+                if decisions and time.perf_counter() >= deadline:
+                    out_of_time = True
+                    break
+                chunk = due[start:start + self.chunk_size]
+                flock.steer(chunk, snapshot)
+                last_steer[chunk] = tick
+                decisions += len(chunk)
+
+        if out_of_time:
+            self.overruns += 1
+        self.decisions.append(decisions)
+        self.waiting.append(len(requests))
+        self.ticks += 1
+
+    def summary(self):
+        """
+        Function to sum up the decisions
+
+        Returns:
+            dict: mean and max decisions per tick, requests waiting after the last tick, ticks over budget
+        """
+        return {
+            "decisions_mean": sum(self.decisions) / len(self.decisions) if self.decisions else 0.0,
+            "decisions_max": max(self.decisions) if self.decisions else 0,
+            "waiting": self.waiting[-1] if self.waiting else 0,
+            "overruns": self.overruns,
+        }
@@ -1,7 +1,18 @@
+import argparse
+
 from window import Window
 from customtkinter import CTk
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pacman")
+    parser.add_argument("--record", help="record the session in this log, replay it with replay.py")
+    parser.add_argument("--seed", type=int, help="seed of the game")
+    parser.add_argument("--level", help="level file to play, see level.py")
+    parser.add_argument("--tick-rate", type=int, default=30, choices=(30, 60, 120), help="steps per second of the game")
+    parser.add_argument("--split", action="store_true", help="run the game in another process, the window only draws it")
+    args = parser.parse_args()
+
     root = CTk()
-    Window(root)
+    window = Window(root, record=args.record, seed=args.seed, level=args.level, tick_rate=args.tick_rate, split=args.split)
     root.mainloop() 
+    window.close()
@@ -0,0 +1,191 @@
+import json
+import time
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError: # Only on Unix, the max RSS is unavailable on Windows
+    resource = None
+
+
+def decode_image(path):
+    """
+    Function to decode an image file, it doesn't touch any shared state so it can run in any thread
+
+    Args:
+        path (str): path of the image
+
+    Returns:
+        tuple: (decoded PIL image, seconds spent decoding)
+    """
+    start = time.perf_counter()
+    image = Image.open(path)
+    image.load() # Decode now so the time is counted here and the file is closed
+    return image, time.perf_counter() - start
+
+
+class AssetManager:
+    """
+    Class to load each file of the game only once.
+
+    The images are decoded once with PIL and the tkinter images made from them are shared,
+    so 1000 ghosts use the same 8 images instead of decoding them 1000 times.
+    """
+    def __init__(self):
+        """
+        Initialisation function of the class
+        """
+        self.images = {}       # path -> decoded PIL image
+        self.photos = {}       # path -> tkinter image
+        self.json_files = {}   # path -> parsed content
+        self.animations = {}   # frames of each animation -> tkinter images of each animation
+        self.decode_time = 0.0 # Seconds spent decoding images
+        self.decoded_bytes = 0 # Size of the decoded pixels
+
+    def load_json(self, path):
+        """
+        Function to parse a json file, only the first time
+
+        Args:
+            path (str): path of the file
+
+        Returns:
+            dict: content of the file
+        """
+        if path not in self.json_files:
+            with open(path, "r") as file:
+                self.json_files[path] = json.load(file)
+        return self.json_files[path]
+
+    def add_image(self, path, image):
+        """
+        Function to register an image already decoded, load_image then returns it for path
+
+        Args:
+            path (str): path of the image
+            image (PIL Image): decoded image
+        """
+        self.images[path] = image
+        self.decoded_bytes += image.width * image.height * len(image.getbands())
+
+    def load_image(self, path):
+        """
+        Function to decode an image, only the first time
+
+        Args:
+            path (str): path of the image
+
+        Returns:
+            PIL Image: decoded image
+        """
+        image = self.images.get(path)
+        if image is None:
+            image, seconds = decode_image(path)
+            self.decode_time += seconds
+            self.add_image(path, image)
+        return image
+
+    def load_photo(self, path):
+        """
+        Function to give the tkinter image of a file, shared by all the sprites using it
+
+        Args:
+            path (str): path of the image
+
+        Returns:
+            ImageTk.PhotoImage: tkinter image
+        """
+        photo = self.photos.get(path)
+        if photo is None:
+            from PIL import ImageTk # Loaded with the first tkinter image, the headless games never need it
+            photo = ImageTk.PhotoImage(self.load_image(path))
+            self.photos[path] = photo
+        return photo
+
+    def load_photos(self, paths):
+        """
+        Function to give the tkinter images of a list of files
+
+        Args:
+            paths (list): paths of the images
+
+        Returns:
+            list: tkinter images, in the same order
+        """
+        return [self.load_photo(path) for path in paths]
+
+    def load_animations(self, animation_frames):
+        """
+        Function to give the frames of each animation, the same lists are shared by all the sprites using them
+
+        Args:
+            animation_frames (dict): paths of the frames of each animation
+
+        Returns:
+            dict: tkinter images of each animation
+        """
+        key = tuple((name, tuple(paths)) for name, paths in animation_frames.items())
+        animations = self.animations.get(key)
+        if animations is None:
+            animations = {name: self.load_photos(paths) for name, paths in animation_frames.items()}
+            self.animations[key] = animations
+        return animations
+
+    def pack_atlas(self, paths, image_path, index_path):
+        """
+        Function to pack images in a single file (an atlas) with an index of where each image is
+
+        Args:
+            paths (list): paths of the images to pack
+            image_path (str): path of the atlas image to write
+            index_path (str): path of the json index to write
+        """
+        images = [self.load_image(path) for path in paths]
+        width = sum(image.width for image in images)
+        height = max(image.height for image in images)
+        atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+
+        index = {}
+        x = 0
+        for path, image in zip(paths, images): # The images are put side by side
+            atlas.paste(image.convert("RGBA"), (x, 0))
+            index[path] = [x, 0, x + image.width, image.height]
+            x += image.width
+
+        atlas.save(image_path)
+        with open(index_path, "w") as file:
+            json.dump(index, file, indent=4)
+
+    def load_atlas(self, image_path, index_path):
+        """
+        Function to load all the images of an atlas with a single decode
+
+        Args:
+            image_path (str): path of the atlas image
+            index_path (str): path of the json index
+        """
+        atlas = self.load_image(image_path)
+        for path, box in self.load_json(index_path).items():
+            if path not in self.images:
+                self.add_image(path, atlas.crop(tuple(box)))
+
+    def report(self):
+        """
+        Function to give the cost of the loaded assets
+
+        Returns:
+            dict: number of images and tkinter images, decode time in ms, decoded size and max RSS of the process in KB
+            ("unavailable" without the resource module)
+        """
+        return {
+            "images": len(self.images),
+            "photos": len(self.photos),
+            "decode_ms": self.decode_time * 1000,
+            "decoded_kb": self.decoded_bytes / 1024,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else "unavailable",
+        }
+
+
+# Assets shared by the whole process
+ASSETS = AssetManager()
@@ -1,5 +1,4 @@
-from PIL import ImageTk, Image
-import json
+from assets import ASSETS
 
 class Background:
     def __init__(self, canvas):
@@ -7,10 +6,9 @@ class Background:
         self.background_image = self.load_images()
         
     def load_images(self):
-        with open("map.json", "r") as file:
-            data = json.load(file)
+        data = ASSETS.load_json("map.json")
             
-        background_image = ImageTk.PhotoImage(Image.open(data["background"]["background_images"][0]))
+        background_image = ASSETS.load_photo(data["background"]["background_images"][0])
         
         return background_image
     
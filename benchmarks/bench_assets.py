@@ -0,0 +1,67 @@
+"""
+Benchmark of the ghost images loading: one decode per ghost against the shared AssetManager.
+Only the PIL decode is timed, the tkinter images need a display.
+
+Run from the root of the project:
+    python benchmarks/bench_assets.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+from assets import AssetManager
+
+FRAMES = [os.path.join(ROOT, "images", f"{direction}_blinky_{number}.png")
+          for direction in ("down", "up", "left", "right") for number in (1, 2)]
+
+
+def decode_per_ghost(ghost_count):
+    """Decode the frames once per ghost, like before the AssetManager"""
+    images = []
+    for _ in range(ghost_count):
+        for path in FRAMES:
+            image = Image.open(path)
+            image.load()
+            images.append(image)
+    return images
+
+
+def decode_shared(ghost_count):
+    """Ask the AssetManager for the frames of every ghost"""
+    assets = AssetManager()
+    images = [assets.load_image(path) for _ in range(ghost_count) for path in FRAMES]
+    return assets, images
+
+
+def main():
+    for ghost_count in (1, 100, 1000):
+        start = time.perf_counter()
+        per_ghost = decode_per_ghost(ghost_count)
+        naive = time.perf_counter() - start
+        naive_kb = sum(image.width * image.height * len(image.getbands()) for image in per_ghost) / 1024
+        del per_ghost
+
+        start = time.perf_counter()
+        assets, _ = decode_shared(ghost_count)
+        shared = time.perf_counter() - start
+        report = assets.report()
+        print(f"{ghost_count:>5} ghosts: per ghost {naive * 1000:>9.1f} ms {naive_kb:>9.0f} KB"
+              f" | shared {shared * 1000:>7.1f} ms {report['decoded_kb']:>5.0f} KB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_path, index_path = os.path.join(directory, "atlas.png"), os.path.join(directory, "atlas.json")
+        AssetManager().pack_atlas(FRAMES, image_path, index_path)
+        assets = AssetManager()
+        start = time.perf_counter()
+        assets.load_atlas(image_path, index_path)
+        print(f"atlas: {len(FRAMES)} frames in {(time.perf_counter() - start) * 1000:.2f} ms with 1 decode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of Map.check_collision: tile grid lookup against the old linear scan of wall_coords.
+
+Run from the root of the project:
+    python benchmarks/bench_collision.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map import Map, MAP_LAYOUT
+
+
+def random_layout(size, seed=0):
+    """
+    Function to generate a square maze with a wall border and random walls inside
+
+    Args:
+        size (int): number of tiles on each side
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        list: rows of the maze
+    """
+    rng = random.Random(seed)
+    layout = []
+    for y in range(size):
+        if y in (0, size - 1):
+            layout.append("1" * size)
+        else:
+            inside = "".join("1" if rng.random() < 0.3 else "0" for _ in range(size - 2))
+            layout.append("1" + inside + "1")
+    return layout
+
+
+def linear_check_collision(wall_coords, new_x, new_y):
+    """
+    The linear scan used by Map.check_collision before the tile grid
+    """
+    for (x1, y1, x2, y2) in wall_coords:
+        if x1 <= new_x <= x2 and y1 <= new_y <= y2:
+            return True
+    return False
+
+
+def bench(name, function, points, repeat=3):
+    """
+    Function to time a collision function on a list of points
+
+    Returns:
+        float: best number of queries per second
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for (x, y) in points:
+            function(x, y)
+        best = min(best, time.perf_counter() - start)
+    rate = len(points) / best
+    print(f"  {name:<10} {rate:>14,.0f} queries/s")
+    return rate
+
+
+def main():
+    for label, layout, queries in (("25x25", MAP_LAYOUT, 20000), ("500x500", random_layout(500), 2000)):
+        map_ = Map(None, layout)
+        width, height = map_.columns * map_.cell_size, map_.rows * map_.cell_size
+        rng = random.Random(1)
+        points = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(queries)]
+
+        print(f"{label} maze, {len(map_.wall_coords)} walls, {queries} queries")
+        linear = bench("linear", lambda x, y: linear_check_collision(map_.wall_coords, x, y), points)
+        grid = bench("grid", map_.check_collision, points)
+        start = time.perf_counter()
+        map_.check_collisions(points)
+        batch = len(points) / (time.perf_counter() - start)
+        print(f"  {'batch':<10} {batch:>14,.0f} queries/s")
+        print(f"  speedup    {grid / linear:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
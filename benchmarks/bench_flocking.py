@@ -0,0 +1,95 @@
+"""
+Benchmark of a flocking tick as the number of ghosts grows:
+- scan: neighbor search of Boid.Ghost scanning all the ghosts
+- index: neighbor search of Boid.Ghost with the shared SpatialHash
+- engine: full batched FlockEngine.step (behaviors, speed limit, collisions)
+
+tests/test_flock.py checks that FlockEngine.step follows the rules of Boid.Ghost.
+
+Run from the root of the project:
+    python benchmarks/bench_flocking.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_hash import SpatialHash
+from flock import FlockEngine
+
+PERCEPTION_RADIUS = 100
+MAX_SPEED = 10
+
+
+class Agent:
+    """Position of a ghost, without the canvas part"""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def scan_tick(agents, rng):
+    """One tick with the O(N²) scan: search the neighbors of each agent then move it"""
+    found = 0
+    for agent in agents:
+        found += len([other for other in agents
+                      if other is not agent and math.sqrt((agent.x - other.x) ** 2 + (agent.y - other.y) ** 2) < PERCEPTION_RADIUS])
+        agent.x += rng.uniform(-MAX_SPEED, MAX_SPEED)
+        agent.y += rng.uniform(-MAX_SPEED, MAX_SPEED)
+    return found
+
+
+def index_tick(agents, index, rng):
+    """One tick with the SpatialHash, updated incrementally after each move"""
+    found = 0
+    for agent in agents:
+        found += len([other for other in index.query(agent.x, agent.y, PERCEPTION_RADIUS) if other is not agent])
+        agent.x += rng.uniform(-MAX_SPEED, MAX_SPEED)
+        agent.y += rng.uniform(-MAX_SPEED, MAX_SPEED)
+        index.update(agent)
+    return found
+
+
+def spawn(count, seed=0):
+    """Spawn agents with the same density whatever the count (about 60x60 pixels per agent)"""
+    rng = random.Random(seed)
+    side = math.sqrt(count) * 60
+    return [Agent(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(count)]
+
+
+def time_ticks(tick, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    return (time.perf_counter() - start) / ticks
+
+
+def main():
+    print(f"{'ghosts':>8} {'scan ms/tick':>14} {'index ms/tick':>14} {'engine ms/tick':>15}")
+    for count in (10, 100, 1000, 10000, 20000):
+        rng = random.Random(1)
+        ticks = 5 if count >= 10000 else 20
+
+        scan = float("nan")
+        if count <= 1000: # The scan is too slow above this
+            agents = spawn(count)
+            scan = time_ticks(lambda: scan_tick(agents, rng), ticks) * 1000
+
+        agents = spawn(count)
+        index = SpatialHash(cell_size=PERCEPTION_RADIUS)
+        index.rebuild(agents)
+        indexed = time_ticks(lambda: index_tick(agents, index, rng), ticks) * 1000
+
+        flock = FlockEngine(max_speed=MAX_SPEED, perception_radius=PERCEPTION_RADIUS)
+        for agent in spawn(count):
+            flock.add(agent.x, agent.y)
+        engine = time_ticks(flock.step, ticks) * 1000
+
+        print(f"{count:>8} {scan:>14.2f} {indexed:>14.2f} {engine:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
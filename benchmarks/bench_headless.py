@@ -0,0 +1,44 @@
+"""
+Benchmark of the headless World: simulated games per second, without any display.
+
+Run from the root of the project:
+    python benchmarks/bench_headless.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map import Map
+from world import World, DIRECTIONS
+
+TICKS_PER_GAME = 500
+
+
+def play(map_, ghost_count, seed):
+    """Play one game with a random key on each tick"""
+    world = World(map_, ghost_count=ghost_count, seed=seed)
+    keys = list(DIRECTIONS)
+    rng = random.Random(seed)
+    inputs = [[rng.choice(keys)] for _ in range(TICKS_PER_GAME)]
+    for tick_inputs in inputs:
+        world.step(tick_inputs)
+    return world
+
+
+def main():
+    map_ = Map(None) # Shared by all the games, the walls never change
+    print(f"{TICKS_PER_GAME} ticks per game")
+    for ghost_count in (0, 4, 100):
+        games = 200 if ghost_count == 0 else 10
+        start = time.perf_counter()
+        for seed in range(games):
+            play(map_, ghost_count, seed)
+        elapsed = time.perf_counter() - start
+        print(f"  {ghost_count:>4} ghosts: {games / elapsed:>10,.1f} games/s  {games * TICKS_PER_GAME / elapsed:>12,.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    main()
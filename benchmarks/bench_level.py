@@ -0,0 +1,68 @@
+"""
+Benchmark of the level files: writing, opening and reading a 10,000x10,000 maze.
+
+Opening a level only maps the file, the chunks are unpacked when their tiles are read,
+so the time to open and the memory don't depend on the size of the level.
+
+Run from the root of the project:
+    python benchmarks/bench_level.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_collision import random_layout
+from level import layout_to_array, save_level
+from map import Map
+
+
+def write_level(path, size, seed=0):
+    """
+    Function to write a square level made of a random 500x500 maze repeated
+
+    Args:
+        path (str): path of the level file
+        size (int): number of tiles on each side, a multiple of 500
+        seed (int, optional): seed of the random generator. Defaults to 0.
+    """
+    pattern = layout_to_array(random_layout(500, seed))
+    save_level(path, np.tile(pattern, (size // 500, size // 500)))
+
+
+def main(size=10000, queries=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "level.bin")
+        start = time.perf_counter()
+        write_level(path, size)
+        print(f"write {size}x{size}    {time.perf_counter() - start:8.3f} s, {os.path.getsize(path) / 2**20:.1f} MB on disk")
+
+        start = time.perf_counter()
+        map_ = Map.load(None, path)
+        print(f"open               {(time.perf_counter() - start) * 1000:8.3f} ms")
+
+        rng = random.Random(1)
+        points = [(rng.uniform(0, map_.width), rng.uniform(0, map_.height)) for _ in range(queries)]
+        start = time.perf_counter()
+        map_.check_collisions(points)
+        duration = time.perf_counter() - start
+        print(f"random queries     {queries / duration:>12,.0f} queries/s (chunk cache misses)")
+
+        # Queries near pacman stay in the few chunks of the viewport
+        points = [(rng.uniform(0, 600), rng.uniform(0, 600)) for _ in range(queries)]
+        start = time.perf_counter()
+        map_.check_collisions(points)
+        duration = time.perf_counter() - start
+        print(f"viewport queries   {queries / duration:>12,.0f} queries/s")
+        unpacked = sum(chunk.nbytes for chunk in map_.level.chunks.values())
+        print(f"memory             {unpacked / 2**20:8.1f} MB in {len(map_.level.chunks)} unpacked chunks (bounded by max_chunks)")
+        map_.level.close()
+
+
+if __name__ == "__main__":
+    main()
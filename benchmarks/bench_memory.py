@@ -0,0 +1,65 @@
+"""
+Benchmark of the memory taken by the entities: one Python object per ghost against the EntityStore
+arrays, for 100k headless ghosts.
+
+Run from the root of the project:
+    python benchmarks/bench_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from itertools import cycle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flock import FlockEngine
+from world import PacmanState
+
+COUNT = 100_000
+
+
+class DictGhost:
+    """The data of a ghost as it was stored before: attributes in a dict, a velocity list, a dict of iterators"""
+    def __init__(self, x, y, frames):
+        self.x = x
+        self.y = y
+        self.velocity = [0.0, 0.0]
+        self.current_animation = "down"
+        self.animations = {direction: cycle(images) for direction, images in frames.items()}
+
+
+def measure(build):
+    """Return the bytes allocated by build() and its result"""
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    frames = {direction: [object(), object()] for direction in ("down", "up", "left", "right")}
+
+    size, _ = measure(lambda: [DictGhost(float(i), float(i), frames) for i in range(COUNT)])
+    print(f"dict objects:     {size / COUNT:>7.1f} bytes/ghost")
+
+    size, _ = measure(lambda: [PacmanState(float(i), float(i)) for i in range(COUNT)])
+    print(f"__slots__ state:  {size / COUNT:>7.1f} bytes/entity (PacmanState)")
+
+    def build_flock():
+        flock = FlockEngine(capacity=COUNT)
+        for i in range(COUNT):
+            flock.add(float(i % 1000) * 60, float(i // 1000) * 60)
+        return flock
+
+    size, flock = measure(build_flock)
+    print(f"FlockEngine:      {size / COUNT:>7.1f} bytes/ghost ({FlockEngine.bytes_per_entity()} bytes of fields)")
+
+    start = time.perf_counter()
+    flock.step()
+    print(f"one step of {COUNT:,} headless ghosts: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
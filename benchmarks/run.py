@@ -0,0 +1,293 @@
+"""
+Benchmark suite of the game: collisions, flocking, map construction, level files, asset loading and frame time.
+
+The results are written as json and compared with a stored baseline, the script exits with
+an error when a metric is worse than the baseline by more than the tolerance. A metric missing
+from the baseline (or from the results) is only reported, --update-baseline adds it.
+The benchmarks of a regressed metric run again before failing, a busy machine slows whole runs.
+The benchmarks needing tkinter images only run when a display is available (for example under xvfb-run).
+
+Run from the root of the project:
+    python benchmarks/run.py                      # compare with benchmarks/baseline.json
+    python benchmarks/run.py --update-baseline    # store the results as the new baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIRECTORY)
+sys.path.insert(0, ROOT)
+
+import maze_render
+from assets import AssetManager
+from bench_collision import random_layout
+from bench_flocking import spawn
+from bench_level import write_level
+from flock import FlockEngine
+from game_loop import GameLoop
+from map import Map, MAP_LAYOUT
+from sprites import SpriteCache
+from world import World
+
+BASELINE = os.path.join(BENCHMARKS_DIRECTORY, "baseline.json")
+
+
+def best_time(function, repeat=7, min_time=0.05):
+    """
+    Best duration in seconds of function() over a few runs.
+    A run calls the function until min_time has passed and gives the mean, so a short function
+    isn't measured on a single call, and the best run leaves out the runs slowed by the machine.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def bench_collision():
+    metrics = []
+    for label, layout in (("25x25", MAP_LAYOUT), ("500x500", random_layout(500))):
+        map_ = Map(None, layout)
+        rng = random.Random(1)
+        points = [(rng.uniform(0, map_.width), rng.uniform(0, map_.height)) for _ in range(20000)]
+        check_collision = map_.check_collision
+        duration = best_time(lambda: [check_collision(x, y) for (x, y) in points])
+        metrics.append((f"check_collision_{label}", len(points) / duration, "queries/s", "higher"))
+
+    # Swept boxes of ghost size with moves up to 3 tiles, one by one then in one batch
+    map_ = Map(None, random_layout(500))
+    rng = np.random.default_rng(1)
+    x, y = rng.uniform(0, map_.width, 10000), rng.uniform(0, map_.height, 10000)
+    dx, dy = rng.uniform(-90, 90, 10000), rng.uniform(-90, 90, 10000)
+    sweep = map_.sweep
+    duration = best_time(lambda: [sweep(*move, 12, 12) for move in zip(x.tolist(), y.tolist(), dx.tolist(), dy.tolist())])
+    metrics.append(("sweep_box_500x500", len(x) / duration, "moves/s", "higher"))
+    duration = best_time(lambda: map_.sweep_many(x, y, dx, dy, 12, 12))
+    metrics.append(("sweep_many_500x500", len(x) / duration, "moves/s", "higher"))
+    return metrics
+
+
+def bench_flocking():
+    metrics = []
+    for count in (5, 100, 1000, 10000):
+        flock = FlockEngine()
+        for agent in spawn(count):
+            flock.add(agent.x, agent.y)
+        ticks = 5 if count >= 10000 else 20
+        duration = best_time(lambda: [flock.step() for _ in range(ticks)])
+        metrics.append((f"flock_step_{count}", ticks / duration, "ticks/s", "higher"))
+    return metrics
+
+
+def bench_map():
+    metrics = []
+    for label, layout in (("25x25", MAP_LAYOUT), ("500x500", random_layout(500))):
+        duration = best_time(lambda: Map(None, layout))
+        metrics.append((f"generate_map_{label}", duration * 1000, "ms", "lower"))
+
+    map_ = Map(None)
+    def render():
+        maze_render._maze_cache.clear() # Time the rendering, not the cache
+        maze_render.render_maze(map_)
+    metrics.append(("render_maze_25x25", best_time(render) * 1000, "ms", "lower"))
+
+    # Toggle random tiles of a large map, the cost of an edit doesn't depend on the size of the map
+    map_ = Map(None, random_layout(500))
+    rng = random.Random(1)
+    tiles = [(rng.randrange(map_.columns), rng.randrange(map_.rows)) for _ in range(10000)]
+    def edit():
+        for column, row in tiles:
+            map_.set_tile(column, row, not map_.is_wall(column, row))
+    metrics.append(("set_tile_500x500", len(tiles) / best_time(edit), "edits/s", "higher"))
+    metrics.append(("render_tiles_3x3", 1000 / best_time(lambda: [maze_render.render_tiles(map_, 10, 10, 12, 12) for _ in range(1000)]),
+                    "patches/s", "higher"))
+    return metrics
+
+
+def bench_level():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "level.bin")
+        write_level(path, 10000)
+        metrics = [("level_open_10000x10000", best_time(lambda: Map.load(None, path).level.close()) * 1000, "ms", "lower")]
+        map_ = Map.load(None, path)
+        rng = random.Random(1)
+        points = [(rng.uniform(0, 600), rng.uniform(0, 600)) for _ in range(20000)]
+        duration = best_time(lambda: map_.check_collisions(points))
+        metrics.append(("level_check_collision", len(points) / duration, "queries/s", "higher"))
+        map_.level.close()
+    return metrics
+
+
+def bench_assets():
+    paths = [os.path.join(ROOT, path) for paths in AssetManager().load_json(os.path.join(ROOT, "map.json"))["pacman_directions"].values()
+             for path in paths]
+    def load():
+        assets = AssetManager()
+        for path in paths:
+            assets.load_image(path)
+    def variants():
+        sprites = SpriteCache(AssetManager())
+        for name in ("blinky", "pinky", "inky", "clyde"):
+            for frames in sprites.ghost_variants(name).values():
+                for path, transform, size in frames:
+                    sprites.image(os.path.join(ROOT, path), transform, size)
+    return [("pacman_images_decode", best_time(load) * 1000, "ms", "lower"),
+            ("ghost_variants_make", best_time(variants) * 1000, "ms", "lower")]
+
+
+def bench_frame():
+    world = World(ghost_count=4, seed=1)
+    loop = GameLoop(None, tick_rate=30, frame_rate=60)
+    loop.add(lambda: world.step(["Left"]))
+    frames = 600
+    duration = best_time(lambda: [loop.advance(1 / 60) for _ in range(frames)])
+    return [("headless_frame", duration / frames * 1000, "ms", "lower")]
+
+
+def bench_display():
+    """Benchmarks needing tkinter images, skipped without a display"""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        print("no display, skipping the tkinter benchmarks (run under xvfb-run to include them)")
+        return []
+    root.withdraw()
+    from Boid import Ghost
+    from pacman import Pacman
+    from world import PacmanState
+    from render import SpriteRenderer
+    from assets import ASSETS
+
+    metrics = []
+    canvas = tk.Canvas(root, width=600, height=600)
+    current_directory = os.getcwd()
+    os.chdir(ROOT) # The json files use paths relative to the project
+    try:
+        def load_pacman():
+            ASSETS.images.clear()
+            ASSETS.photos.clear()
+            Pacman(SpriteRenderer(canvas), PacmanState(375, 375))
+        metrics.append(("pacman_load_images", best_time(load_pacman) * 1000, "ms", "lower"))
+
+        frames = {direction: [f"images/{direction}_blinky_{number}.png" for number in (1, 2)]
+                  for direction in ("down", "up", "left", "right")}
+        for count in (5, 100, 1000):
+            flock = FlockEngine()
+            ghosts = [Ghost(canvas, agent.x, agent.y, frames, [], flock=flock) for agent in spawn(count)]
+            for ghost in ghosts:
+                ghost.all_ghosts = ghosts
+            ticks = 2 if count >= 1000 else 10
+            duration = best_time(lambda: [ghost.update_velocity() for _ in range(ticks) for ghost in ghosts])
+            metrics.append((f"ghost_update_velocity_{count}", ticks / duration, "ticks/s", "higher"))
+    finally:
+        os.chdir(current_directory)
+        root.destroy()
+    return metrics
+
+
+BENCHMARKS = [bench_collision, bench_flocking, bench_map, bench_level, bench_assets, bench_frame, bench_display]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Function to find the metrics worse than the baseline by more than the tolerance.
+    The metrics missing from the baseline are left out, main reports them.
+
+    Returns:
+        list: (name, line describing the regression) of each regressed metric
+    """
+    regressions = []
+    for name, metric in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        value, expected = metric["value"], reference["value"]
+        if metric["better"] == "higher":
+            worse = value < expected * (1 - tolerance)
+        else:
+            worse = value > expected * (1 + tolerance)
+        if worse:
+            regressions.append((name, f"{name}: {value:,.3f} {metric['unit']} against {expected:,.3f} in the baseline"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="json file for the results")
+    parser.add_argument("--baseline", default=BASELINE, help="json file of the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed loss compared to the baseline (0.5 = 50%%, the runs of a shared machine vary by about 30%%)")
+    parser.add_argument("--retries", type=int, default=2, help="runs again of the benchmarks of the regressed metrics")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    results = {}
+    sources = {} # Name of a metric -> benchmark measuring it
+    for benchmark in BENCHMARKS:
+        for name, value, unit, better in benchmark():
+            results[name] = {"value": value, "unit": unit, "better": better}
+            sources[name] = benchmark
+            print(f"{name:<32} {value:>14,.3f} {unit}")
+
+    report = {"python": platform.python_version(), "machine": platform.machine(), "metrics": results}
+    baseline = None
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)["metrics"]
+        regressions = compare(results, baseline, args.tolerance)
+        # A busy machine can slow a whole run, the benchmarks of the regressed metrics run again
+        # and the best value is kept, a real regression stays slow every time
+        for _ in range(args.retries):
+            again = {sources[name] for name, _ in regressions}
+            if not again:
+                break
+            for benchmark in again:
+                for name, value, _, better in benchmark():
+                    best = max if better == "higher" else min
+                    results[name]["value"] = best(results[name]["value"], value)
+                    print(f"{name:<32} {value:>14,.3f} {results[name]['unit']} (run again)")
+            regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=4)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"no baseline at {args.baseline}, run with --update-baseline to create it")
+        return 0
+    for name in sorted(baseline.keys() - results.keys()):
+        print(f"not measured: {name}") # For example the tkinter benchmarks without a display
+    for name in sorted(results.keys() - baseline.keys()):
+        print(f"not in the baseline: {name}, run with --update-baseline to add it") # For example the tkinter benchmarks under xvfb-run
+    for _, line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        return 1
+    print("no regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+class Camera:
+    """
+    Class to scroll the canvas over a map larger than the window.
+
+    The items keep the coords of the map and the camera only moves the view of the canvas,
+    so scrolling costs two calls to the canvas whatever the number of items.
+    The layers (map chunks, sprites) are told the visible region plus a margin, so they only
+    keep canvas items near the view.
+    """
+    def __init__(self, canvas, width, height, world_width, world_height, margin=60):
+        """
+        Initialisation function of the class
+
+        Args:
+            canvas (tkinter canvas): canvas to scroll
+            width (int): width of the view in pixels
+            height (int): height of the view in pixels
+            world_width (int): width of the map in pixels
+            world_height (int): height of the map in pixels
+            margin (int, optional): pixels around the view where the items are kept. Defaults to 60.
+        """
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.world_width = max(world_width, width)
+        self.world_height = max(world_height, height)
+        self.margin = margin
+        self.x = 0 # Top left corner of the view on the map
+        self.y = 0
+        self.layers = []
+        self.canvas.configure(scrollregion=(0, 0, self.world_width, self.world_height),
+                              xscrollincrement=1, yscrollincrement=1)
+
+    def add(self, layer):
+        """
+        Function to add a layer culled to the view
+
+        Args:
+            layer (function): called with (x1, y1, x2, y2), the visible region plus the margin, when the view moves
+        """
+        self.layers.append(layer)
+        layer(*self.region())
+
+    def region(self):
+        """
+        Function to give the visible region plus the margin
+
+        Returns:
+            tuple: (x1, y1, x2, y2) on the map
+        """
+        margin = self.margin
+        return self.x - margin, self.y - margin, self.x + self.width + margin, self.y + self.height + margin
+
+    def follow(self, x, y):
+        """
+        Function to center the view on a point, without showing outside of the map
+
+        Args:
+            x (float): x coords of the point
+            y (float): y coords of the point
+        """
+        view_x = int(min(max(x - self.width / 2, 0), self.world_width - self.width))
+        view_y = int(min(max(y - self.height / 2, 0), self.world_height - self.height))
+        if (view_x, view_y) == (self.x, self.y):
+            return # The canvas and the layers are only updated when the view moves
+        self.x, self.y = view_x, view_y
+        self.canvas.xview_moveto(view_x / self.world_width)
+        self.canvas.yview_moveto(view_y / self.world_height)
+        region = self.region()
+        for layer in self.layers:
+            layer(*region)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Codes of the directions in the direction field
+DIRECTION_NAMES = ("down", "up", "left", "right")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTION_NAMES)}
+
+
+class EntityStore:
+    """
+    Class to store many entities as fixed-width fields, with one NumPy array per field.
+
+    An entity is only an index in the arrays: 8 bytes for each float field and 1 byte for
+    direction (code of DIRECTION_NAMES) and frame (index of the animation frame). The base store
+    takes 18 bytes per entity, where a Python object with a dict, two float attributes, a velocity
+    list and a dict of animation iterators takes several hundred bytes.
+    """
+    FIELDS = {
+        "x": np.float64,
+        "y": np.float64,
+        "direction": np.uint8,
+        "frame": np.uint8,
+    }
+
+    def __init__(self, capacity=64):
+        """
+        Initialisation function of the class
+
+        Args:
+            capacity (int, optional): number of entities allocated at first, the arrays grow when needed. Defaults to 64.
+        """
+        self.count = 0
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def add(self, **values):
+        """
+        Add an entity to the store
+
+        Args:
+            values: value of the fields, the missing ones are 0
+
+        Returns:
+            int: index of the entity in the arrays
+        """
+        if self.count == len(self.x):
+            self._grow(2 * len(self.x))
+        index = self.count
+        for name, value in values.items():
+            getattr(self, name)[index] = value
+        self.count += 1
+        return index
+
+    def _grow(self, capacity):
+        for name, dtype in self.FIELDS.items():
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    @classmethod
+    def bytes_per_entity(cls):
+        """
+        Function to give the size of one entity in the arrays
+
+        Returns:
+            int: bytes used by the fields of one entity
+        """
+        return sum(np.dtype(dtype).itemsize for dtype in cls.FIELDS.values())
+
+    def nbytes(self):
+        """
+        Function to give the memory allocated by the arrays, free slots included
+
+        Returns:
+            int: bytes allocated
+        """
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
@@ -0,0 +1,479 @@
+import numpy as np
+
+from entity_store import EntityStore, DIRECTION_CODES
+from profiler import PROFILER
+
+
+class FlockEngine(EntityStore):
+    """
+    Class to simulate a whole flock of ghosts at once.
+
+    The flock is stored as a structure of arrays (an EntityStore): one NumPy array for x, y, the x velocity
+    and the y velocity, with one slot per ghost. step() computes the alignment, the cohesion,
+    the separation and the speed limit of every ghost with array operations instead of a Python loop per ghost.
+    previous_x and previous_y keep the positions before the last step, to interpolate the drawing.
+
+    A step is a Jacobi update: every ghost is steered and moved from the flock as it was at the start of the tick,
+    where Boid.Ghost.update_velocity sees the ghosts updated before it in the same tick. The two flocks drift apart
+    after a few ticks; tests/test_flock.py checks the engine against the rules of Boid.Ghost with these semantics.
+
+    A step costs about 1.2 ms for 1,000 ghosts and 10 ms for 10,000 on one core (benchmarks/bench_flocking.py).
+    For 10,000 ghosts a step makes about 40 NumPy passes over the 44,000 pairs of neighbors (each pair
+    found once, see NeighborGrid.pairs), 0.1 to 0.5 ms each: a step of a few milliseconds needs these passes
+    fused in compiled code, and NumPy is the only numeric dependency of the game. The step fits in a 30 Hz tick,
+    an AIScheduler steers a larger flock by chunks within its budget.
+    """
+    FIELDS = dict(EntityStore.FIELDS, velocity_x=np.float64, velocity_y=np.float64,
+                  previous_x=np.float64, previous_y=np.float64)
+
+    def __init__(self, max_speed=10, perception_radius=100, collision_distance=50, capacity=64, time_scale=1.0):
+        """
+        Initialisation function of the class
+
+        Args:
+            max_speed (int, optional): maximum speed of a ghost. Defaults to 10.
+            perception_radius (int, optional): radius within which other ghosts are "perceived". Defaults to 100.
+            collision_distance (int, optional): a ghost doesn't move closer than this to another ghost. Defaults to 50.
+            capacity (int, optional): number of ghosts allocated at first, the arrays grow when needed. Defaults to 64.
+            time_scale (float, optional): part of a 30 Hz tick done by one step, the speeds and the steering
+                stay given per 30 Hz tick. Defaults to 1.
+        """
+        super().__init__(capacity)
+        self.time_scale = time_scale
+        self.max_speed = max_speed
+        self.perception_radius = perception_radius
+        self.collision_distance = collision_distance
+
+    def add(self, x, y, velocity_x=0.0, velocity_y=0.0):
+        """
+        Add a ghost to the flock
+
+        Args:
+            x (float): x coords of the ghost
+            y (float): y coords of the ghost
+            velocity_x (float, optional): initial velocity on x. Defaults to 0.
+            velocity_y (float, optional): initial velocity on y. Defaults to 0.
+
+        Returns:
+            int: index of the ghost in the arrays
+        """
+        return super().add(x=x, y=y, previous_x=x, previous_y=y, velocity_x=velocity_x, velocity_y=velocity_y)
+
+    def step(self):
+        """
+        Move all the ghosts by one tick: steer() every ghost, then move().
+        The neighbors are searched once in the tick, for the steering and for the collisions.
+
+        Returns:
+            numpy array: for each ghost, True if it didn't move because the place was already occupied
+        """
+        n = self.count
+        neighbors = self._neighbors()
+        self._steer(None, self.velocity_x[:n], self.velocity_y[:n], neighbors)
+        # A ghost blocking a move is within collision_distance of its end, so within perception_radius of its start
+        # when the moves are shorter than the gap between the two: it is one of the neighbors
+        reach = self.collision_distance + self.max_speed * self.time_scale
+        return self.move(neighbors if reach < self.perception_radius else None)
+
+    def snapshot(self):
+        """
+        Function to freeze the flock seen by the ghosts steered in several calls of steer during a tick,
+        so they see the flock of the start of the tick, as in step()
+
+        Returns:
+            tuple: copy of the x and the y velocities, NeighborGrid of the positions, to give to steer
+        """
+        n = self.count
+        grid = NeighborGrid(self.x[:n], self.y[:n], self.perception_radius) if n else None
+        return self.velocity_x[:n].copy(), self.velocity_y[:n].copy(), grid
+
+    def steer(self, indices=None, snapshot=None):
+        """
+        Function to update the velocity of some ghosts from their neighbors (alignment, cohesion, separation),
+        without moving them. An AIScheduler steers the flock by chunks within its time budget.
+
+        Args:
+            indices (numpy array, optional): index of the ghosts to steer, they see the whole flock.
+                Defaults to None, every ghost.
+            snapshot (tuple, optional): flock seen by the ghosts, from snapshot() while the positions didn't change.
+                Defaults to None, the flock as it is.
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        if snapshot is None:
+            velocity_x, velocity_y, grid = self.velocity_x[:n], self.velocity_y[:n], None
+        else:
+            velocity_x, velocity_y, grid = snapshot
+        if indices is None:
+            neighbors = self._neighbors(grid)
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+            neighbors = self._pairs(x[indices], y[indices], x, y, self.perception_radius, indices, grid)
+        self._steer(indices, velocity_x, velocity_y, neighbors)
+
+    def _steer(self, indices, velocity_x, velocity_y, neighbors):
+        """
+        Steer the ghosts of indices from their neighbors, (query, ghost) pairs from _pairs.
+        When indices is None, every ghost is steered and the neighbors are each pair of ghosts once, from _neighbors:
+        a pair counts for both of its ghosts.
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        radius = self.perception_radius
+        queries = slice(0, n) if indices is None else indices
+        query_x, query_y = x[queries], y[queries]
+        m = len(query_x)
+        i, j, distance_squared = neighbors
+        mirrored = indices is None
+
+        def total(values):
+            """Sum of the values of the neighbors of each query"""
+            result = np.bincount(i, values[j], m)
+            if mirrored:
+                result += np.bincount(j, values[i], m)
+            return result
+
+        # Alignment and cohesion, with the neighbors closer than the perception radius
+        counts = np.bincount(i, minlength=m)
+        if mirrored:
+            counts += np.bincount(j, minlength=m)
+        seen = counts > 0
+        divisor = np.maximum(counts, 1)
+
+        alignment_x = total(velocity_x) / divisor
+        alignment_y = total(velocity_y) / divisor
+        self._limit(alignment_x, alignment_y)
+
+        cohesion_x = np.where(seen, total(x) / divisor - query_x, 0.0)
+        cohesion_y = np.where(seen, total(y) / divisor - query_y, 0.0)
+
+        # Separation, with the neighbors closer than half the perception radius
+        close = distance_squared < (radius / 2) ** 2
+        i_close, j_close = i[close], j[close]
+        distance = np.sqrt(distance_squared[close])
+        distance[distance == 0] = 1.0 # Two ghosts at the same place don't push each other
+        push_x = (query_x[i_close] - x[j_close]) / distance
+        push_y = (query_y[i_close] - y[j_close]) / distance
+        close_counts = np.bincount(i_close, minlength=m)
+        separation_x = np.bincount(i_close, push_x, m)
+        separation_y = np.bincount(i_close, push_y, m)
+        if mirrored:
+            # The second ghost of a pair is pushed the other way
+            close_counts += np.bincount(j_close, minlength=m)
+            separation_x -= np.bincount(j_close, push_x, m)
+            separation_y -= np.bincount(j_close, push_y, m)
+        close_divisor = np.maximum(close_counts, 1)
+        separation_x = separation_x / close_divisor
+        separation_y = separation_y / close_divisor
+
+        # Apply the behaviors to velocity and limit it to the max speed
+        scale = self.time_scale
+        steered_x = velocity_x[queries] + (alignment_x + cohesion_x + separation_x) * scale
+        steered_y = velocity_y[queries] + (alignment_y + cohesion_y + separation_y) * scale
+        self._limit(steered_x, steered_y)
+        self.velocity_x[queries] = steered_x
+        self.velocity_y[queries] = steered_y
+        self.direction[queries] = np.where(steered_y > 0, DIRECTION_CODES["down"], DIRECTION_CODES["up"])
+
+    def move(self, neighbors=None):
+        """
+        Function to move every ghost by its velocity, a ghost doesn't move if the new place
+        is already occupied by another ghost
+
+        Args:
+            neighbors (tuple, optional): pairs of ghosts, each pair once, holding every ghost close enough
+                to block a move. Defaults to None, the blocking ghosts are searched in a grid.
+
+        Returns:
+            numpy array: for each ghost, True if it didn't move because the place was already occupied
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        velocity_x, velocity_y = self.velocity_x[:n], self.velocity_y[:n]
+        scale = self.time_scale
+        self.previous_x[:n] = x
+        self.previous_y[:n] = y
+        target_x, target_y = x + velocity_x * scale, y + velocity_y * scale
+        if neighbors is None:
+            blocking, _, _ = self._pairs(target_x, target_y, x, y, self.collision_distance)
+            blocked = np.bincount(blocking, minlength=n) > 0
+        else:
+            # Each pair once: the end of the move of each of its ghosts is tested against the other ghost
+            first, second, _ = neighbors
+            limit = self.collision_distance ** 2
+            blocked = np.zeros(n, dtype=bool)
+            dx, dy = target_x[first] - x[second], target_y[first] - y[second]
+            blocked[first[dx * dx + dy * dy < limit]] = True
+            dx, dy = target_x[second] - x[first], target_y[second] - y[first]
+            blocked[second[dx * dx + dy * dy < limit]] = True
+        free = ~blocked
+        x[free] = target_x[free]
+        y[free] = target_y[free]
+        return blocked
+
+    def broadphase(self, cell_size):
+        """
+        Function to sort the ghosts by cell once for the queries of a tick (near, overlaps)
+
+        Args:
+            cell_size (float): size of the cells, at least the largest radius of the queries
+
+        Returns:
+            NeighborGrid: grid of the positions, None when the flock is small enough to test all the pairs
+        """
+        n = self.count
+        if n * n <= 4096:
+            return None
+        return NeighborGrid(self.x[:n], self.y[:n], cell_size)
+
+    def near(self, x, y, radius, grid=None):
+        """
+        Function to find the ghosts touching a point (pacman), with squared distances and no square root
+
+        Args:
+            x (float): x coords of the point
+            y (float): y coords of the point
+            radius (float): distance under which a ghost touches the point
+            grid (NeighborGrid, optional): broadphase of the tick, only the cells around the point are read.
+                Defaults to None, every ghost is tested.
+
+        Returns:
+            numpy array: index of the ghosts closer than radius
+        """
+        n = self.count
+        if grid is not None:
+            _, ghosts, _ = self._pairs(np.array([float(x)]), np.array([float(y)]), self.x[:n], self.y[:n], radius,
+                                       np.array([-1]), grid) # The point is not a ghost
+            return np.sort(ghosts)
+        dx = self.x[:n] - x
+        dy = self.y[:n] - y
+        return np.flatnonzero(dx * dx + dy * dy < radius * radius)
+
+    def overlaps(self, radius=None, grid=None):
+        """
+        Function to find the pairs of ghosts closer than a distance, each pair once
+
+        Args:
+            radius (float, optional): distance under which two ghosts overlap. Defaults to collision_distance.
+            grid (NeighborGrid, optional): broadphase of the tick. Defaults to None, it is built for this query.
+
+        Returns:
+            tuple: index of the first ghosts and index of the second ghosts, the first index is the lower
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        radius = self.collision_distance if radius is None else radius
+        if grid is None and n * n <= 4096:
+            # Small flock: the upper triangle of all the pairs is each pair once
+            dx = x[:, None] - x[None, :]
+            dy = y[:, None] - y[None, :]
+            return np.nonzero(np.triu(dx * dx + dy * dy < radius * radius, 1))
+        i, j, _ = self._pairs(x, y, x, y, radius, grid=grid)
+        first = i < j
+        return i[first], j[first]
+
+    def _neighbors(self, grid=None):
+        """
+        Find the pairs of ghosts closer than perception_radius, each pair once.
+        grid is a NeighborGrid of the positions with cells of at least half perception_radius,
+        built by the call when None.
+
+        Returns:
+            tuple: index of the first ghosts, index of the second ghosts, squared distances
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        radius = self.perception_radius
+        if n * n <= 4096:
+            i, j, distance_squared = self._pairs(x, y, x, y, radius)
+            first = i < j
+            return i[first], j[first], distance_squared[first]
+        if grid is None:
+            grid = NeighborGrid(x, y, radius / 2)
+        return grid.pairs(radius)
+
+    def _limit(self, vector_x, vector_y):
+        """Scale down in place the vectors longer than max_speed."""
+        speed_squared = vector_x * vector_x + vector_y * vector_y
+        too_fast = np.flatnonzero(speed_squared > self.max_speed ** 2)
+        scale = self.max_speed / np.sqrt(speed_squared[too_fast])
+        vector_x[too_fast] *= scale
+        vector_y[too_fast] *= scale
+
+    @staticmethod
+    def _pairs(query_x, query_y, point_x, point_y, radius, query_ids=None, grid=None):
+        """
+        Find the (query, point) pairs closer than radius, a query never pairs with the point of the same index.
+        query_ids gives the index of the point of each query when the queries are a part of the points,
+        -1 for a query which is not a point.
+
+        The points and the queries are sorted by grid cell, see NeighborGrid. grid is the NeighborGrid
+        of the points, with cells at least radius wide, built by the call when None.
+
+        Returns:
+            tuple: index of the queries, index of the points, squared distances
+        """
+        empty = np.zeros(0, dtype=np.intp)
+        if len(point_x) == 0 or len(query_x) == 0:
+            return empty, empty, np.zeros(0)
+
+        if len(query_x) * len(point_x) <= 4096:
+            # Small flock: all the pairs at once is cheaper than sorting into cells
+            dx = query_x[:, None] - point_x[None, :]
+            dy = query_y[:, None] - point_y[None, :]
+            distance_squared = dx * dx + dy * dy
+            if query_ids is None:
+                np.fill_diagonal(distance_squared, np.inf) # A ghost is not its own neighbor
+            else:
+                points = np.flatnonzero(query_ids >= 0)
+                distance_squared[points, query_ids[points]] = np.inf
+            query_index, point_index = np.nonzero(distance_squared < radius * radius)
+            return query_index, point_index, distance_squared[query_index, point_index]
+
+        if grid is None:
+            grid = NeighborGrid(point_x, point_y, radius)
+        if query_x is point_x and query_y is point_y:
+            query_order, query_keys = grid.order, grid.point_keys # The queries are the points, already sorted
+        else:
+            query_keys = grid.keys(query_x, query_y)
+            query_order = np.argsort(query_keys, kind="stable")
+            query_keys = query_keys[query_order]
+        sorted_query_x, sorted_query_y = query_x[query_order], query_y[query_order]
+
+        # The 9 cells around each query are 3 runs of 3 cells of consecutive keys (one run per column), and the
+        # sorted points of a run are contiguous: expand each [start, end) range of sorted points without a Python loop
+        width = grid.width
+        offsets = np.arange(-1, 2) * width
+        cell_keys = query_keys[:, None] + offsets[None, :]
+        start, _ = grid.find((cell_keys - 1).ravel())
+        _, end = grid.find((cell_keys + 1).ravel())
+        counts = end - start
+        total = counts.sum()
+        if total == 0:
+            return empty, empty, np.zeros(0)
+        first = np.cumsum(counts) - counts
+        query_counts = counts.reshape(-1, len(offsets)).sum(axis=1)
+        point_index = np.repeat(start - first, counts) + np.arange(total)
+        dx = np.repeat(sorted_query_x, query_counts) - grid.x[point_index]
+        dy = np.repeat(sorted_query_y, query_counts) - grid.y[point_index]
+        distance_squared = dx * dx + dy * dy
+        keep = np.flatnonzero(distance_squared < radius * radius)
+        query_index = np.repeat(query_order, query_counts)[keep]
+        point_index = grid.order[point_index[keep]]
+        distance_squared = distance_squared[keep]
+        different = (query_index if query_ids is None else query_ids[query_index]) != point_index
+        return query_index[different], point_index[different], distance_squared[different]
+
+
+class NeighborGrid:
+    """
+    Class to sort points by grid cell (cells of radius size), so a query only reads the 9 cells
+    around it instead of all the points, and reads them from contiguous memory.
+    A grid built once serves many calls of FlockEngine._pairs on the same points.
+    """
+    def __init__(self, point_x, point_y, radius):
+        """
+        Initialisation function of the class
+
+        Args:
+            point_x (numpy array): x coords of the points, not empty
+            point_y (numpy array): y coords of the points
+            radius (float): size of the cells
+        """
+        self.radius = radius
+        column = np.floor(point_x / radius).astype(np.intp)
+        row = np.floor(point_y / radius).astype(np.intp)
+        # Two empty cells around the points: the queries are kept within them, and the cells read around a query
+        # (one cell) or around a point by pairs (two cells) stay in the grid
+        self.min_column, self.max_column = column.min() - 2, column.max() + 2
+        self.min_row, self.max_row = row.min() - 2, row.max() + 2
+        self.width = self.max_row - self.min_row + 3 # Keeps the cell keys of different columns apart
+        keys = self._key(column, row)
+        cell_count = (self.max_column - self.min_column + 3) * self.width
+        # NumPy sorts 16 bits keys with a radix sort, about ten times faster than the sort of 64 bits keys
+        self.order = np.argsort(keys.astype(np.uint16) if cell_count <= 1 << 16 else keys, kind="stable")
+        self.point_keys = keys[self.order]
+        self.x, self.y = point_x[self.order], point_y[self.order]
+
+        if cell_count <= 8 * len(point_x) + 4096:
+            # Small grid: table of the first sorted point of every cell, read by direct indexing
+            self.cell_starts = np.zeros(cell_count + 1, dtype=np.intp)
+            np.cumsum(np.bincount(self.point_keys, minlength=cell_count), out=self.cell_starts[1:])
+        else:
+            # Sparse points on a huge area: binary search in the sorted keys
+            self.cell_starts = None
+
+    def _key(self, column, row):
+        """Key of the cells, in the order of the columns then of the rows."""
+        return (column - self.min_column + 1) * self.width + (row - self.min_row + 1)
+
+    def keys(self, query_x, query_y):
+        """
+        Function to give the cell of queries. A query more than a cell away from the points is moved to
+        the edge of the grid, it has no point in its 9 cells either way.
+
+        Args:
+            query_x (numpy array): x coords of the queries
+            query_y (numpy array): y coords of the queries
+
+        Returns:
+            numpy array: cell key of each query
+        """
+        column = np.clip(np.floor(query_x / self.radius), self.min_column, self.max_column).astype(np.intp)
+        row = np.clip(np.floor(query_y / self.radius), self.min_row, self.max_row).astype(np.intp)
+        return self._key(column, row)
+
+    def pairs(self, radius):
+        """
+        Function to find the pairs of points closer than a distance, each pair once. With cells of half the
+        distance, a point is paired with the points after it in its cell and in the 2 next cells of its column,
+        and with the 5 cells around its row in each of the 2 next columns: 3 runs of sorted points
+        covering a third less area than the 3 cells by 3 cells of radius size read by FlockEngine._pairs.
+
+        Args:
+            radius (float): distance of the pairs, at most twice the size of the cells
+
+        Returns:
+            tuple: index of the first points, index of the second points, squared distances
+        """
+        keys = self.point_keys
+        reach = int(np.ceil(radius / self.radius)) # Cells read on each side of a point
+        points = np.arange(len(keys))
+        _, end = self.find(keys + reach)
+        starts, counts = [points + 1], [end - points - 1]
+        for column in range(1, reach + 1):
+            start, _ = self.find(keys + column * self.width - reach)
+            _, end = self.find(keys + column * self.width + reach)
+            starts.append(start)
+            counts.append(end - start)
+        starts = np.stack(starts, axis=1).ravel()
+        counts = np.stack(counts, axis=1).ravel()
+        total = counts.sum()
+        first = np.cumsum(counts) - counts
+        second = np.repeat(starts - first, counts) + np.arange(total)
+        first = np.repeat(points, counts.reshape(-1, reach + 1).sum(axis=1))
+        dx = self.x[first] - self.x[second]
+        dy = self.y[first] - self.y[second]
+        distance_squared = dx * dx + dy * dy
+        keep = np.flatnonzero(distance_squared < radius * radius)
+        return self.order[first[keep]], self.order[second[keep]], distance_squared[keep]
+
+    def find(self, cell_keys):
+        """
+        Function to give the sorted points of cells
+
+        Args:
+            cell_keys (numpy array): keys of the cells
+
+        Returns:
+            tuple: first sorted point of each cell and the sorted point after its last one
+        """
+        if self.cell_starts is not None:
+            return self.cell_starts[cell_keys], self.cell_starts[cell_keys + 1]
+        return (np.searchsorted(self.point_keys, cell_keys, side="left"),
+                np.searchsorted(self.point_keys, cell_keys, side="right"))
+
+
+# Hot paths timed while the profiler is enabled
+PROFILER.instrument(FlockEngine, "step")
+PROFILER.instrument(FlockEngine, "steer")
@@ -0,0 +1,176 @@
+import heapq
+import time
+from collections import deque
+
+
+class LoopStats:
+    """
+    Class to keep the timings of the last frames of a GameLoop
+
+    """
+    def __init__(self, size=300):
+        """
+        Initialisation function of the class
+
+        Args:
+            size (int, optional): number of frames kept. Defaults to 300.
+        """
+        self.frame_times = deque(maxlen=size)  # Seconds between two frames
+        self.tick_times = deque(maxlen=size)   # Seconds spent in one tick
+        self.latencies = deque(maxlen=size)    # Seconds from a key press to the tick moving pacman that way
+        self.ticks = 0
+        self.frames = 0
+        self.overruns = 0                      # Frames where the ticks couldn't catch up with real time
+
+    def summary(self):
+        """
+        Function to sum up the timings
+
+        Returns:
+            dict: frame and tick times and input latency in milliseconds, counts of ticks, frames and overruns
+        """
+        def milliseconds(values, share):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(int(share * len(ordered)), len(ordered) - 1)] * 1000
+
+        return {
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "frame_ms_mean": sum(self.frame_times) / len(self.frame_times) * 1000 if self.frame_times else 0.0,
+            "frame_ms_p95": milliseconds(self.frame_times, 0.95),
+            "frame_ms_max": milliseconds(self.frame_times, 1.0),
+            "tick_ms_mean": sum(self.tick_times) / len(self.tick_times) * 1000 if self.tick_times else 0.0,
+            "tick_ms_p95": milliseconds(self.tick_times, 0.95),
+            "tick_ms_max": milliseconds(self.tick_times, 1.0),
+            "latency_ms_mean": sum(self.latencies) / len(self.latencies) * 1000 if self.latencies else 0.0,
+            "latency_ms_p95": milliseconds(self.latencies, 0.95),
+        }
+
+
+class GameLoop:
+    """
+    Class to run the whole game from a single timer.
+
+    The simulation advances by fixed ticks (tick_rate per second) and the drawing is done once per frame,
+    with the fraction of tick not simulated yet so the renderers can interpolate. The entities
+    schedule their delayed actions with after(), which runs them on the ticks instead of adding Tk timers.
+    """
+    def __init__(self, widget, tick_rate=30, frame_rate=60, max_ticks_per_frame=5):
+        """
+        Initialisation function of the class
+
+        Args:
+            widget (tkinter widget): widget used for the frame timer, None to drive the loop with advance()
+            tick_rate (int, optional): simulation ticks per second. Defaults to 30.
+            frame_rate (int, optional): frames drawn per second. Defaults to 60.
+            max_ticks_per_frame (int, optional): ticks allowed in one frame before dropping the late time. Defaults to 5.
+        """
+        self.widget = widget
+        self.tick_duration = 1 / tick_rate
+        self.frame_delay = max(1, round(1000 / frame_rate))
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.updates = []     # Called once per tick
+        self.renderers = []   # Called once per frame with the interpolation factor
+        self.timers = []      # Heap of (simulated time, order, callback, args)
+        self.timer_order = 0
+        self.time = 0.0       # Simulated time in seconds
+        self.accumulator = 0.0
+        self.previous = None
+        self.running = False
+        self.stats = LoopStats()
+
+    def add(self, update):
+        """
+        Add a function called on every tick
+
+        Args:
+            update (function): function without argument
+        """
+        self.updates.append(update)
+
+    def add_renderer(self, render):
+        """
+        Add a function called on every frame
+
+        Args:
+            render (function): function taking the interpolation factor between the last two ticks (0 to 1)
+        """
+        self.renderers.append(render)
+
+    def after(self, delay, callback, *args):
+        """
+        Call a function on the first tick at least delay milliseconds later, like tkinter after
+
+        Args:
+            delay (int): delay in milliseconds of simulated time
+            callback (function): function to call
+            args: arguments given to the function
+        """
+        self.timer_order += 1
+        heapq.heappush(self.timers, (self.time + delay / 1000, self.timer_order, callback, args))
+
+    def start(self):
+        """
+        Start the frame timer
+        """
+        self.running = True
+        self.previous = time.perf_counter()
+        self.widget.after(self.frame_delay, self._frame)
+
+    def stop(self):
+        """
+        Stop the frame timer
+        """
+        self.running = False
+
+    def _frame(self):
+        if not self.running:
+            return
+        now = time.perf_counter()
+        self.advance(now - self.previous)
+        self.previous = now
+        self.widget.after(self.frame_delay, self._frame)
+
+    def advance(self, elapsed):
+        """
+        Run the ticks covering elapsed seconds of real time then draw one frame
+
+        Args:
+            elapsed (float): seconds since the last frame
+        """
+        self.stats.frames += 1
+        self.stats.frame_times.append(elapsed)
+        self.accumulator += elapsed
+
+        ticks = 0
+        while self.accumulator >= self.tick_duration:
+            if ticks == self.max_ticks_per_frame:
+                # The ticks are slower than real time, drop the late time instead of spiraling
+                self.stats.overruns += 1
+                self.accumulator = 0.0
+                break
+            self.tick()
+            self.accumulator -= self.tick_duration
+            ticks += 1
+
+        alpha = self.accumulator / self.tick_duration
+        for render in self.renderers:
+            render(alpha)
+
+    def tick(self):
+        """
+        Advance the simulation by one fixed tick: due timers first, then the updates
+        """
+        start = time.perf_counter()
+        self.time += self.tick_duration
+        timers = self.timers
+        while timers and timers[0][0] <= self.time + 1e-9: # Tolerance for the rounding of the summed ticks
+            _, _, callback, args = heapq.heappop(timers)
+            callback(*args)
+        for update in self.updates:
+            update()
+        self.stats.ticks += 1
+        self.stats.tick_times.append(time.perf_counter() - start)
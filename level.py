@@ -0,0 +1,174 @@
+import mmap
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+# Header of a level file: magic, columns, rows, chunk size (tiles), cell size (pixels)
+MAGIC = b"PACLVL01"
+HEADER = struct.Struct("<8sIIHH")
+CHUNK_SIZE = 32
+
+
+def layout_to_array(layout):
+    """
+    Function to convert the rows of a layout ("1" for a wall) into an array
+
+    Args:
+        layout (list): rows of the map
+
+    Returns:
+        numpy array: (rows, columns) array, 1 for a wall and 0 for a corridor
+    """
+    columns = max(len(row) for row in layout)
+    walls = np.zeros((len(layout), columns), dtype=np.uint8)
+    for y, row in enumerate(layout):
+        walls[y, :len(row)] = np.frombuffer(row.encode(), dtype=np.uint8) == ord("1")
+    return walls
+
+
+def save_level(path, walls, cell_size=30, chunk_size=CHUNK_SIZE):
+    """
+    Function to write a level file.
+
+    The map is cut in square chunks of chunk_size tiles stored one after the other, each chunk
+    holds 1 bit per tile. Every chunk has the same size, so a chunk is read at a known offset
+    without reading the rest of the file. The chunks are written one band of rows at a time,
+    walls can be a numpy memmap larger than the memory.
+
+    Args:
+        path (str): path of the level file
+        walls (numpy array): (rows, columns) array, non zero for a wall
+        cell_size (int, optional): size of a tile in pixels. Defaults to 30.
+        chunk_size (int, optional): size of a chunk in tiles, a multiple of 8. Defaults to CHUNK_SIZE.
+    """
+    if chunk_size % 8:
+        raise ValueError(f"chunk_size must be a multiple of 8, got {chunk_size}")
+    rows, columns = walls.shape
+    chunks_x = -(-columns // chunk_size)
+    chunks_y = -(-rows // chunk_size)
+    band = np.zeros((chunk_size, chunks_x * chunk_size), dtype=np.uint8)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, columns, rows, chunk_size, cell_size))
+        for chunk_y in range(chunks_y):
+            rows_of_band = walls[chunk_y * chunk_size:(chunk_y + 1) * chunk_size]
+            band[:] = 0 # The chunks on the borders are padded with corridors
+            band[:len(rows_of_band), :columns] = rows_of_band != 0
+            # (row, chunk, column) -> (chunk, row, column), then 1 bit per tile
+            chunks = band.reshape(chunk_size, chunks_x, chunk_size).transpose(1, 0, 2)
+            file.write(np.packbits(chunks.reshape(chunks_x, -1), axis=1).tobytes())
+
+
+class LevelFile:
+    """
+    Class to read a level file lazily.
+
+    The file is memory-mapped, opening it only reads the header. A chunk is unpacked the first
+    time one of its tiles is read, and only the last max_chunks chunks are kept, so the memory
+    doesn't depend on the size of the level.
+
+    The level can be indexed like the bytearray grid of a Map (grid[row * columns + column]),
+    so it can be used as the grid of a Map.
+    """
+    def __init__(self, path, max_chunks=256):
+        """
+        Initialisation function of the class
+
+        Args:
+            path (str): path of the level file
+            max_chunks (int, optional): number of unpacked chunks kept in memory. Defaults to 256.
+        """
+        self.path = path
+        self.max_chunks = max_chunks
+        with open(path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.columns, self.rows, self.chunk_size, self.cell_size = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a level file")
+        self.chunks_x = -(-self.columns // self.chunk_size)
+        self.chunks_y = -(-self.rows // self.chunk_size)
+        self.chunk_bytes = self.chunk_size * self.chunk_size // 8
+        expected = HEADER.size + self.chunks_x * self.chunks_y * self.chunk_bytes
+        if len(self.mmap) != expected:
+            raise ValueError(f"{path} is truncated: {len(self.mmap)} bytes instead of {expected}")
+        self.data = np.frombuffer(self.mmap, dtype=np.uint8, offset=HEADER.size)
+        self.chunks = OrderedDict() # (chunk_x, chunk_y) -> unpacked chunk, the oldest first
+
+    def close(self):
+        """Function to release the file, the level can't be read anymore"""
+        self.chunks.clear()
+        self.data = None
+        self.mmap.close()
+
+    def chunk(self, chunk_x, chunk_y):
+        """
+        Function to give the tiles of a chunk
+
+        Args:
+            chunk_x (int): column of the chunk
+            chunk_y (int): row of the chunk
+
+        Returns:
+            numpy array: (chunk_size, chunk_size) array, 1 for a wall
+        """
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        start = (chunk_y * self.chunks_x + chunk_x) * self.chunk_bytes
+        chunk = np.unpackbits(self.data[start:start + self.chunk_bytes]).reshape(self.chunk_size, self.chunk_size)
+        self.chunks[key] = chunk
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    def chunks_in(self, x1, y1, x2, y2):
+        """
+        Function to give the chunks under a rectangle of the canvas
+
+        Args:
+            x1 (int): left of the rectangle
+            y1 (int): top of the rectangle
+            x2 (int): right of the rectangle
+            y2 (int): bottom of the rectangle
+
+        Returns:
+            list: (chunk_x, chunk_y) of each chunk inside the level
+        """
+        size = self.chunk_size * self.cell_size
+        first_x, last_x = max(int(x1 // size), 0), min(int(x2 // size), self.chunks_x - 1)
+        first_y, last_y = max(int(y1 // size), 0), min(int(y2 // size), self.chunks_y - 1)
+        return [(chunk_x, chunk_y) for chunk_y in range(first_y, last_y + 1) for chunk_x in range(first_x, last_x + 1)]
+
+    def __len__(self):
+        return self.columns * self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._span(index)
+        if index < 0:
+            index += len(self)
+        row, column = divmod(index, self.columns)
+        size = self.chunk_size
+        return int(self.chunk(column // size, row // size)[row % size, column % size])
+
+    def _span(self, index):
+        """Tiles of a slice of the flat grid, read chunk by chunk along each row"""
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            return bytes(self[i] for i in range(start, stop, step))
+        size, columns = self.chunk_size, self.columns
+        parts = []
+        while start < stop:
+            row, column = divmod(start, columns)
+            end = min(stop - row * columns, columns) # Last column (excluded) of the slice on this row
+            while column < end:
+                chunk_x = column // size
+                last = min(end, (chunk_x + 1) * size)
+                parts.append(self.chunk(chunk_x, row // size)[row % size, column % size:last - chunk_x * size])
+                column = last
+            start = (row + 1) * columns
+        if len(parts) == 1:
+            return parts[0].tobytes() # Most slices are a few tiles of one chunk (collisions)
+        return np.concatenate(parts).tobytes() if parts else b""
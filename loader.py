@@ -0,0 +1,123 @@
+import functools
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import ASSETS, decode_image
+from sprites import SPRITES
+
+
+class AssetLoader:
+    """
+    Class to load the assets and the levels in background threads while tkinter keeps running.
+
+    The jobs (decoding images, parsing files, building maps) run in a pool of threads. Tkinter can
+    only be used by its own thread, so the results are queued and the tkinter thread picks them up
+    every few milliseconds: it creates the tkinter images and calls the callbacks of the jobs.
+    A failed job or callback is reported and counted as done, the other jobs go on.
+    """
+    def __init__(self, widget, assets=ASSETS, workers=4, poll_ms=15):
+        """
+        Initialisation function of the class
+
+        Args:
+            widget (tkinter widget): widget whose after() polls the finished jobs
+            assets (AssetManager, optional): assets receiving the images. Defaults to ASSETS.
+            workers (int, optional): number of threads. Defaults to 4.
+            poll_ms (int, optional): milliseconds between two polls of the finished jobs. Defaults to 15.
+        """
+        self.widget = widget
+        self.assets = assets
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader")
+        self.results = queue.Queue() # (future, then) of the finished jobs, filled by the threads
+        self.total = 0
+        self.done = 0
+        self.errors = [] # Exceptions of the failed jobs and callbacks
+        self.on_progress = None
+        self.on_done = None
+        self.on_error = None
+
+    def add(self, function, *args, then=None):
+        """
+        Function to run a job in a thread, it can be called by a callback to add more jobs
+
+        Args:
+            function (function): job, it must not use tkinter
+            args: arguments of the job
+            then (function, optional): called in the tkinter thread with the result of the job. Defaults to None.
+        """
+        self.total += 1
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda future: self.results.put((future, then)))
+
+    def add_images(self, paths):
+        """
+        Function to decode images in threads, their tkinter images are then made in the tkinter thread
+
+        Args:
+            paths (iterable): paths of the images
+        """
+        for path in paths:
+            if path not in self.assets.photos:
+                self.add(decode_image, path, then=functools.partial(self._add_photo, path))
+
+    def add_sprites(self, variants, sprites=SPRITES):
+        """
+        Function to make sprite variants in threads, their tkinter images are then made in the tkinter thread
+
+        Args:
+            variants (dict): name -> (path, transform, size) or list of them, see SpriteCache.pacman_variants
+            sprites (SpriteCache, optional): cache of the variants. Defaults to SPRITES.
+        """
+        for value in variants.values():
+            for variant in value if isinstance(value, list) else [value]:
+                self.add(sprites.image, *variant, then=lambda _, variant=variant: sprites.photo(*variant))
+
+    def _add_photo(self, path, result):
+        image, seconds = result
+        if path not in self.assets.images: # The same path may be asked twice
+            self.assets.decode_time += seconds
+            self.assets.add_image(path, image)
+        self.assets.load_photo(path) # Only the tkinter thread may create a tkinter image
+
+    def start(self, on_progress=None, on_done=None, on_error=None):
+        """
+        Function to start polling the finished jobs
+
+        Args:
+            on_progress (function, optional): called with (done, total) after each poll finishing jobs. Defaults to None.
+            on_done (function, optional): called once every job and callback is done, if none failed. Defaults to None.
+            on_error (function, optional): called with the exception of each failed job or callback. Defaults to None.
+        """
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.widget.after(0, self._poll)
+
+    def _poll(self):
+        finished = 0
+        while True:
+            try:
+                future, then = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                result = future.result() # A failed job raises here, in the tkinter thread
+                if then is not None:
+                    then(result)
+            except Exception as error: # Raised on, it would stop the polling and the loading would never end
+                traceback.print_exception(error)
+                self.errors.append(error)
+                if self.on_error is not None:
+                    self.on_error(error)
+            self.done += 1
+            finished += 1
+        if finished and self.on_progress is not None:
+            self.on_progress(self.done, self.total)
+        if self.done == self.total:
+            self.executor.shutdown(wait=False)
+            if self.on_done is not None and not self.errors:
+                self.on_done()
+            return
+        self.widget.after(self.poll_ms, self._poll)
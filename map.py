@@ -1,70 +1,311 @@
+import numpy as np
+
+from level import LevelFile, layout_to_array
+from maze_render import render_chunk, render_maze, render_tiles
+from profiler import PROFILER
+
+CELL_SIZE = 30
+TILE_CHARACTERS = bytes.maketrans(b"\x00\x01", b"01") # Byte of the grid -> character of the layout
+SWEEP_GAP = 1e-6 # Distance kept between a swept box and the wall it stops against, the walls are closed rectangles
+
+MAP_LAYOUT = [
+    "0000000000000000000000000",
+    
+    "0111111111111111111111110",
+    "0100000000001000000000010",
+    "0101110111101011110111010",
+    "0101110111101011110111010",
+    "0100000000000000000000010",
+    "0101110110111110110111010",
+    "0100000110001000110000010",
+    "0111110111000001110111110",
+    "0111110100000000010111110",
+    "0111110101110111010111110",
+    "0100000101000001010000010",
+    "0101100001000001000011010",
+    "0100000101000001010000010",
+    "0111110101111111010111110",
+    "0111110100000000010111110",
+    "0111110111000001110111110",
+    "0100000110001000110000010",
+    "0101110110111110110111110",
+    "0100000000000000000000010",
+    "0101110111101011110111010",
+    "0101110111101011110111010",
+    "0100000000000000000000010",
+    "0111111111111111111111110",
+    
+    "0000000000000000000000000"
+]
+
+
 class Map:
     """
     Class to manage the map game
     
     """
-    def __init__(self, canvas):
+    def __init__(self, canvas, layout=None, cell_size=CELL_SIZE, level=None):
         """
         Initialisation function of the class
 
         Args:
-            canvas (tkinter canvas): canvas to display the map of the game
+            canvas (tkinter canvas): canvas to display the map of the game, None to only build the collisions
+            layout (list, optional): rows of the map, "1" for a wall and "0" for a corridor. Defaults to MAP_LAYOUT.
+            cell_size (int, optional): size of a cell in pixels. Defaults to CELL_SIZE.
+            level (LevelFile, optional): level file read lazily instead of the layout. Defaults to None.
         """
         self.canvas = canvas
-        self.wall_coords = self.generate_map()
+        self.level = level
+        self.chunk_items = {} # (chunk_x, chunk_y) -> (canvas item, image) of the chunks drawn
+        self.free_chunk_items = [] # Hidden items of the chunks which left the view, reused by the next ones
+        self.edited_rows = set() # Rows of the layout to rebuild from the grid, changed by set_tile
+        self.version = 0 # Number of edits, what is computed from the grid compares it to know if it is out of date
+        self.edit_listeners = [] # Functions called with (column, row, wall) after each edit
+        if level is not None:
+            # The level file is the grid, its chunks are only read when a tile is
+            self._layout = None
+            self.cell_size = level.cell_size
+            self.rows, self.columns = level.rows, level.columns
+            self.grid = level
+            self.wall_coords = None # Not built for a level, it would hold every wall of the file
+        else:
+            self._layout = list(layout if layout is not None else MAP_LAYOUT) # Own copy, set_tile changes it
+            self.cell_size = cell_size
+            self.rows = len(self.layout)
+            self.columns = max(len(row) for row in self.layout)
+            self.grid = bytearray(self.columns * self.rows) # 1 byte per tile, 1 if the tile is a wall
+            self.wall_coords = self.generate_map()
+        self.width = self.columns * self.cell_size
+        self.height = self.rows * self.cell_size
+        if self.canvas is not None:
+            self.draw_map()
+
+    @classmethod
+    def load(cls, canvas, path, max_chunks=256):
+        """
+        Function to open a map from a level file, see level.save_level
+
+        Args:
+            canvas (tkinter canvas): canvas to display the map of the game, None to only build the collisions
+            path (str): path of the level file
+            max_chunks (int, optional): number of unpacked chunks kept in memory. Defaults to 256.
+
+        Returns:
+            Map: map reading the level file
+        """
+        return cls(canvas, level=LevelFile(path, max_chunks=max_chunks))
+
+    @property
+    def layout(self):
+        """Rows of the map, "1" for a wall, the rows changed by set_tile are rebuilt when read"""
+        if self.edited_rows:
+            columns = self.columns
+            for row in self.edited_rows:
+                self._layout[row] = self.grid[row * columns:(row + 1) * columns].translate(TILE_CHARACTERS).decode()
+            self.edited_rows.clear()
+        return self._layout
 
     def generate_map(self):
         """
-        Function to generate the map
+        Function to generate the map, it only builds the collisions, draw_map displays it
 
         Returns:
             list: return where are the walls 
         """
-        map_ = [
-            "0000000000000000000000000",
-            
-            "0111111111111111111111110",
-            "0100000000001000000000010",
-            "0101110111101011110111010",
-            "0101110111101011110111010",
-            "0100000000000000000000010",
-            "0101110110111110110111010",
-            "0100000110001000110000010",
-            "0111110111000001110111110",
-            "0111110100000000010111110",
-            "0111110101110111010111110",
-            "0100000101000001010000010",
-            "0101100001000001000011010",
-            "0100000101000001010000010",
-            "0111110101111111010111110",
-            "0111110100000000010111110",
-            "0111110111000001110111110",
-            "0100000110001000110000010",
-            "0101110110111110110111110",
-            "0100000000000000000000010",
-            "0101110111101011110111010",
-            "0101110111101011110111010",
-            "0100000000000000000000010",
-            "0111111111111111111111110",
-            
-            "0000000000000000000000000"
-        ]
-
-        wall_coords = []
-        cell_size = 30
-        for y, row in enumerate(map_):
-            for x, cell in enumerate(row):
-                if cell == "1": # When the cell is equal to 1, it's a wall so we draw a line
-                    x1, y1 = x * cell_size, y * cell_size
-                    x2, y2 = x1 + cell_size, y1 + cell_size
-                    self.canvas.create_line(x1, y1, x2, y1, fill="white", width=0.5)
-                    self.canvas.create_line(x1, y1, x1, y2, fill="white", width=0.5)
-                    self.canvas.create_line(x2, y1, x2, y2, fill="white", width=0.5)
-                    self.canvas.create_line(x1, y2, x2, y2, fill="white", width=0.5)
-                    wall_coords.append((x1, y1, x2, y2))
-                
+        walls = layout_to_array(self.layout) # 1 where the cell is equal to 1, it's a wall
+        self.grid[:] = walls.tobytes()
+        rows_of, columns_of = np.nonzero(walls) # Row after row, like the layout
+        columns_of, rows_of = columns_of.tolist(), rows_of.tolist()
+        cell_size = self.cell_size
+        wall_coords = [(x * cell_size, y * cell_size, (x + 1) * cell_size, (y + 1) * cell_size)
+                       for x, y in zip(columns_of, rows_of)]
+        # Index in wall_coords of the wall of each tile (row * columns + column), -1 for a corridor,
+        # set_tile finds a wall without a search
+        self.wall_index = np.full(self.columns * self.rows, -1, dtype=np.int64)
+        self.wall_index[np.flatnonzero(walls)] = np.arange(len(wall_coords))
         return wall_coords
 
+    def set_tile(self, column, row, wall=True):
+        """
+        Function to put or remove a wall while the game runs.
+        The grid and wall_coords are updated in place and, if the maze is drawn, only the outlines
+        around the tile are drawn again, so the cost doesn't depend on the size of the map.
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+            wall (bool, optional): True to put a wall, False to make a corridor. Defaults to True.
+
+        Raises:
+            ValueError: the map is read from a level file, it can't be changed
+            IndexError: the tile is outside of the map
+
+        Returns:
+            bool: True if the tile changed
+        """
+        if self.level is not None:
+            raise ValueError("a map read from a level file can't be edited")
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            raise IndexError(f"tile ({column}, {row}) is outside of the {self.columns}x{self.rows} map")
+        index = row * self.columns + column
+        if self.grid[index] == wall:
+            return False
+        self.grid[index] = 1 if wall else 0
+        self.edited_rows.add(row)
+
+        # wall_coords has no order, a removed wall is replaced by the last one
+        wall_coords, wall_index, cell_size = self.wall_coords, self.wall_index, self.cell_size
+        if wall:
+            x1, y1 = column * cell_size, row * cell_size
+            wall_index[index] = len(wall_coords)
+            wall_coords.append((x1, y1, x1 + cell_size, y1 + cell_size))
+        else:
+            position = int(wall_index[index])
+            wall_index[index] = -1
+            last = wall_coords.pop()
+            if position < len(wall_coords):
+                wall_coords[position] = last
+                wall_index[last[1] // cell_size * self.columns + last[0] // cell_size] = position
+
+        if self.canvas is not None and getattr(self, "maze_image", None) is not None:
+            self.redraw_tiles(column, row, column, row)
+        self.version += 1
+        for listener in self.edit_listeners:
+            listener(column, row, bool(wall))
+        return True
+
+    def add_edit_listener(self, listener):
+        """
+        Function to be told of the edits of the map, to update what was computed from its tiles
+
+        Args:
+            listener (function): called with (column, row, wall) after each tile changed by set_tile
+        """
+        self.edit_listeners.append(listener)
+
+    def clear_tile(self, column, row):
+        """
+        Function to remove the wall of a tile, see set_tile
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+
+        Returns:
+            bool: True if the tile was a wall
+        """
+        return self.set_tile(column, row, wall=False)
+
+    def redraw_tiles(self, first_column, first_row, last_column, last_row):
+        """
+        Function to draw again the outlines of a rectangle of tiles into the image of the maze.
+        Only the pixels of these tiles are replaced in the tkinter image, the rest of the maze is kept.
+
+        Args:
+            first_column (int): left column of the rectangle
+            first_row (int): top row of the rectangle
+            last_column (int): right column of the rectangle
+            last_row (int): bottom row of the rectangle
+        """
+        from PIL import ImageTk
+        patch = ImageTk.PhotoImage(render_tiles(self, first_column, first_row, last_column, last_row))
+        # The "set" rule replaces the pixels with the transparent ones too, where a wall was removed
+        self.canvas.tk.call(str(self.maze_image), "copy", str(patch), "-to",
+                            first_column * self.cell_size, first_row * self.cell_size, "-compositingrule", "set")
+
+    def draw_map(self):
+        """
+        Function to draw the walls on the canvas.
+        The walls are rendered once in an image, so the canvas only holds one item for the whole maze.
+        A level file is too large for one image, only the chunks under the canvas are drawn.
+        """
+        if self.level is not None:
+            self.draw_region(0, 0, int(self.canvas.cget("width")), int(self.canvas.cget("height")))
+            return
+        from PIL import ImageTk # Only the drawing needs tkinter, the headless games don't load it
+        self.maze_image = ImageTk.PhotoImage(render_maze(self)) # Keep a reference or tkinter frees the image
+        self.maze_item = self.canvas.create_image(0, 0, image=self.maze_image, anchor="nw")
+
+    def draw_region(self, x1, y1, x2, y2):
+        """
+        Function to draw the chunks of a level file under a rectangle of the canvas, it can be given to Camera.add.
+        The items of the chunks drawn before and outside of the rectangle are hidden and reused,
+        so the canvas and the memory only hold the chunks near the viewport.
+        A map built from a layout is a single item, nothing is done.
+
+        Args:
+            x1 (int): left of the rectangle
+            y1 (int): top of the rectangle
+            x2 (int): right of the rectangle
+            y2 (int): bottom of the rectangle
+        """
+        if self.level is None:
+            return
+        from PIL import ImageTk
+        visible = set(self.level.chunks_in(x1, y1, x2, y2))
+        for key in [key for key in self.chunk_items if key not in visible]:
+            item, _ = self.chunk_items.pop(key)
+            self.canvas.itemconfig(item, state="hidden")
+            self.free_chunk_items.append(item)
+        size = self.level.chunk_size * self.cell_size
+        for chunk_x, chunk_y in visible:
+            if (chunk_x, chunk_y) not in self.chunk_items:
+                image = ImageTk.PhotoImage(render_chunk(self.level, chunk_x, chunk_y))
+                if self.free_chunk_items:
+                    item = self.free_chunk_items.pop()
+                    self.canvas.coords(item, chunk_x * size, chunk_y * size)
+                    self.canvas.itemconfig(item, image=image, state="normal")
+                else:
+                    item = self.canvas.create_image(chunk_x * size, chunk_y * size, image=image, anchor="nw")
+                self.chunk_items[(chunk_x, chunk_y)] = (item, image) # Keep a reference or tkinter frees the image
+                self.canvas.tag_lower(item) # The walls stay under the sprites
+
+    def is_wall(self, column, row):
+        """
+        Check if a tile of the map is a wall
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+
+        Returns:
+            bool: True if the tile is a wall, False if it's a corridor or outside of the map
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.grid[row * self.columns + column] == 1
+        return False
+
+    def tile_at(self, x, y):
+        """
+        Give the tile under a point of the canvas
+
+        Args:
+            x (int): x coords of the point
+            y (int): y coords of the point
+
+        Returns:
+            tuple: (column, row) of the tile
+        """
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _tile_span(self, low, high):
+        """
+        Give the first and the last tile touched by a segment on one axis.
+        The walls are closed rectangles, so a coordinate lying exactly on a
+        tile border touches the tiles on both sides of it.
+
+        Args:
+            low (int): start of the segment
+            high (int): end of the segment
+
+        Returns:
+            tuple: (first, last) index of the tiles
+        """
+        first = int(low // self.cell_size)
+        if low % self.cell_size == 0:
+            first -= 1
+        return first, int(high // self.cell_size)
+
     def check_collision(self, new_x, new_y):
         """
         Check if the player hit a wall or not by the wall and the player coords.
@@ -76,8 +317,191 @@ class Map:
         Returns:
             bool : return True if the player hit a wall, False if not
         """
-        for (x1, y1, x2, y2) in self.wall_coords:
-            if x1 <= new_x <= x2 and y1 <= new_y <= y2: # Check if the player's coords (new_x, new_y) are between the coords of the wall
-                return True # The player hit the wall
+        return self.check_collision_box(new_x, new_y, new_x, new_y)
+
+    def check_collision_box(self, x1, y1, x2, y2):
+        """
+        Check if a rectangle (the bounding box of a sprite) hit a wall.
+        Only the tiles under the rectangle are read, so the cost doesn't depend on the number of walls.
+
+        Args:
+            x1 (int): left of the rectangle
+            y1 (int): top of the rectangle
+            x2 (int): right of the rectangle
+            y2 (int): bottom of the rectangle
+
+        Returns:
+            bool: return True if the rectangle hit a wall, False if not
+        """
+        first_column, last_column = self._tile_span(x1, x2)
+        first_row, last_row = self._tile_span(y1, y2)
+        first_column, last_column = max(first_column, 0), min(last_column, self.columns - 1)
+        first_row, last_row = max(first_row, 0), min(last_row, self.rows - 1)
+        if first_column > last_column or first_row > last_row:
+            return False # The rectangle is outside of the map
+
+        grid, columns = self.grid, self.columns
+        for row in range(first_row, last_row + 1):
+            start = row * columns
+            if any(grid[start + first_column:start + last_column + 1]):
+                return True # One of the tiles under the rectangle is a wall
             
-        return False
\ No newline at end of file
+        return False
+
+    def sweep(self, x, y, dx, dy, half_width=0, half_height=0):
+        """
+        Move a rectangle (the bounding box of a sprite) and stop it against the first wall on its way.
+
+        The move is done on x then on y, and every tile column (then row) crossed by the leading
+        side of the rectangle is read (a DDA walk of the grid), so a fast sprite can't jump over
+        a wall and a sprite blocked on one axis still slides along the wall on the other one.
+
+        Args:
+            x (float): x coords of the center of the rectangle
+            y (float): y coords of the center of the rectangle
+            dx (float): move on x
+            dy (float): move on y
+            half_width (float, optional): half of the width of the rectangle. Defaults to 0 (a point).
+            half_height (float, optional): half of the height of the rectangle. Defaults to 0 (a point).
+
+        Returns:
+            tuple: (x, y, hit_x, hit_y), the position reached and True on the axes stopped by a wall
+        """
+        is_wall = self.is_wall
+        x, hit_x = self._sweep_axis(x, y, dx, half_width, half_height, self.columns, self.rows,
+                                    lambda along, across: is_wall(along, across))
+        y, hit_y = self._sweep_axis(y, x, dy, half_height, half_width, self.rows, self.columns,
+                                    lambda along, across: is_wall(across, along))
+        return x, y, hit_x, hit_y
+
+    def _sweep_axis(self, position, other, delta, half_along, half_across, along_count, across_count, wall):
+        """Move along one axis until the first line of tiles holding a wall, see sweep"""
+        if delta == 0:
+            return position, False
+        first_across, last_across = self._tile_span(other - half_across, other + half_across)
+        first_across, last_across = max(first_across, 0), min(last_across, across_count - 1)
+        if first_across > last_across:
+            return position + delta, False # Outside of the map, there are no walls
+
+        cell_size = self.cell_size
+        if delta > 0:
+            edge = position + half_along
+            start, end = int(edge // cell_size), int((edge + delta) // cell_size)
+            step = 1
+        else:
+            edge = position - half_along
+            start, end = self._tile_span(edge, edge)[0], self._tile_span(edge + delta, edge + delta)[0]
+            step = -1
+        for line in range(start, end + step, step):
+            if not 0 <= line < along_count:
+                continue
+            if any(wall(line, across) for across in range(first_across, last_across + 1)):
+                if line == start:
+                    return position, True # Already against the wall
+                if delta > 0:
+                    return line * cell_size - SWEEP_GAP - half_along, True
+                return (line + 1) * cell_size + SWEEP_GAP + half_along, True
+        return position + delta, False
+
+    def sweep_many(self, x, y, dx, dy, half_width=0, half_height=0):
+        """
+        Sweep many rectangles at once, see sweep. Each step of the walk is done for all the
+        rectangles together, so the cost is a few numpy operations per tile crossed, not per rectangle.
+
+        Args:
+            x (numpy array): x coords of the centers
+            y (numpy array): y coords of the centers
+            dx (numpy array): moves on x
+            dy (numpy array): moves on y
+            half_width (float, optional): half of the width of the rectangles. Defaults to 0 (points).
+            half_height (float, optional): half of the height of the rectangles. Defaults to 0 (points).
+
+        Returns:
+            tuple: (x, y, hit_x, hit_y) arrays
+        """
+        if self.level is not None:
+            # A level file is read chunk by chunk, one rectangle at a time
+            moved = [self.sweep(*values, half_width, half_height) for values in zip(x, y, dx, dy)]
+            x, y, hit_x, hit_y = zip(*moved) if moved else ((), (), (), ())
+            return np.array(x, dtype=float), np.array(y, dtype=float), np.array(hit_x, dtype=bool), np.array(hit_y, dtype=bool)
+        grid = np.frombuffer(self.grid, dtype=np.uint8).reshape(self.rows, self.columns)
+        x, hit_x = self._sweep_axis_many(np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                                         np.asarray(dx, dtype=float), half_width, half_height, grid.T)
+        y, hit_y = self._sweep_axis_many(np.asarray(y, dtype=float), x, np.asarray(dy, dtype=float),
+                                         half_height, half_width, grid)
+        return x, y, hit_x, hit_y
+
+    def _sweep_axis_many(self, position, other, delta, half_along, half_across, grid):
+        """Vectorized _sweep_axis, grid is indexed [along, across]"""
+        cell_size = self.cell_size
+        along_count, across_count = grid.shape
+
+        def first_tile(low):
+            # First tile touched by a low side, a side on a tile border touches the tile before it too
+            tile = np.floor(low / cell_size).astype(np.intp)
+            return tile - (low % cell_size == 0)
+
+        first_across = np.maximum(first_tile(other - half_across), 0)
+        last_across = np.minimum(np.floor((other + half_across) / cell_size).astype(np.intp), across_count - 1)
+        forward = delta > 0
+        edge = np.where(forward, position + half_along, position - half_along)
+        start = np.where(forward, np.floor(edge / cell_size).astype(np.intp), first_tile(edge))
+        end = np.where(forward, np.floor((edge + delta) / cell_size).astype(np.intp), first_tile(edge + delta))
+        step = np.where(forward, 1, -1)
+        lines = np.abs(end - start)
+        active = (delta != 0) & (first_across <= last_across)
+
+        hit = np.zeros(len(position), dtype=bool)
+        hit_line = np.zeros(len(position), dtype=np.intp)
+        across_span = int((last_across - first_across).max(initial=0)) + 1
+        for k in range(int(lines[active].max(initial=-1)) + 1):
+            line = start + k * step
+            walking = active & ~hit & (k <= lines) & (line >= 0) & (line < along_count)
+            if not walking.any():
+                continue
+            wall = np.zeros(len(position), dtype=bool)
+            for offset in range(across_span):
+                across = first_across + offset
+                check = walking & (across <= last_across)
+                wall[check] |= grid[line[check], across[check]] != 0
+            hit_line[wall] = line[wall]
+            hit |= wall
+
+        contact = np.where(forward, hit_line * cell_size - SWEEP_GAP - half_along,
+                           (hit_line + 1) * cell_size + SWEEP_GAP + half_along)
+        result = np.where(hit, np.where(hit_line == start, position, contact), position + delta)
+        return result, hit
+
+    def check_collisions(self, points):
+        """
+        Check the collisions of many points at once (ghosts, pacman...)
+
+        Args:
+            points (iterable): (x, y) coords of each point
+
+        Returns:
+            list: a bool per point, True if the point hit a wall
+        """
+        check_collision_box = self.check_collision_box
+        return [check_collision_box(x, y, x, y) for (x, y) in points]
+
+    def check_collisions_box(self, boxes):
+        """
+        Check the collisions of many rectangles at once
+
+        Args:
+            boxes (iterable): (x1, y1, x2, y2) coords of each rectangle
+
+        Returns:
+            list: a bool per rectangle, True if the rectangle hit a wall
+        """
+        check_collision_box = self.check_collision_box
+        return [check_collision_box(x1, y1, x2, y2) for (x1, y1, x2, y2) in boxes]
+
+
+# Hot paths timed while the profiler is enabled
+PROFILER.instrument(Map, "check_collision")
+
+# The moves of the World (pacman and the ghosts) through the tile grid, timed as hot paths too
+PROFILER.instrument(Map, "sweep")
+PROFILER.instrument(Map, "sweep_many")
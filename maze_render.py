@@ -0,0 +1,145 @@
+import hashlib
+
+from PIL import Image, ImageDraw
+
+# Rendered mazes, keyed by the hash of the layout and the cell size
+_maze_cache = {}
+
+
+def wall_segments(grid, columns, rows, cell_size):
+    """
+    Function to merge the sides of the walls into the longest possible lines.
+
+    A side shared by two walls is kept once and the sides in a row are joined,
+    so a corridor of 10 walls gives 4 lines instead of 40.
+
+    Args:
+        grid (bytearray): 1 per wall tile, row after row
+        columns (int): number of columns of the grid
+        rows (int): number of rows of the grid
+        cell_size (int): size of a tile in pixels
+
+    Returns:
+        list: (x1, y1, x2, y2) of each line
+    """
+    def wall(column, row):
+        return 0 <= column < columns and 0 <= row < rows and grid[row * columns + column] == 1
+
+    segments = []
+    # Horizontal lines: the border y between the row above and the row below
+    for border in range(rows + 1):
+        start = None
+        for column in range(columns + 1):
+            edge = column < columns and (wall(column, border - 1) or wall(column, border))
+            if edge and start is None:
+                start = column
+            elif not edge and start is not None:
+                segments.append((start * cell_size, border * cell_size, column * cell_size, border * cell_size))
+                start = None
+    # Vertical lines: the border x between the column on the left and the column on the right
+    for border in range(columns + 1):
+        start = None
+        for row in range(rows + 1):
+            edge = row < rows and (wall(border - 1, row) or wall(border, row))
+            if edge and start is None:
+                start = row
+            elif not edge and start is not None:
+                segments.append((border * cell_size, start * cell_size, border * cell_size, row * cell_size))
+                start = None
+    return segments
+
+
+def layout_key(layout, cell_size):
+    """
+    Function to give the key of a layout in the cache
+
+    Args:
+        layout (list): rows of the map
+        cell_size (int): size of a tile in pixels
+
+    Returns:
+        str: hash of the layout and the cell size
+    """
+    digest = hashlib.sha1("\n".join(layout).encode())
+    digest.update(str(cell_size).encode())
+    return digest.hexdigest()
+
+
+def render_maze(map_, color="white"):
+    """
+    Function to draw all the walls of a map in a single image, only once per layout
+
+    Args:
+        map_ (Map): map to draw
+        color (str, optional): color of the walls. Defaults to "white".
+
+    Returns:
+        PIL Image: transparent image of the size of the map with the walls
+    """
+    key = layout_key(map_.layout, map_.cell_size)
+    image = _maze_cache.get(key)
+    if image is None:
+        # One more pixel so the lines on the right and bottom borders are inside the image
+        image = Image.new("RGBA", (map_.width + 1, map_.height + 1), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        for segment in wall_segments(map_.grid, map_.columns, map_.rows, map_.cell_size):
+            draw.line(segment, fill=color, width=1)
+        _maze_cache[key] = image
+    return image
+
+
+def render_tiles(map_, first_column, first_row, last_column, last_row, color="white"):
+    """
+    Function to draw the walls of a rectangle of tiles of a map, to replace these pixels in the maze image.
+    The sides of the tiles depend on their neighbours, the walls are merged over the rectangle and
+    the tiles around it, then the lines outside of the rectangle are cut by the image.
+
+    Args:
+        map_ (Map): map to draw
+        first_column (int): left column of the rectangle
+        first_row (int): top row of the rectangle
+        last_column (int): right column of the rectangle
+        last_row (int): bottom row of the rectangle
+        color (str, optional): color of the walls. Defaults to "white".
+
+    Returns:
+        PIL Image: transparent image of the rectangle, with one more pixel for the lines on its right and bottom
+    """
+    cell_size, columns = map_.cell_size, map_.columns
+    around_column, around_row = max(first_column - 1, 0), max(first_row - 1, 0)
+    end_column, end_row = min(last_column + 2, columns), min(last_row + 2, map_.rows)
+    width = end_column - around_column
+    grid = b"".join(map_.grid[row * columns + around_column:row * columns + end_column]
+                    for row in range(around_row, end_row))
+
+    image = Image.new("RGBA", ((last_column - first_column + 1) * cell_size + 1,
+                               (last_row - first_row + 1) * cell_size + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    offset_x = (around_column - first_column) * cell_size
+    offset_y = (around_row - first_row) * cell_size
+    for x1, y1, x2, y2 in wall_segments(grid, width, end_row - around_row, cell_size):
+        draw.line((x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y), fill=color, width=1)
+    return image
+
+
+def render_chunk(level, chunk_x, chunk_y, color="white"):
+    """
+    Function to draw the walls of one chunk of a level file.
+    The chunks are not cached, only the chunks near the viewport are drawn and kept by the Map.
+
+    Args:
+        level (LevelFile): level of the chunk
+        chunk_x (int): column of the chunk
+        chunk_y (int): row of the chunk
+        color (str, optional): color of the walls. Defaults to "white".
+
+    Returns:
+        PIL Image: transparent image of the size of the chunk with the walls
+    """
+    size, cell_size = level.chunk_size, level.cell_size
+    image = Image.new("RGBA", (size * cell_size + 1, size * cell_size + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    # A wall on the border of a chunk draws the shared side, so the neighbour chunk may draw it again
+    for segment in wall_segments(level.chunk(chunk_x, chunk_y).tobytes(), size, size, cell_size):
+        draw.line(segment, fill=color, width=1)
+    return image
@@ -1,79 +1,58 @@
-import json
-from PIL import ImageTk, Image
+from assets import ASSETS
+from sprites import SPRITES
+from profiler import PROFILER
 
 class Pacman:
     """
     Class to manage the pacman
     
     """
-    def __init__(self, canvas, position_x, position_y, map_):
+    __slots__ = ("renderer", "state", "pacman_image", "image_sprite")
+
+    def __init__(self, renderer, state):
         """
         Initialisation function of the class
 
         Args:
-            canvas (tkinter): canvas to create the pacman
-            position_x (int): position of pacman on x
-            position_y (int): position of pacman on y
-            map_ (None): map of the game
+            renderer (SpriteRenderer): renderer of the canvas to create the pacman
+            state (PacmanState): position and direction of pacman in the World, the class only draws it
         """
-        self.canvas = canvas
-        self.position_x = position_x
-        self.position_y = position_y
-        self.speed = 10
-        self.current_direction = "Right"
+        self.renderer = renderer
+        self.state = state
         self.pacman_image = self.load_images()
-        self.map_ = map_
         
-        self.image_sprite = self.canvas.create_image(
-            self.position_x, self.position_y, image=self.pacman_image["Right"][0], anchor="center"
+        self.image_sprite = self.renderer.create(
+            self.state.x, self.state.y, self.pacman_image[self.state.direction][0], anchor="center"
         )
         
     def load_images(self):
         """
         Function to load the images of pacman
         
-        Return the image wanted according to the json file
+        Return the image wanted according to the json file, the directions are made from a single image
         """
-        with open("map.json", "r") as file:
-            data = json.load(file)
+        data = ASSETS.load_json("map.json")
 
         pacman_image = {}
-        for pacman_direction, paths in data["pacman_directions"].items():
-            pacman_image[pacman_direction] = [ImageTk.PhotoImage(Image.open(path)) for path in paths]
+        photos = SPRITES.photos_of(SPRITES.pacman_variants(data["sprites"]["pacman"]))
+        for pacman_direction, photo in photos.items():
+            pacman_image[pacman_direction] = [photo] # Shared with the other pacman instances
         
         return pacman_image
         
-    def move(self, event):
+    def render(self, alpha=1.0):
         """
-        Function to move the pacman
+        Function to draw the pacman where the World moved it
 
         Args:
-            event (tkinter event): use to use the keyboard
+            alpha (float, optional): fraction of the step between the previous and the current position. Defaults to 1.
         """
-        new_x = self.position_x
-        new_y = self.position_y
-        
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        
-        if event.keysym == "Right":         # The sprite go to the right
-            new_x += self.speed
-            self.current_direction = "Right"
-        elif event.keysym == "Left":        # The sprite go to the left
-            new_x -= self.speed
-            self.current_direction = "Left"
-        elif event.keysym == "Up":          # The sprite go up
-            new_y -= self.speed
-            self.current_direction = "Up"
-        elif event.keysym == "Down":        # The sprite go down
-            new_y += self.speed
-            self.current_direction = "Down"
-            
-        # Check if the player hit a wall
-        if 1 <= new_x <= canvas_width - 1 and 1 <= new_y <= canvas_height - 1:
-            if not self.map_.check_collision(new_x, new_y):
-                self.position_x, self.position_y = new_x, new_y
-        
-        # Update the position & the image
-        self.canvas.coords(self.image_sprite, self.position_x, self.position_y)
-        self.canvas.itemconfig(self.image_sprite, image=self.pacman_image[self.current_direction][0])
+        x = self.state.previous_x + (self.state.x - self.state.previous_x) * alpha
+        y = self.state.previous_y + (self.state.y - self.state.previous_y) * alpha
+
+        # Update the position & the image, the renderer only sends what changed
+        self.renderer.set(self.image_sprite, x, y, self.pacman_image[self.state.direction][0])
+
+
+# Hot paths timed while the profiler is enabled
+PROFILER.instrument(Pacman, "render")
@@ -0,0 +1,166 @@
+import heapq
+from array import array
+from collections import deque
+
+# Moves to the 4 neighbor tiles
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+UNREACHABLE = -1
+
+
+def astar(map_, start, goal):
+    """
+    Function to find the shortest path between two tiles, walls excluded
+
+    Args:
+        map_ (Map): map of the game
+        start (tuple): (column, row) of the first tile
+        goal (tuple): (column, row) of the last tile
+
+    Returns:
+        list: (column, row) of the tiles from start to goal included, None if goal can't be reached
+    """
+    columns, rows, grid = map_.columns, map_.rows, map_.grid
+    if map_.is_wall(*start) or map_.is_wall(*goal):
+        return None
+    goal_column, goal_row = goal
+
+    came_from = {start: None}
+    cost = {start: 0}
+    opened = [(abs(start[0] - goal_column) + abs(start[1] - goal_row), 0, start)]
+    while opened:
+        _, current_cost, current = heapq.heappop(opened)
+        if current == goal:
+            path = []
+            while current is not None:
+                path.append(current)
+                current = came_from[current]
+            return path[::-1]
+        if current_cost > cost[current]:
+            continue # Already reached with a lower cost
+
+        column, row = current
+        for dx, dy in NEIGHBORS:
+            next_column, next_row = column + dx, row + dy
+            if not (0 <= next_column < columns and 0 <= next_row < rows) or grid[next_row * columns + next_column]:
+                continue
+            neighbor = (next_column, next_row)
+            next_cost = current_cost + 1
+            if next_cost < cost.get(neighbor, next_cost + 1):
+                cost[neighbor] = next_cost
+                came_from[neighbor] = current
+                # Manhattan distance, never more than the real distance on a 4 neighbors grid
+                estimate = next_cost + abs(next_column - goal_column) + abs(next_row - goal_row)
+                heapq.heappush(opened, (estimate, next_cost, neighbor))
+    return None
+
+
+class DistanceField:
+    """
+    Class to keep the distance in tiles from every tile of the map to one target tile.
+
+    It is computed once by a breadth first search from the target, then any number of ghosts
+    find their way by going to the neighbor tile with the lowest distance.
+    """
+    def __init__(self, map_):
+        """
+        Initialisation function of the class
+
+        Args:
+            map_ (Map): map of the game
+        """
+        self.map = map_
+        self.target = None
+        self.version = None # Version of the map the distances were computed on
+        self.distances = array("i", [UNREACHABLE]) * (map_.columns * map_.rows)
+
+    def update(self, target):
+        """
+        Function to compute the distances to a new target, only if it or the map changed
+
+        Args:
+            target (tuple): (column, row) of the target tile
+
+        Returns:
+            bool: True if the distances were computed again
+        """
+        if target == self.target and self.version == self.map.version:
+            return False
+        self.target, self.version = target, self.map.version
+
+        columns, rows, grid = self.map.columns, self.map.rows, self.map.grid
+        distances = self.distances
+        distances[:] = array("i", [UNREACHABLE]) * len(distances)
+        if not (0 <= target[0] < columns and 0 <= target[1] < rows) or self.map.is_wall(*target):
+            return True # Nothing can reach the target
+
+        distances[target[1] * columns + target[0]] = 0
+        queue = deque([target])
+        while queue:
+            column, row = queue.popleft()
+            next_distance = distances[row * columns + column] + 1
+            for dx, dy in NEIGHBORS:
+                next_column, next_row = column + dx, row + dy
+                if 0 <= next_column < columns and 0 <= next_row < rows:
+                    index = next_row * columns + next_column
+                    if not grid[index] and distances[index] == UNREACHABLE:
+                        distances[index] = next_distance
+                        queue.append((next_column, next_row))
+        return True
+
+    def distance(self, column, row):
+        """
+        Function to give the distance of a tile to the target
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+
+        Returns:
+            int: number of tiles to the target, UNREACHABLE if there is no path
+        """
+        if 0 <= column < self.map.columns and 0 <= row < self.map.rows:
+            return self.distances[row * self.map.columns + column]
+        return UNREACHABLE
+
+    def next_tile(self, column, row):
+        """
+        Function to give the next tile on a shortest path to the target
+
+        Args:
+            column (int): column of the current tile
+            row (int): row of the current tile
+
+        Returns:
+            tuple: (column, row) of the next tile, None if the tile is the target or can't reach it
+        """
+        best, best_distance = None, self.distance(column, row)
+        if best_distance <= 0:
+            return None
+        for dx, dy in NEIGHBORS:
+            distance = self.distance(column + dx, row + dy)
+            if distance != UNREACHABLE and distance < best_distance:
+                best, best_distance = (column + dx, row + dy), distance
+        return best
+
+
+
+class ChaseField(DistanceField):
+    """
+    Class to share the way to pacman between all the ghosts.
+
+    follow() is called by every ghost with the position of pacman, the distances are only
+    computed again when pacman goes to another tile or the map is edited.
+    """
+    def follow(self, x, y):
+        """
+        Function to aim at the tile under a point
+
+        Args:
+            x (int): x coords of pacman
+            y (int): y coords of pacman
+
+        Returns:
+            bool: True if the distances were computed again
+        """
+        return self.update(self.map.tile_at(x, y))
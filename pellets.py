@@ -0,0 +1,267 @@
+from collections import deque
+
+import numpy as np
+
+from pathfinding import DistanceField, NEIGHBORS, UNREACHABLE
+
+PELLET_POINTS = 10
+POWER_POINTS = 50
+
+
+class Pellets:
+    """
+    Class to keep the pellets left on the map, without any drawing.
+
+    The pellets are a bool array aligned with the grid of the map (index row * columns + column),
+    so eating a pellet is one read and one write, and the pellets left are a counter kept with them.
+    """
+    def __init__(self, map_, start, power_tiles=None):
+        """
+        Initialisation function of the class
+
+        Args:
+            map_ (Map): map of the game
+            start (tuple): (column, row) of pacman, a pellet is put on every corridor reachable from it
+            power_tiles (list, optional): (column, row) of the power pellets. Defaults to the tiles nearest to the corners.
+        """
+        self.map = map_
+        self.columns = map_.columns
+        field = DistanceField(map_)
+        field.update(start)
+        reachable = np.frombuffer(field.distances, dtype=np.int32) != UNREACHABLE
+        self.reachable = reachable # Corridors pacman can reach, the edits of the map change them
+        self.version = 0 # Number of changes made by the edits of the map, the drawing compares it
+        self.pellets = reachable.copy()
+        self.power = np.zeros_like(reachable)
+        if power_tiles is None:
+            power_tiles = self._corner_tiles(reachable)
+        for column, row in power_tiles:
+            self.power[row * self.columns + column] = True
+        self.pellets &= ~self.power # A tile holds a pellet or a power pellet, not both
+        self.remaining = int(np.count_nonzero(self.pellets)) + int(np.count_nonzero(self.power))
+
+    def _corner_tiles(self, reachable):
+        """Reachable tiles nearest to each corner of the map"""
+        rows_of, columns_of = np.divmod(np.flatnonzero(reachable), self.columns)
+        if not len(rows_of):
+            return []
+        tiles = set()
+        for corner_column, corner_row in ((0, 0), (self.columns - 1, 0), (0, self.map.rows - 1),
+                                          (self.columns - 1, self.map.rows - 1)):
+            nearest = np.argmin(np.abs(columns_of - corner_column) + np.abs(rows_of - corner_row))
+            tiles.add((int(columns_of[nearest]), int(rows_of[nearest])))
+        return sorted(tiles)
+
+    def eat(self, column, row):
+        """
+        Function to eat the pellet of a tile
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+
+        Returns:
+            int: points won, 0 if the tile had no pellet
+        """
+        if not (0 <= column < self.columns and 0 <= row < self.map.rows):
+            return 0
+        index = row * self.columns + column
+        if self.pellets[index]:
+            self.pellets[index] = False
+            self.remaining -= 1
+            return PELLET_POINTS
+        if self.power[index]:
+            self.power[index] = False
+            self.remaining -= 1
+            return POWER_POINTS
+        return 0
+
+    def set_tile(self, column, row, wall, origin):
+        """
+        Function to follow an edit of the map.
+        A new wall takes the pellet of its tile and of the corridors it cuts from pacman (see _cut), only a wall
+        between two reachable corridors can cut some. A new corridor joined to the reachable ones gets a pellet,
+        like the corridors it opens, so only the tiles reached again are visited.
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+            wall (bool): True if a wall was put, False if it was removed
+            origin (tuple): (column, row) of pacman
+        """
+        columns, rows, grid = self.columns, self.map.rows, self.map.grid
+        index = row * columns + column
+        corridors = self._corridors(column, row)
+        if wall:
+            was_reachable = self.reachable[index]
+            self._drop(index)
+            self.reachable[index] = False
+            seeds = [tile for tile in corridors if self.reachable[tile[1] * columns + tile[0]]]
+            if was_reachable and len(seeds) > 1:
+                self._cut(seeds, origin)
+        elif any(self.reachable[next_row * columns + next_column] for next_column, next_row in corridors):
+            tiles = [(column, row)]
+            self._add(index)
+            while tiles:
+                column, row = tiles.pop()
+                for dx, dy in NEIGHBORS:
+                    next_column, next_row = column + dx, row + dy
+                    next_index = next_row * columns + next_column
+                    if (0 <= next_column < columns and 0 <= next_row < rows and not grid[next_index]
+                            and not self.reachable[next_index]):
+                        self._add(next_index)
+                        tiles.append((next_column, next_row))
+        self.version += 1
+
+    def _corridors(self, column, row):
+        """Corridor tiles next to a tile"""
+        columns, rows, grid = self.columns, self.map.rows, self.map.grid
+        return [(column + dx, row + dy) for dx, dy in NEIGHBORS
+                if 0 <= column + dx < columns and 0 <= row + dy < rows and not grid[(row + dy) * columns + column + dx]]
+
+    def _cut(self, seeds, origin):
+        """
+        Drop the pellets of the corridors a new wall cuts from pacman. One flood starts from each reachable
+        corridor next to the wall, they advance a tile in turn and two floods meeting grow as one part,
+        until at most one part can still grow: the other parts are closed and found whole. So the cost is
+        the size of the parts cut off (or of the loop joining the floods), not the size of the map.
+
+        pacman keeps the parts holding its tile. On a wall (the new one or an older one) it keeps the parts
+        of the corridors around its tile, it leaves the wall into one of them.
+        """
+        columns = self.columns
+        queues = [deque([tile]) for tile in seeds]
+        flood_of = {column + row * columns: flood for flood, (column, row) in enumerate(seeds)} # Tile -> flood
+        part_of = list(range(len(seeds))) # Flood -> part, the floods which met share a part
+        while len({part_of[flood] for flood, queue in enumerate(queues) if queue}) > 1:
+            for flood, queue in enumerate(queues):
+                if not queue:
+                    continue
+                column, row = queue.popleft()
+                for next_column, next_row in self._corridors(column, row):
+                    next_index = next_row * columns + next_column
+                    other = flood_of.get(next_index)
+                    if other is None:
+                        flood_of[next_index] = flood
+                        queue.append((next_column, next_row))
+                    elif part_of[other] != part_of[flood]:
+                        joined = part_of[other]
+                        part_of = [part_of[flood] if part == joined else part for part in part_of]
+
+        growing = {part_of[flood] for flood, queue in enumerate(queues) if queue}
+        kept = set() # Parts of pacman, None for the part still growing
+        for column, row in self._corridors(*origin) if self.map.is_wall(*origin) else [origin]:
+            flood = flood_of.get(row * columns + column)
+            part = None if flood is None else part_of[flood]
+            kept.add(None if part in growing else part) # A tile not found by a closed part is in the growing one
+        closed = {index: part_of[flood] for index, flood in flood_of.items() if part_of[flood] not in growing}
+        if None in kept or not kept:
+            # pacman is in the part still growing, the closed parts are cut
+            for index, part in closed.items():
+                if part not in kept:
+                    self._drop(index)
+                    self.reachable[index] = False
+        else:
+            # pacman is in closed parts, all the other corridors are cut
+            reachable = np.zeros_like(self.reachable)
+            reachable[[index for index, part in closed.items() if part in kept]] = True
+            self.pellets &= reachable
+            self.power &= reachable
+            self.remaining = int(np.count_nonzero(self.pellets)) + int(np.count_nonzero(self.power))
+            self.reachable = reachable
+
+    def _drop(self, index):
+        """Remove the pellet of a tile, without points"""
+        if self.pellets[index] or self.power[index]:
+            self.pellets[index] = self.power[index] = False
+            self.remaining -= 1
+
+    def _add(self, index):
+        """Put a pellet on a tile which becomes reachable"""
+        self.reachable[index] = self.pellets[index] = True
+        self.remaining += 1
+
+    def tiles_in(self, first_column, first_row, last_column, last_row):
+        """
+        Function to give the pellets inside a rectangle of tiles
+
+        Args:
+            first_column (int): first column of the rectangle
+            first_row (int): first row of the rectangle
+            last_column (int): last column of the rectangle (included)
+            last_row (int): last row of the rectangle (included)
+
+        Returns:
+            list: (index, power) of each pellet, index is row * columns + column
+        """
+        first_column, last_column = max(first_column, 0), min(last_column, self.columns - 1)
+        first_row, last_row = max(first_row, 0), min(last_row, self.map.rows - 1)
+        if first_column > last_column or first_row > last_row:
+            return []
+        shape = (self.map.rows, self.columns)
+        region = (slice(first_row, last_row + 1), slice(first_column, last_column + 1))
+        tiles = []
+        for grid, power in ((self.pellets, False), (self.power, True)):
+            rows_of, columns_of = np.nonzero(grid.reshape(shape)[region])
+            tiles.extend(((row + first_row) * self.columns + column + first_column, power)
+                         for row, column in zip(rows_of.tolist(), columns_of.tolist()))
+        return tiles
+
+
+class PelletSprites:
+    """
+    Class to draw the pellets.
+
+    A pellet is a canvas item created once and never updated, eating it deletes its item.
+    Only the pellets in the region given to draw_region have an item, so a large map doesn't
+    fill the canvas.
+    """
+    def __init__(self, canvas, pellets, color="#ffb897"):
+        """
+        Initialisation function of the class
+
+        Args:
+            canvas (tkinter canvas): canvas of the game
+            pellets (Pellets): pellets to draw
+            color (str, optional): color of the pellets. Defaults to "#ffb897".
+        """
+        self.canvas = canvas
+        self.pellets = pellets
+        self.color = color
+        self.items = {} # index of the tile -> canvas item
+
+    def draw_region(self, x1, y1, x2, y2):
+        """
+        Function to draw the pellets under a rectangle of the canvas, it can be given to Camera.add
+
+        Args:
+            x1 (int): left of the rectangle
+            y1 (int): top of the rectangle
+            x2 (int): right of the rectangle
+            y2 (int): bottom of the rectangle
+        """
+        map_ = self.pellets.map
+        first_column, first_row = map_.tile_at(x1, y1)
+        last_column, last_row = map_.tile_at(x2, y2)
+        visible = dict(self.pellets.tiles_in(first_column, first_row, last_column, last_row))
+        for index in [index for index in self.items if index not in visible]:
+            self.canvas.delete(self.items.pop(index))
+        cell_size, columns = map_.cell_size, map_.columns
+        for index, power in visible.items():
+            if index not in self.items:
+                row, column = divmod(index, columns)
+                x, y = column * cell_size + cell_size / 2, row * cell_size + cell_size / 2
+                radius = cell_size / 4 if power else cell_size / 12
+                self.items[index] = self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                                            fill=self.color, outline="")
+
+    def remove(self, index):
+        """
+        Function to delete the item of an eaten pellet
+
+        Args:
+            index (int): index of the tile, row * columns + column
+        """
+        item = self.items.pop(index, None)
+        if item is not None:
+            self.canvas.delete(item)
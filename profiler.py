@@ -0,0 +1,228 @@
+import csv
+import functools
+import json
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    """Context manager timing a block of code for a Profiler"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Class to measure where the time goes in the game.
+
+    The hot paths are registered with instrument() but only wrapped while the profiler is enabled,
+    so a disabled profiler leaves the original methods in place and costs nothing.
+    """
+    def __init__(self, window=300, trace_size=100_000):
+        """
+        Initialisation function of the class
+
+        Args:
+            window (int, optional): number of timings kept per name for the histograms. Defaults to 300.
+            trace_size (int, optional): number of timings kept for the export of the session. Defaults to 100 000.
+        """
+        self.enabled = False
+        self.window = window
+        self.timings = {}                       # name -> last durations in seconds
+        self.calls = {}                         # name -> number of calls since enabled
+        self.trace = deque(maxlen=trace_size)   # (start, name, duration) of the session
+        self.hot_paths = []                     # (owner, attribute, name) registered by instrument
+        self.originals = {}                     # (owner, attribute) -> original method while enabled
+        self.canvas = None
+        self.hud_item = None
+        self.hud_frames = 0
+
+    def instrument(self, owner, attribute, name=None):
+        """
+        Register a method to time while the profiler is enabled
+
+        Args:
+            owner (class): class of the method
+            attribute (str): name of the method
+            name (str, optional): name of the timings. Defaults to "Class.method".
+        """
+        self.hot_paths.append((owner, attribute, name or f"{owner.__name__}.{attribute}"))
+        if self.enabled:
+            self._wrap(owner, attribute, self.hot_paths[-1][2])
+
+    def _wrap(self, owner, attribute, name):
+        original = owner.__dict__[attribute]
+        record = self.record
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+
+        self.originals[(owner, attribute)] = original
+        setattr(owner, attribute, timed)
+
+    def enable(self):
+        """
+        Start timing the hot paths
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        for owner, attribute, name in self.hot_paths:
+            self._wrap(owner, attribute, name)
+
+    def disable(self):
+        """
+        Stop timing and put back the original methods
+        """
+        if not self.enabled:
+            return
+        self.enabled = False
+        for (owner, attribute), original in self.originals.items():
+            setattr(owner, attribute, original)
+        self.originals.clear()
+
+    def span(self, name):
+        """
+        Give a context manager timing the block of code under it
+
+        Args:
+            name (str): name of the timings
+
+        Returns:
+            context manager: does nothing when the profiler is disabled
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start, duration):
+        """
+        Function to store a timing
+
+        Args:
+            name (str): name of the timings
+            start (float): perf_counter at the start
+            duration (float): duration in seconds
+        """
+        timings = self.timings.get(name)
+        if timings is None:
+            timings = self.timings[name] = deque(maxlen=self.window)
+            self.calls[name] = 0
+        timings.append(duration)
+        self.calls[name] += 1
+        self.trace.append((start, name, duration))
+
+    def summary(self):
+        """
+        Function to sum up the last timings of each name
+
+        Returns:
+            dict: name -> calls, mean, 95th percentile and max in milliseconds
+        """
+        result = {}
+        for name, timings in self.timings.items():
+            ordered = sorted(timings)
+            result[name] = {
+                "calls": self.calls[name],
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p95_ms": ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+    def export(self, path):
+        """
+        Function to write the trace of the session in path.json and path.csv
+
+        Args:
+            path (str): path of the files without the extension
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".json", "w") as file:
+            json.dump({"summary": self.summary(),
+                       "trace": [{"start": start, "name": name, "duration": duration} for start, name, duration in self.trace]},
+                      file)
+        with open(path + ".csv", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["start", "name", "duration"])
+            writer.writerows(self.trace)
+
+    def attach_hud(self, canvas):
+        """
+        Function to give the canvas where the HUD is drawn
+
+        Args:
+            canvas (tkinter canvas): canvas of the game
+        """
+        self.canvas = canvas
+
+    def toggle_hud(self):
+        """
+        Function to show or hide the HUD, the profiler is enabled while the HUD is shown
+        """
+        if self.hud_item is None:
+            self.enable()
+            self.hud_item = self.canvas.create_text(5, 5, anchor="nw", fill="yellow", font=("Courier", 9), text="")
+        else:
+            self.canvas.delete(self.hud_item)
+            self.hud_item = None
+            self.disable()
+
+    def update_hud(self, loop_stats=None, renderer=None, every=10):
+        """
+        Function to refresh the HUD, only once every few frames to keep its cost low
+
+        Args:
+            loop_stats (LoopStats, optional): stats of the game loop to show. Defaults to None.
+            renderer (SpriteRenderer, optional): renderer whose Tcl calls per frame are shown. Defaults to None.
+            every (int, optional): number of frames between two refreshes. Defaults to 10.
+        """
+        if self.hud_item is None:
+            return
+        self.hud_frames += 1
+        if self.hud_frames % every:
+            return
+
+        # Keep the HUD in the top left corner when the canvas is scrolled by the camera
+        self.canvas.coords(self.hud_item, self.canvas.canvasx(5), self.canvas.canvasy(5))
+
+        lines = [f"canvas items {len(self.canvas.find_all())}"]
+        if loop_stats is not None:
+            stats = loop_stats.summary()
+            lines.append(f"frame {stats['frame_ms_mean']:6.2f} ms  p95 {stats['frame_ms_p95']:6.2f}  overruns {stats['overruns']}")
+            lines.append(f"tick  {stats['tick_ms_mean']:6.2f} ms  p95 {stats['tick_ms_p95']:6.2f}")
+            lines.append(f"input {stats['latency_ms_mean']:6.2f} ms  p95 {stats['latency_ms_p95']:6.2f}")
+        if renderer is not None:
+            calls = renderer.summary()
+            lines.append(f"tcl calls/frame {calls['mean_calls']:6.1f}  max {calls['max_calls']}")
+            lines.append(f"sprite items {calls['shown_items']} shown  {calls['free_items']} hidden")
+        for name, timing in sorted(self.summary().items()):
+            lines.append(f"{name:<28} {timing['mean_ms']:7.3f} ms  p95 {timing['p95_ms']:7.3f}")
+        self.canvas.itemconfig(self.hud_item, text="\n".join(lines))
+        self.canvas.tag_raise(self.hud_item)
+
+
+# Profiler shared by the whole game
+PROFILER = Profiler()
@@ -1,25 +1,48 @@
 import tkinter as tk
 import random
-from itertools import cycle
 import math
+import sys
 import json
+from game_loop import GameLoop
+from assets import ASSETS
+from render import SpriteRenderer
+from ai_scheduler import AIScheduler
+from sprites import SPRITES
+from map import Map
+from pathfinding import astar, ChaseField, NEIGHBORS, UNREACHABLE
+from world import PacmanState
+from pacman import Pacman
+
+# Steps in a row blocked by another ghost before a ghost drops its path for a new target
+MAX_BLOCKED_STEPS = 5
 
 class Ghost:
-    def __init__(self, canvas, x, y, animation_frames, all_ghosts, frame_interval=100):
+    # Fixed attributes without a per-instance dict, many ghosts take much less memory
+    __slots__ = ("canvas", "scheduler", "x", "y", "all_ghosts", "frame_interval", "animation_running",
+                 "animations", "current_image", "renderer", "rng", "ai", "current_animation", "frame", "map_",
+                 "collision_distance")
+
+    def __init__(self, canvas, x, y, animation_frames, all_ghosts, frame_interval=100, scheduler=None, renderer=None, rng=None, ai=None, animations=None, map_=None, collision_distance=50):
         self.canvas = canvas
+        self.map_ = map_  # With a map the ghost follows the corridors, without it goes straight to its targets
+        self.scheduler = scheduler if scheduler is not None else canvas  # GameLoop running the delayed actions
+        # Shared renderer flushed once per frame, or a renderer of this ghost sending its changes at once
+        self.renderer = renderer if renderer is not None else SpriteRenderer(canvas, batched=False)
+        self.rng = rng if rng is not None else random  # Seeded random.Random to replay the same moves
+        self.ai = ai  # Shared AIScheduler running the new targets within its budget, None to run them at once
         self.x = x
         self.y = y
         self.all_ghosts = all_ghosts  # Keep track of all ghosts for collision detection
+        self.collision_distance = collision_distance  # A ghost doesn't move closer than this to another ghost
         self.frame_interval = frame_interval
         self.animation_running = False  # Flag to prevent multiple timers
 
-        # Load images and store iterators for animations
-        self.animations = {
-            direction: cycle([tk.PhotoImage(file=frame) for frame in frames])
-            for direction, frames in animation_frames.items()
-        }
-        self.current_image = self.canvas.create_image(x, y, image=next(self.animations["down"]), anchor=tk.CENTER)
+        # Load images of the animations, the images are shared by all the ghosts
+        # animations gives images already made, for example the tinted variants of sprites.SPRITES
+        self.animations = animations if animations is not None else ASSETS.load_animations(animation_frames)
+        self.current_image = self.renderer.create(x, y, self.animations["down"][0], anchor=tk.CENTER)
         self.current_animation = "down"
+        self.frame = 0  # Index of the frame shown in the current animation
 
     def move(self, dx, dy, direction):
         """Move the ghost and play the animation in the given direction."""
@@ -35,19 +58,20 @@ class Ghost:
         # Move the ghost
         self.x = new_x
         self.y = new_y
-        self.canvas.move(self.current_image, dx, dy)
+        self.renderer.set(self.current_image, self.x, self.y)
 
         if not self.animation_running:
             self.animate()
 
     def animate(self):
         """Update the animation frame."""
-        frame = next(self.animations[self.current_animation])
-        self.canvas.itemconfig(self.current_image, image=frame)
+        frames = self.animations[self.current_animation]
+        self.frame = (self.frame + 1) % len(frames)
+        self.renderer.set(self.current_image, image=frames[self.frame])
 
         # Set a timer to call animate again after the interval
         self.animation_running = True
-        self.canvas.after(self.frame_interval, self.update_animation)
+        self.scheduler.after(self.frame_interval, self.update_animation)
 
     def update_animation(self):
         """Continue animation by calling animate."""
@@ -68,6 +92,12 @@ class Ghost:
 
     def move_to(self, target_x, target_y):
         """Move to the target coordinates following the x-axis first, then the y-axis."""
+        if self.map_ is not None:
+            # Follow the shortest path between the walls, tile after tile
+            path = astar(self.map_, self.map_.tile_at(self.x, self.y), self.map_.tile_at(target_x, target_y))
+            self._follow_path((path or [])[1:])  # The first tile is the one of the ghost
+            return
+
         dx = target_x - self.x
         dy = target_y - self.y
 
@@ -95,59 +125,139 @@ class Ghost:
         """Move right step by step until the x-coordinate is reached."""
         if steps > 0:
             self.move(10, 0, "right")
-            self.canvas.after(self.frame_interval, self._move_right, steps - 1, target_y)
+            self.scheduler.after(self.frame_interval, self._move_right, steps - 1, target_y)
         else:
             # Once horizontal movement is done, move vertically to target_y
-            self.canvas.after(500, self._move_vertically, target_y - self.y)
+            self.scheduler.after(500, self._move_vertically, target_y - self.y)
 
     def _move_left(self, steps, target_y):
         """Move left step by step until the x-coordinate is reached."""
         if steps > 0:
             self.move(-10, 0, "left")
-            self.canvas.after(self.frame_interval, self._move_left, steps - 1, target_y)
+            self.scheduler.after(self.frame_interval, self._move_left, steps - 1, target_y)
         else:
             # Once horizontal movement is done, move vertically to target_y
-            self.canvas.after(500, self._move_vertically, target_y - self.y)
+            self.scheduler.after(500, self._move_vertically, target_y - self.y)
 
     def _move_down(self, steps):
         """Move down step by step."""
         if steps > 0:
             self.move(0, 10, "down")
-            self.canvas.after(self.frame_interval, self._move_down, steps - 1)
+            self.scheduler.after(self.frame_interval, self._move_down, steps - 1)
         else:
-            self.canvas.after(500, self.move_to_next_random)
+            self.scheduler.after(500, self.retarget)
 
     def _move_up(self, steps):
         """Move up step by step."""
         if steps > 0:
             self.move(0, -10, "up")
-            self.canvas.after(self.frame_interval, self._move_up, steps - 1)
+            self.scheduler.after(self.frame_interval, self._move_up, steps - 1)
+        else:
+            self.scheduler.after(500, self.retarget)
+
+    def _step_to_tile(self, column, row):
+        """Do one step toward the centre of a tile, x-axis first. Return True once the centre is reached."""
+        cell_size = self.map_.cell_size
+        dx = column * cell_size + cell_size / 2 - self.x
+        dy = row * cell_size + cell_size / 2 - self.y
+        if dx:
+            self.move(max(-10, min(10, dx)), 0, "right" if dx > 0 else "left")
+        elif dy:
+            self.move(0, max(-10, min(10, dy)), "down" if dy > 0 else "up")
+        else:
+            return True
+        return False
+
+    def _follow_path(self, path, index=0, blocked=0):
+        """Walk the tiles of a path step by step, then pick a new random target."""
+        if index == len(path):
+            self.scheduler.after(500, self.retarget)
+            return
+        position = (self.x, self.y)
+        if self._step_to_tile(*path[index]):
+            index += 1
+            blocked = 0
+        elif (self.x, self.y) == position:
+            # Another ghost is in the way, two ghosts face to face would wait for each other forever
+            blocked += 1
+            if blocked >= MAX_BLOCKED_STEPS:
+                self.scheduler.after(500, self.retarget)
+                return
         else:
-            self.canvas.after(500, self.move_to_next_random)
+            blocked = 0
+        self.scheduler.after(self.frame_interval, self._follow_path, path, index, blocked)
+
+    def chase(self, field, target, blocked=0, detour=None):
+        """Go toward a target (pacman) step by step, reading the next tile from the ChaseField shared by all the ghosts."""
+        field.follow(target.x, target.y)  # Computed again only when the target changes tiles or the map is edited
+        # The next tile is read again at each step from the tile of the ghost: a ghost stopped by another one
+        # or whose way turned back doesn't have to reach the centre of its last tile first
+        tile = self.map_.tile_at(self.x, self.y)
+        goal = detour or field.next_tile(*tile) or tile
+        position = (self.x, self.y)
+        if self._step_to_tile(*goal):
+            blocked, detour = 0, None
+        elif (self.x, self.y) != position:
+            blocked = 0
+        else:
+            # Another ghost is in the way, two ghosts going to the same tile would wait for each other forever
+            blocked += 1
+            if blocked >= MAX_BLOCKED_STEPS:
+                blocked, detour = 0, self._free_neighbor(tile, goal)
+        self.scheduler.after(self.frame_interval, self.chase, field, target, blocked, detour)
+
+    def _free_neighbor(self, tile, avoid):
+        """Give a random corridor tile next to a tile without another ghost, other than avoid. None if there is none."""
+        cell_size = self.map_.cell_size
+        free = []
+        for dx, dy in NEIGHBORS:
+            column, row = tile[0] + dx, tile[1] + dy
+            if (column, row) != avoid and not self.map_.is_wall(column, row) \
+                    and not self.check_collision((column + 0.5) * cell_size, (row + 0.5) * cell_size):
+                free.append((column, row))
+        return self.rng.choice(free) if free else None
+
+    def retarget(self):
+        """Choose a new random target, when the AI scheduler has time for it."""
+        if self.ai is not None:
+            self.ai.request(self, self.move_to_next_random)
+        else:
+            self.move_to_next_random()
 
     def move_to_next_random(self):
         """Move the ghost to a random position, checking for collisions before moving."""
-        while True:
-            target_x = random.randint(10, self.canvas.winfo_width() - 10)
-            target_y = random.randint(30, self.canvas.winfo_height() - 10)
+        if self.map_ is not None:
+            # A few random corridor tiles, the search can't loop forever on a crowded map
+            for _ in range(20):
+                column, row = self.rng.randrange(self.map_.columns), self.rng.randrange(self.map_.rows)
+                cell_size = self.map_.cell_size
+                if self.map_.is_wall(column, row) or self.check_collision((column + 0.5) * cell_size, (row + 0.5) * cell_size):
+                    continue
+                path = astar(self.map_, self.map_.tile_at(self.x, self.y), (column, row))
+                if path is not None:
+                    self._follow_path(path[1:])  # The first tile is the one of the ghost
+                    return
+            self.scheduler.after(500, self.retarget)  # Try again later
+            return
+
+        # A few random positions, the search can't loop forever on a crowded canvas
+        for _ in range(20):
+            target_x = self.rng.randint(10, self.canvas.winfo_width() - 10)
+            target_y = self.rng.randint(30, self.canvas.winfo_height() - 10)
 
             # Check for collision with other ghosts
             if not self.check_collision(target_x, target_y):
-                break  # No collision, exit the loop
-
-            if self.check_alignement(target_x, target_y):
-              print("allignement")
-
-        # Move the ghost to the first location
-        self.move_to(target_x, target_y)
+                self.move_to(target_x, target_y)  # Move the ghost to the first location
+                return
+        self.scheduler.after(500, self.retarget)  # Try again later
 
     def check_collision(self, target_x, target_y):
         """Check if a position is already occupied by another ghost."""
+        limit = self.collision_distance ** 2  # Squared distances, no square root per ghost
         for ghost in self.all_ghosts:
-            if ghost != self:  # Don't check collision with itself
-                ghost_x, ghost_y = ghost.x, ghost.y
-                distance = ((target_x - ghost_x) ** 2 + (target_y - ghost_y) ** 2) ** 0.5
-                if distance < 50:  # Adjust the threshold for collision detection
+            if ghost is not self:  # Don't check collision with itself
+                dx, dy = target_x - ghost.x, target_y - ghost.y
+                if dx * dx + dy * dy < limit:
                     return True  # Collision detected
         return False
 
@@ -184,17 +294,48 @@ if __name__ == "__main__":
     canvas = tk.Canvas(root, width=root.winfo_screenwidth(), height=root.winfo_screenheight(), bg="black")
     canvas.pack()
 
+    # Single loop running the animations and the movements of all the ghosts
+    loop = GameLoop(root, tick_rate=20)
+    # Seeded generator of the spawns and the random moves, the same seed gives the same demo
+    rng = random.Random(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    # The new targets of all the ghosts share 2 ms per tick
+    ai = AIScheduler(budget_ms=2.0)
+    ai.set_view(0, 0, canvas.winfo_screenwidth(), canvas.winfo_screenheight())  # The whole canvas is on screen
+    loop.add(ai.tick)
+    # Changes of all the sprites are sent to the canvas once per frame
+    renderer = SpriteRenderer(canvas)
+
+    # The ghosts walk the corridors of the maze: random targets are reached with astar, the chase reads a shared field
+    map_ = Map(canvas)
+    pacman_state = PacmanState(375, 375)
+    pacman = Pacman(renderer, pacman_state)
+    field = ChaseField(map_)
+    root.bind("<KeyPress>", lambda event: pacman_state.turn(event.keysym))  # The arrows move pacman
+    loop.add(lambda: pacman_state.advance(map_, map_.width, map_.height))
+    loop.add_renderer(pacman.render)
+
+    # The corridors pacman can reach from its start, the ring of corridors around the maze is closed to it
+    field.follow(pacman_state.x, pacman_state.y)
+    corridors = [(column, row) for row in range(map_.rows) for column in range(map_.columns)
+                 if field.distance(column, row) != UNREACHABLE]
+
+    def random_corridor():
+        """Centre of a random corridor tile, the ghosts start in the maze."""
+        column, row = rng.choice(corridors)
+        return (column + 0.5) * map_.cell_size, (row + 0.5) * map_.cell_size
+
+    # One ghost of each color, the colors are tints of the frames of blinky
     ghosts = [
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
-        Ghost(canvas, random.randint(0, canvas.winfo_screenwidth()), random.randint(0, canvas.winfo_screenheight()),
-              animation_frames, []),
+        Ghost(canvas, *random_corridor(), animation_frames, [], scheduler=loop, renderer=renderer, rng=rng, ai=ai, map_=map_,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("blinky"))),
+        Ghost(canvas, *random_corridor(), animation_frames, [], scheduler=loop, renderer=renderer, rng=rng, ai=ai, map_=map_,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("pinky"))),
+        Ghost(canvas, *random_corridor(), animation_frames, [], scheduler=loop, renderer=renderer, rng=rng, ai=ai, map_=map_,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("inky"))),
+        Ghost(canvas, *random_corridor(), animation_frames, [], scheduler=loop, renderer=renderer, rng=rng, ai=ai, map_=map_,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("clyde"))),
+        Ghost(canvas, *random_corridor(), animation_frames, [], scheduler=loop, renderer=renderer, rng=rng, ai=ai, map_=map_,
+              animations=SPRITES.photos_of(SPRITES.ghost_variants("blinky"))),
     ]
 
     # Update the `all_ghosts` list for each ghost
@@ -206,7 +347,15 @@ if __name__ == "__main__":
         for ghost in ghosts:
             ghost.move_to_next_random()  # Start the movement sequence
 
-    # Bind the "E" key to start the random movement
+    def start_chase(event):
+        """Start chasing pacman when the "C" key is pressed, all the ghosts read the same ChaseField."""
+        for ghost in ghosts:
+            ghost.chase(field, pacman_state)
+
+    # Bind the "E" key to start the random movement and the "C" key to start the chase
     root.bind("<e>", start_random_movement)
+    root.bind("<c>", start_chase)
 
+    loop.add_renderer(renderer.flush)
+    loop.start()
     root.mainloop()
@@ -0,0 +1,170 @@
+from collections import deque
+
+
+class SpriteRenderer:
+    """
+    Class to draw the sprites with as few calls to the canvas as possible.
+
+    Each sprite keeps the position and the image last sent to the canvas. set() only records the wanted
+    state, and flush() sends the attributes that changed since the last flush, once per frame.
+    Every call to the canvas is a round-trip to Tcl, so they are counted per frame.
+
+    With a view (set_view), only the sprites inside it have a canvas item. The item of a sprite
+    leaving the view is hidden and reused by the next sprite entering it, so the number of items
+    depends on the sprites visible at once, not on the number of sprites.
+    """
+    def __init__(self, canvas, batched=True, window=300):
+        """
+        Initialisation function of the class
+
+        Args:
+            canvas (tkinter canvas): canvas of the sprites
+            batched (bool, optional): True to wait for flush(), False to send the changes at each set(). Defaults to True.
+            window (int, optional): number of frames kept for the stats. Defaults to 300.
+        """
+        self.canvas = canvas
+        self.batched = batched
+        self.view = None     # (x1, y1, x2, y2) where the sprites are drawn, None for everywhere
+        self.sprites = {}    # sprite -> [x, y, image, options] wanted
+        self.shown = {}      # sprite -> [item, x, y, image] item of a visible sprite and what was sent to it
+        self.free = {}       # options -> hidden items ready to be reused
+        self.dirty = set()   # sprites changed since the last flush
+        self.next_sprite = 1
+        self.frame_calls = 0
+        self.calls_per_frame = deque(maxlen=window)
+
+    def create(self, x, y, image, **options):
+        """
+        Function to create a sprite, its canvas item is only created if it is visible
+
+        Args:
+            x (float): x coords of the sprite
+            y (float): y coords of the sprite
+            image (tkinter image): image of the sprite
+            options: other options of create_image (anchor...)
+
+        Returns:
+            int: id of the sprite
+        """
+        sprite = self.next_sprite
+        self.next_sprite += 1
+        self.sprites[sprite] = [x, y, image, tuple(sorted(options.items()))]
+        self._draw(sprite)
+        return sprite
+
+    def delete(self, sprite):
+        """
+        Function to remove a sprite, its canvas item is kept hidden for another sprite
+
+        Args:
+            sprite (int): id of the sprite
+        """
+        options = self.sprites.pop(sprite)[3]
+        self.dirty.discard(sprite)
+        self._hide(sprite, options)
+
+    def set(self, sprite, x=None, y=None, image=None):
+        """
+        Function to record the wanted state of a sprite, the missing values are kept
+
+        Args:
+            sprite (int): id of the sprite
+            x (float, optional): new x coords. Defaults to None.
+            y (float, optional): new y coords. Defaults to None.
+            image (tkinter image, optional): new image. Defaults to None.
+        """
+        state = self.sprites[sprite]
+        if x is not None:
+            state[0] = x
+        if y is not None:
+            state[1] = y
+        if image is not None:
+            state[2] = image
+        self.dirty.add(sprite)
+        if not self.batched:
+            self._send()
+
+    def set_view(self, x1, y1, x2, y2):
+        """
+        Function to only draw the sprites inside a region, it can be given to Camera.add
+
+        Args:
+            x1 (int): left of the region
+            y1 (int): top of the region
+            x2 (int): right of the region
+            y2 (int): bottom of the region
+        """
+        self.view = (x1, y1, x2, y2)
+        self.dirty.update(self.sprites) # Every sprite may have entered or left the view
+        if not self.batched:
+            self._send()
+
+    def _hide(self, sprite, options):
+        shown = self.shown.pop(sprite, None)
+        if shown is not None:
+            self.canvas.itemconfig(shown[0], state="hidden")
+            self.free.setdefault(options, []).append(shown[0])
+            self.frame_calls += 1
+
+    def _draw(self, sprite):
+        """Function to send the state of a sprite to its item, or to hide it outside of the view"""
+        x, y, image, options = self.sprites[sprite]
+        view = self.view
+        if view is not None and not (view[0] <= x <= view[2] and view[1] <= y <= view[3]):
+            self._hide(sprite, options)
+            return
+        canvas = self.canvas
+        current = self.shown.get(sprite)
+        if current is None:
+            free = self.free.get(options)
+            if free:
+                # Reuse a hidden item rather than creating one
+                item = free.pop()
+                canvas.coords(item, x, y)
+                canvas.itemconfig(item, image=image, state="normal")
+                self.frame_calls += 2
+            else:
+                item = canvas.create_image(x, y, image=image, **dict(options))
+                self.frame_calls += 1
+            self.shown[sprite] = [item, x, y, image]
+            return
+        if x != current[1] or y != current[2]:
+            canvas.coords(current[0], x, y)
+            self.frame_calls += 1
+        if image is not current[3]:
+            canvas.itemconfig(current[0], image=image)
+            self.frame_calls += 1
+        current[1], current[2], current[3] = x, y, image
+
+    def _send(self):
+        draw = self._draw
+        for sprite in self.dirty:
+            draw(sprite)
+        self.dirty.clear()
+
+    def flush(self, alpha=None):
+        """
+        Function to send all the changes of the frame to the canvas, it ends the frame for the stats
+
+        Args:
+            alpha (float, optional): ignored, so flush can be given to GameLoop.add_renderer. Defaults to None.
+        """
+        self._send()
+        self.calls_per_frame.append(self.frame_calls)
+        self.frame_calls = 0
+
+    def summary(self):
+        """
+        Function to sum up the calls to the canvas
+
+        Returns:
+            dict: calls of the last frame, mean and max calls per frame, items shown and kept hidden
+        """
+        calls = self.calls_per_frame
+        return {
+            "last_calls": calls[-1] if calls else 0,
+            "mean_calls": sum(calls) / len(calls) if calls else 0.0,
+            "max_calls": max(calls) if calls else 0,
+            "shown_items": len(self.shown),
+            "free_items": sum(len(items) for items in self.free.values()),
+        }
@@ -0,0 +1,234 @@
+"""
+Record and replay of game sessions.
+
+A session is the options of the World (seed included) and the keys given to each tick, the World
+is deterministic so replaying them gives the same game. The log stores each key as the number of
+ticks since the previous key (a varint, 1 byte under 128 ticks) and a 1 byte code, the keysym
+strings are only written the first time they appear. The keys of a tick are flushed with it, a log
+not closed (the game was killed) still replays until its last key.
+
+Replay a log headlessly, as fast as possible:
+    python replay.py session.rec
+    python replay.py session.rec --profile profiles/replay   # export the timings of the hot paths
+    python replay.py session.rec --until 5000                # stop at a tick, to bisect a slow session
+"""
+import argparse
+import hashlib
+import json
+import struct
+import sys
+import time
+
+from map import Map
+from profiler import PROFILER
+from world import World
+
+MAGIC = b"PACREC01"
+NEW_KEY = 0xFE  # Followed by the length and the utf-8 keysym, the key takes the next code
+END = 0xFF      # The delta gives the last tick of the session
+
+
+def _write_varint(file, value):
+    while value >= 0x80:
+        file.write(bytes(((value & 0x7F) | 0x80,)))
+        value >>= 7
+    file.write(bytes((value,)))
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class Recorder:
+    """
+    Class to write the inputs of a session into a log, one tick at a time
+    """
+    def __init__(self, path, world):
+        """
+        Initialisation function of the class
+
+        Args:
+            path (str): path of the log
+            world (World): world of the session, its options and its map are written in the header
+        """
+        header = dict(world.options)
+        if world.map.level is not None:
+            header["level"] = world.map.level.path
+        else:
+            header["layout"] = world.map.layout
+            header["cell_size"] = world.map.cell_size
+        header = json.dumps(header).encode()
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.codes = {}     # keysym -> code
+        self.last_tick = 0  # Tick of the last key written
+
+    def record(self, tick, inputs):
+        """
+        Function to write the keys given to a tick, they are flushed at once so a crash doesn't lose them
+
+        Args:
+            tick (int): tick of the World receiving the keys
+            inputs (iterable): keys of the tick, in order
+        """
+        written = False
+        for keysym in inputs:
+            written = True
+            code = self.codes.get(keysym)
+            _write_varint(self.file, tick - self.last_tick)
+            self.last_tick = tick
+            if code is None:
+                if len(self.codes) >= NEW_KEY:
+                    raise ValueError(f"more than {NEW_KEY} different keys in the session")
+                code = self.codes[keysym] = len(self.codes)
+                name = keysym.encode()
+                self.file.write(bytes((NEW_KEY, len(name))) + name)
+            else:
+                self.file.write(bytes((code,)))
+        if written:
+            self.file.flush() # Only ticks with keys write, the ticks without keys cost nothing
+
+    def close(self, tick):
+        """
+        Function to end the log
+
+        Args:
+            tick (int): number of ticks of the session
+        """
+        _write_varint(self.file, tick - self.last_tick)
+        self.file.write(bytes((END,)))
+        self.file.close()
+
+
+def read_log(path):
+    """
+    Function to read a log. A log without its end (the game was killed) ends after its last whole key.
+
+    Args:
+        path (str): path of the log
+
+    Raises:
+        ValueError: the file is not a log
+
+    Returns:
+        tuple: (header, inputs, ticks), inputs maps a tick to its keys and ticks is the length of the session
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a session log")
+    (length,) = struct.unpack_from("<I", data, len(MAGIC))
+    position = len(MAGIC) + 4
+    header = json.loads(data[position:position + length])
+    position += length
+
+    keys, inputs, tick = [], {}, 0
+    while position < len(data):
+        try:
+            delta, position = _read_varint(data, position)
+            code = data[position]
+            position += 1
+            if code == NEW_KEY:
+                length = data[position]
+                name = data[position + 1:position + 1 + length]
+                if len(name) < length:
+                    break
+        except IndexError: # The last key was cut by the end of the file
+            break
+        tick += delta
+        if code == END:
+            return header, inputs, tick
+        if code == NEW_KEY:
+            keys.append(name.decode())
+            position += 1 + length
+            code = len(keys) - 1
+        inputs.setdefault(tick, []).append(keys[code])
+    # Not closed: the session lasted at least until the tick of its last key
+    return header, inputs, tick + 1 if inputs else 0
+
+
+def build_world(header):
+    """
+    Function to build the World of a recorded session, without canvas
+
+    Args:
+        header (dict): header of the log
+
+    Returns:
+        World: world in the state of the first tick of the session
+    """
+    options = dict(header)
+    if "level" in options:
+        map_ = Map.load(None, options.pop("level"))
+    else:
+        map_ = Map(None, options.pop("layout"), options.pop("cell_size"))
+    return World(map_, **options)
+
+
+def state_digest(world):
+    """
+    Function to give a short hash of the state of a World, to compare two runs
+
+    Args:
+        world (World): world to hash
+
+    Returns:
+        str: hash of the tick, pacman and the ghosts
+    """
+    pacman = world.pacman
+    digest = hashlib.sha1(struct.pack("<Qdd", world.tick, pacman.x, pacman.y))
+    flock = world.flock
+    for name in ("x", "y", "velocity_x", "velocity_y"):
+        digest.update(getattr(flock, name)[:flock.count].tobytes())
+    return digest.hexdigest()[:16]
+
+
+def replay(path, until=None):
+    """
+    Function to play a recorded session again, without display and as fast as possible
+
+    Args:
+        path (str): path of the log
+        until (int, optional): last tick to play. Defaults to the end of the session.
+
+    Returns:
+        tuple: (world, duration in seconds) at the end of the replay
+    """
+    header, inputs, ticks = read_log(path)
+    world = build_world(header)
+    if until is not None:
+        ticks = min(ticks, until)
+    step, no_input = world.step, ()
+    start = time.perf_counter()
+    for tick in range(ticks):
+        step(inputs.get(tick, no_input))
+    return world, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="session log written by the game (python app.py --record session.rec)")
+    parser.add_argument("--until", type=int, help="last tick to play")
+    parser.add_argument("--profile", help="export the timings of the hot paths to this path (.json and .csv)")
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable()
+    world, duration = replay(args.log, args.until)
+    if args.profile:
+        PROFILER.disable()
+        PROFILER.export(args.profile)
+    print(f"{world.tick} ticks in {duration:.3f} s ({world.tick / max(duration, 1e-9):,.0f} ticks/s)")
+    print(f"state {state_digest(world)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
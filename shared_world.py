@@ -0,0 +1,236 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from map import Map
+from replay import Recorder
+from world import World, DIRECTIONS
+
+DIRECTION_KEYS = tuple(DIRECTIONS) # The direction of pacman is written as its index
+# Values of a frame before the ghosts, one float each
+FRAME_FIELDS = ("time", "tick", "x", "y", "previous_x", "previous_y", "direction", "score", "ghosts")
+# Arrays of the ghosts after them, capacity floats each
+GHOST_FIELDS = ("x", "y", "previous_x", "previous_y", "direction")
+CONTROL_SIZE = 3 # Last frame published, then the sequence number of each frame
+
+
+class Frame:
+    """
+    Class to hold one state of the World read from a SharedFrames, with the names of FRAME_FIELDS
+    """
+    def __init__(self, values, capacity):
+        """
+        Initialisation function of the class
+
+        Args:
+            values (numpy array): copy of the frame
+            capacity (int): maximum number of ghosts of the frame
+        """
+        for index, name in enumerate(FRAME_FIELDS):
+            setattr(self, name, float(values[index]))
+        self.tick, self.score, self.ghosts = int(self.tick), int(self.score), int(self.ghosts)
+        self.direction = DIRECTION_KEYS[int(self.direction)]
+        arrays = values[len(FRAME_FIELDS):].reshape(len(GHOST_FIELDS), capacity)[:, :self.ghosts]
+        self.ghost = dict(zip(GHOST_FIELDS, arrays)) # name -> array of the ghosts
+
+
+class SharedFrames:
+    """
+    Class to pass the state of a World from the simulation process to the drawing process.
+
+    The shared memory holds two frames. The simulation writes the frame not published last, then
+    publishes it, so the reader always finds a complete frame and never waits for the simulation.
+    Each frame has a sequence number, odd while it is written: a reader slower than two frames
+    of the simulation sees the number change and reads the new frame instead of a torn one.
+
+    The eaten pellets are not in the frames: a byte per tile is set once and for all when the
+    pellet is eaten, so none is lost when the drawing skips frames.
+    """
+    def __init__(self, capacity, tiles, name=None):
+        """
+        Initialisation function of the class
+
+        Args:
+            capacity (int): maximum number of ghosts
+            tiles (int): number of tiles of the map
+            name (str, optional): name of the shared memory to open. Defaults to None, a new one is created.
+        """
+        self.capacity = capacity
+        self.tiles = tiles
+        self.frame_size = len(FRAME_FIELDS) + len(GHOST_FIELDS) * capacity
+        frames_offset = CONTROL_SIZE * 8
+        eaten_offset = frames_offset + 2 * self.frame_size * 8
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=eaten_offset + tiles)
+        self.name = self.memory.name
+        self.control = np.ndarray(CONTROL_SIZE, dtype=np.int64, buffer=self.memory.buf)
+        self.frames = np.ndarray((2, self.frame_size), dtype=np.float64, buffer=self.memory.buf, offset=frames_offset)
+        self.eaten = np.ndarray(tiles, dtype=np.uint8, buffer=self.memory.buf, offset=eaten_offset)
+        if name is None:
+            self.control[:] = (-1, 0, 0) # Nothing published yet
+            self.eaten[:] = 0
+
+    def write(self, world):
+        """
+        Function to publish the state of a World, run by the simulation process
+
+        Args:
+            world (World): world after its last step
+        """
+        control = self.control
+        # The eaten pellets go first, a reader seeing the score of the frame always finds them
+        for index in world.eaten:
+            self.eaten[index] = 1
+        target = 1 if control[0] == 0 else 0
+        sequence = int(control[1 + target])
+        control[1 + target] = sequence + 1 # Odd, the frame is being written
+        frame = self.frames[target]
+        pacman, flock = world.pacman, world.flock
+        n = min(flock.count, self.capacity)
+        frame[:len(FRAME_FIELDS)] = (time.perf_counter(), world.tick, pacman.x, pacman.y, pacman.previous_x,
+                                     pacman.previous_y, DIRECTION_KEYS.index(pacman.direction), world.score, n)
+        ghosts = frame[len(FRAME_FIELDS):].reshape(len(GHOST_FIELDS), self.capacity)
+        for row, name in enumerate(GHOST_FIELDS):
+            ghosts[row, :n] = getattr(flock, name)[:n]
+        control[1 + target] = sequence + 2
+        control[0] = target # Published once the whole frame is written
+
+    def read(self, attempts=3):
+        """
+        Function to read the last frame published, run by the drawing process
+
+        Args:
+            attempts (int, optional): number of frames tried while the simulation overwrites them. Defaults to 3.
+
+        Returns:
+            Frame: last frame, None if nothing is published yet or no frame could be read whole
+        """
+        control = self.control
+        for _ in range(attempts):
+            latest = int(control[0])
+            if latest < 0:
+                return None
+            sequence = int(control[1 + latest])
+            if sequence % 2:
+                continue
+            values = self.frames[latest].copy()
+            if int(control[1 + latest]) == sequence:
+                return Frame(values, self.capacity)
+        return None
+
+    def close(self):
+        """Function to release the shared memory in this process"""
+        # The numpy views hold the buffer, they are dropped before closing it
+        self.control = self.frames = self.eaten = None
+        self.memory.close()
+
+    def unlink(self):
+        """Function to free the shared memory, once every process closed it"""
+        self.memory.unlink()
+
+
+def run_simulation(options, level, record, name, capacity, tiles, inputs, stop):
+    """
+    Function to run a World at its tick rate and publish every step, the main function of the simulation process
+
+    Args:
+        options (dict): options of the World, see World.options
+        level (str): path of the level file of the map, None for the maze of map.py
+        record (str): path of a log where the session is recorded, None to not record it
+        name (str): name of the SharedFrames
+        capacity (int): maximum number of ghosts of the SharedFrames
+        tiles (int): number of tiles of the SharedFrames
+        inputs (multiprocessing.Queue): lists of keys sent by the drawing process
+        stop (multiprocessing.Event): set to end the simulation
+    """
+    map_ = Map.load(None, level) if level else Map(None)
+    world = World(map_, **options)
+    frames = SharedFrames(capacity, tiles, name)
+    recorder = Recorder(record, world) if record else None
+    period = 1 / world.tick_rate
+    next_tick = time.perf_counter()
+    try:
+        while not stop.is_set():
+            keys = []
+            while True:
+                try:
+                    keys.extend(inputs.get_nowait())
+                except queue.Empty:
+                    break
+            if recorder is not None:
+                recorder.record(world.tick, keys)
+            world.step(keys)
+            frames.write(world)
+
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -5 * period:
+                next_tick = time.perf_counter() # Too late, the missed ticks are dropped instead of run at once
+    finally:
+        if recorder is not None:
+            recorder.close(world.tick)
+        frames.close()
+
+
+class SimulationProcess:
+    """
+    Class to run the World of a game in another process.
+
+    The simulation gets a core and an interpreter of its own: a long step doesn't delay the
+    drawing, it only makes the drawing show the same frame again. The drawing process sends the
+    keys and reads the last frame published, see SharedFrames.
+    """
+    def __init__(self, world, level=None, record=None):
+        """
+        Initialisation function of the class
+
+        Args:
+            world (World): world of the game, the simulation process builds the same one from its options
+            level (str, optional): path of the level file of the map. Defaults to None, the maze of map.py.
+            record (str, optional): path of a log where the session is recorded. Defaults to None.
+        """
+        capacity, tiles = len(world.flock.x), world.map.columns * world.map.rows
+        self.frames = SharedFrames(capacity, tiles)
+        context = multiprocessing.get_context("spawn") # A fork would copy the threads of tkinter
+        self.inputs = context.Queue()
+        self.stop = context.Event()
+        self.process = context.Process(target=run_simulation, daemon=True,
+                                       args=(world.options, level, record, self.frames.name, capacity, tiles,
+                                             self.inputs, self.stop))
+
+    def start(self):
+        """Function to start the simulation"""
+        self.process.start()
+
+    def send(self, inputs):
+        """
+        Function to give keys to the simulation, they are used by its next step
+
+        Args:
+            inputs (list): keys pressed
+        """
+        if inputs:
+            self.inputs.put(list(inputs))
+
+    def read(self):
+        """
+        Function to read the last frame of the simulation
+
+        Returns:
+            Frame: last frame, None if there is none yet
+        """
+        return self.frames.read()
+
+    def close(self):
+        """
+        Function to stop the simulation and free the shared memory.
+        The simulation ends its step and closes its log before the shared memory is freed.
+        """
+        self.stop.set()
+        self.process.join()
+        self.frames.close()
+        self.frames.unlink()
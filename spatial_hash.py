@@ -0,0 +1,105 @@
+import math
+
+
+class SpatialHash:
+    """
+    Class to find the entities near a point without looking at all of them.
+
+    The plane is cut in square cells and every entity is stored in the cell under its (x, y) coords,
+    so a query only reads the cells around the point.
+    """
+    def __init__(self, cell_size):
+        """
+        Initialisation function of the class
+
+        Args:
+            cell_size (int): size of a cell in pixels, the best is the radius used by the queries
+        """
+        self.cell_size = cell_size
+        self.cells = {}         # (cell x, cell y) -> set of entities
+        self.entity_cells = {}  # entity -> (cell x, cell y)
+
+    def _key(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, entity):
+        """
+        Add an entity to the index
+
+        Args:
+            entity (object): anything with x and y attributes
+        """
+        key = self._key(entity.x, entity.y)
+        self.cells.setdefault(key, set()).add(entity)
+        self.entity_cells[entity] = key
+
+    def remove(self, entity):
+        """
+        Remove an entity from the index
+
+        Args:
+            entity (object): entity added with insert
+        """
+        key = self.entity_cells.pop(entity)
+        cell = self.cells[key]
+        cell.discard(entity)
+        if not cell:
+            del self.cells[key]
+
+    def update(self, entity):
+        """
+        Move the entity to its new cell, call it after the entity moved
+
+        Args:
+            entity (object): entity added with insert
+        """
+        key = self._key(entity.x, entity.y)
+        old_key = self.entity_cells.get(entity)
+        if key == old_key:
+            return # Still in the same cell, nothing to do
+        if old_key is not None:
+            self.remove(entity)
+        self.cells.setdefault(key, set()).add(entity)
+        self.entity_cells[entity] = key
+
+    def rebuild(self, entities):
+        """
+        Clear the index and add all the entities again
+
+        Args:
+            entities (iterable): entities to index
+        """
+        self.cells.clear()
+        self.entity_cells.clear()
+        for entity in entities:
+            self.insert(entity)
+
+    def query(self, x, y, radius):
+        """
+        Give the entities strictly closer than radius to a point
+
+        Args:
+            x (float): x coords of the point
+            y (float): y coords of the point
+            radius (float): distance of the search
+
+        Returns:
+            list: entities found
+        """
+        cell_size = self.cell_size
+        first_x, last_x = math.floor((x - radius) / cell_size), math.floor((x + radius) / cell_size)
+        first_y, last_y = math.floor((y - radius) / cell_size), math.floor((y + radius) / cell_size)
+        radius_squared = radius * radius
+
+        found = []
+        cells = self.cells
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell is None:
+                    continue
+                for entity in cell:
+                    dx, dy = entity.x - x, entity.y - y
+                    if dx * dx + dy * dy < radius_squared: # Compare the squared distances to avoid a sqrt
+                        found.append(entity)
+        return found
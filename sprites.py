@@ -0,0 +1,223 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from assets import ASSETS
+
+# Transforms of each direction of pacman, from the sprite facing right
+PACMAN_DIRECTIONS = {
+    "Right": (),
+    "Left": ("mirror",),
+    "Up": ("rotate90",),
+    "Down": ("rotate270",),
+}
+
+# Frames of the ghosts, the left frames are the right frames mirrored
+GHOST_FRAMES = {
+    "down": [("images/down_blinky_1.png", ()), ("images/down_blinky_2.png", ())],
+    "up": [("images/up_blinky_1.png", ()), ("images/up_blinky_2.png", ())],
+    "left": [("images/right_blinky_1.png", ("mirror",)), ("images/right_blinky_2.png", ("mirror",))],
+    "right": [("images/right_blinky_1.png", ()), ("images/right_blinky_2.png", ())],
+}
+
+# Body colors of the ghosts, the frames of blinky are tinted with them
+GHOST_COLORS = {
+    "blinky": None,
+    "pinky": "#ff60b0",
+    "inky": "#00f8f8",
+    "clyde": "#ffb945",
+}
+
+
+def apply_transform(image, transform):
+    """
+    Function to apply transforms to an image, in order
+
+    Args:
+        image (PIL Image): image to transform
+        transform (tuple): "mirror", "flip", "rotate90", "rotate180", "rotate270" or "tint:#rrggbb"
+
+    Returns:
+        PIL Image: new image
+    """
+    for operation in transform:
+        if operation == "mirror":
+            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        elif operation == "flip":
+            image = image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        elif operation.startswith("rotate"):
+            image = image.rotate(int(operation[len("rotate"):]), expand=True) # Counterclockwise
+        elif operation.startswith("tint:"):
+            image = tint(image, operation[len("tint:"):])
+        else:
+            raise ValueError(f"unknown transform {operation!r}")
+    return image
+
+
+def tint(image, color):
+    """
+    Function to give another color to the red body of a ghost, the shading is kept
+
+    Args:
+        image (PIL Image): frame of blinky
+        color (str): new color of the body, "#rrggbb"
+
+    Returns:
+        PIL Image: tinted frame
+    """
+    pixels = np.array(image.convert("RGBA"), dtype=np.float32)
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    body = (red > 120) & (red > 2 * green) & (red > 2 * blue)
+    target = np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)], dtype=np.float32)
+    shade = (red[body] / 234.0)[:, None] # 234 is the red of the body of blinky
+    pixels[..., :3][body] = np.clip(target[None, :] * shade, 0, 255)
+    return Image.fromarray(pixels.astype(np.uint8), "RGBA")
+
+
+class SpriteCache:
+    """
+    Class to derive the sprites from a few base images instead of a file per variant.
+
+    A variant is a base image with transforms (rotations, mirror, tint) and a size. It is made once
+    with PIL and kept in a LRU of PIL images, and on disk when a directory is given, so the next
+    startups read it instead of transforming again. The tkinter images are kept for good, tkinter
+    frees an image used by the canvas when its last reference goes.
+    """
+    def __init__(self, assets=ASSETS, capacity=256, directory=None):
+        """
+        Initialisation function of the class
+
+        Args:
+            assets (AssetManager, optional): assets decoding the base images. Defaults to ASSETS.
+            capacity (int, optional): number of variants kept in the LRU. Defaults to 256.
+            directory (str, optional): directory of the disk cache, None for no disk cache. Defaults to None.
+        """
+        self.assets = assets
+        self.capacity = capacity
+        self.directory = directory
+        self.images = OrderedDict()  # (path, transform, size) -> PIL image, the oldest first
+        self.photos = {}             # (path, transform, size) -> tkinter image
+        self.lock = threading.Lock() # The variants can be made by the loader threads
+        self.made = 0                # Variants transformed with PIL
+        self.read = 0                # Variants read from the disk cache
+
+    def _disk_path(self, path, transform, size):
+        """Path of a variant in the disk cache, the date of the base image is in the key"""
+        key = f"{path}|{os.stat(path).st_mtime_ns}|{','.join(transform)}|{size}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+    def image(self, path, transform=(), size=None):
+        """
+        Function to give a variant of a base image
+
+        Args:
+            path (str): path of the base image
+            transform (tuple, optional): transforms, see apply_transform. Defaults to ().
+            size (tuple, optional): (width, height) of the variant. Defaults to the size after the transforms.
+
+        Returns:
+            PIL Image: variant
+        """
+        transform = tuple(transform)
+        size = tuple(size) if size is not None else None
+        key = (path, transform, size)
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+
+        disk_path = self._disk_path(path, transform, size) if self.directory else None
+        if disk_path is not None and os.path.exists(disk_path):
+            image = Image.open(disk_path)
+            image.load()
+            self.read += 1
+        else:
+            with self.lock: # The AssetManager is not shared between threads without it
+                base = self.assets.load_image(path)
+            image = apply_transform(base, transform)
+            if size is not None and image.size != size:
+                image = image.resize(size, Image.Resampling.LANCZOS)
+            self.made += 1
+            if disk_path is not None:
+                os.makedirs(self.directory, exist_ok=True)
+                image.save(disk_path)
+
+        with self.lock:
+            self.images[key] = image
+            if len(self.images) > self.capacity:
+                self.images.popitem(last=False)
+        return image
+
+    def photo(self, path, transform=(), size=None):
+        """
+        Function to give the tkinter image of a variant, shared by all the sprites using it
+
+        Args:
+            path (str): path of the base image
+            transform (tuple, optional): transforms, see apply_transform. Defaults to ().
+            size (tuple, optional): (width, height) of the variant. Defaults to the size after the transforms.
+
+        Returns:
+            ImageTk.PhotoImage: tkinter image
+        """
+        key = (path, tuple(transform), tuple(size) if size is not None else None)
+        photo = self.photos.get(key)
+        if photo is None:
+            from PIL import ImageTk
+            photo = self.photos[key] = ImageTk.PhotoImage(self.image(path, transform, size))
+        return photo
+
+    def pacman_variants(self, path, size=None):
+        """
+        Function to list the variants of pacman, one per direction
+
+        Args:
+            path (str): path of pacman facing right
+            size (tuple, optional): size of the sprite facing right, the rotated ones are turned. Defaults to None.
+
+        Returns:
+            dict: direction -> (path, transform, size)
+        """
+        variants = {}
+        for direction, transform in PACMAN_DIRECTIONS.items():
+            turned = size is not None and any(operation in ("rotate90", "rotate270") for operation in transform)
+            variants[direction] = (path, transform, size[::-1] if turned else size)
+        return variants
+
+    def ghost_variants(self, name="blinky", size=None):
+        """
+        Function to list the variants of the frames of a ghost
+
+        Args:
+            name (str, optional): ghost, a key of GHOST_COLORS. Defaults to "blinky".
+            size (tuple, optional): size of the frames. Defaults to None.
+
+        Returns:
+            dict: animation -> list of (path, transform, size)
+        """
+        color = GHOST_COLORS[name]
+        extra = (f"tint:{color}",) if color else ()
+        return {animation: [(path, transform + extra, size) for path, transform in frames]
+                for animation, frames in GHOST_FRAMES.items()}
+
+    def photos_of(self, variants):
+        """
+        Function to give the tkinter images of the variants listed by pacman_variants or ghost_variants
+
+        Args:
+            variants (dict): name -> variant, or name -> list of variants
+
+        Returns:
+            dict: the same structure with tkinter images
+        """
+        return {name: [self.photo(*variant) for variant in value] if isinstance(value, list) else self.photo(*value)
+                for name, value in variants.items()}
+
+
+# Variants shared by the whole process, kept on disk between two runs
+SPRITES = SpriteCache(directory=".sprite_cache")
@@ -0,0 +1,112 @@
+"""
+Parameter sweep of the flock: many headless games run in parallel, one per set of parameters and seed.
+
+Each game runs in a worker process and gives back its metrics, which are written to the csv as soon
+as the game ends, so the results of a large sweep are never all held in memory.
+
+    python sweep.py --max-speed 5 10 15 --perception-radius 50 100 150 --seeds 0 1 2 --output sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from world import World
+
+PARAMETERS = ("max_speed", "perception_radius", "collision_distance", "ghost_count", "seed")
+METRICS = ("ticks", "ticks_per_second", "coverage", "collisions", "collisions_per_tick", "overlaps_per_tick", "catches",
+           "mean_speed")
+
+
+def simulate(parameters, ticks):
+    """
+    Function to run one headless game and measure the flock
+
+    Args:
+        parameters (dict): options of the World, the keys of PARAMETERS
+        ticks (int): number of ticks of the game
+
+    Returns:
+        dict: the parameters and the metrics of the game
+    """
+    world = World(**parameters)
+    map_, flock = world.map, world.flock
+    count, cell_size = flock.count, map_.cell_size
+    visited = np.zeros(map_.columns * map_.rows, dtype=bool)
+    speed = duration = 0.0
+    overlaps = 0
+
+    for _ in range(ticks):
+        start = time.perf_counter()
+        world.step()
+        duration += time.perf_counter() - start # Only the simulation, not the measures of the sweep
+        columns = (flock.x[:count] // cell_size).astype(np.int64)
+        rows = (flock.y[:count] // cell_size).astype(np.int64)
+        inside = (columns >= 0) & (columns < map_.columns) & (rows >= 0) & (rows < map_.rows)
+        visited[rows[inside] * map_.columns + columns[inside]] = True
+        overlaps += len(world.overlaps[0])
+        speed += float(np.hypot(flock.velocity_x[:count], flock.velocity_y[:count]).mean()) if count else 0.0
+
+    return dict(parameters,
+                ticks=ticks,
+                ticks_per_second=ticks / duration,
+                coverage=visited.mean(),                       # Fraction of the tiles visited by a ghost
+                collisions=world.collisions,
+                collisions_per_tick=world.collisions / ticks,
+                overlaps_per_tick=overlaps / ticks,            # Pairs of ghosts closer than collision_distance
+                catches=world.catches,                         # Ticks where a ghost touched pacman
+                mean_speed=speed / ticks)
+
+
+def _run(job):
+    parameters, ticks = job
+    return simulate(parameters, ticks)
+
+
+def parameter_grid(args):
+    """
+    Function to give every combination of the parameters of the command line
+
+    Returns:
+        generator: options of the World of each game
+    """
+    for values in itertools.product(args.max_speed, args.perception_radius, args.collision_distance,
+                                    args.ghosts, args.seeds):
+        yield dict(zip(PARAMETERS, values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-speed", type=float, nargs="+", default=[10])
+    parser.add_argument("--perception-radius", type=float, nargs="+", default=[100])
+    parser.add_argument("--collision-distance", type=float, nargs="+", default=[50])
+    parser.add_argument("--ghosts", type=int, nargs="+", default=[20], help="number of ghosts of each game")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--ticks", type=int, default=1000, help="ticks of each game")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes running the games")
+    parser.add_argument("--output", default="sweep.csv", help="csv file of the results")
+    args = parser.parse_args()
+
+    jobs = ((parameters, args.ticks) for parameters in parameter_grid(args))
+    total = (len(args.max_speed) * len(args.perception_radius) * len(args.collision_distance)
+             * len(args.ghosts) * len(args.seeds))
+    start = time.perf_counter()
+    with open(args.output, "w", newline="") as file, Pool(args.workers) as pool:
+        writer = csv.DictWriter(file, fieldnames=PARAMETERS + METRICS)
+        writer.writeheader()
+        # The games end in any order, each row is written as soon as its game ends
+        for done, row in enumerate(pool.imap_unordered(_run, jobs), 1):
+            writer.writerow(row)
+            file.flush()
+            print(f"\r{done}/{total} games", end="", flush=True)
+    print(f"\n{total} games in {time.perf_counter() - start:.1f} s, results in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Tests of FlockEngine against the rules of Boid.Ghost in plain Python.
+
+The engine is Jacobi: every ghost is steered and moved from the flock as it was at the start of the tick,
+where Boid.Ghost.update_velocity sees the ghosts updated before it in the same tick. reference_tick applies
+the rules of Boid.Ghost one ghost at a time with these semantics.
+
+Run from the root of the project:
+    python -m pytest tests
+"""
+import math
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_scheduler import AIScheduler
+from flock import FlockEngine
+
+TOLERANCE = 1e-9 # The engine sums the neighbors in another order, the results differ by rounding only
+
+
+def limit(vector, max_speed):
+    """Scale down a vector longer than max_speed, as Boid.Ghost does"""
+    speed = math.sqrt(vector[0] ** 2 + vector[1] ** 2)
+    if speed > max_speed:
+        vector[0] = (vector[0] / speed) * max_speed
+        vector[1] = (vector[1] / speed) * max_speed
+
+
+def reference_tick(ghosts, max_speed, perception_radius, collision_distance):
+    """
+    One tick with the rules of Boid.Ghost.update_velocity and Boid.Ghost.move, one ghost at a time,
+    every ghost seeing the ghosts as they were at the start of the tick
+
+    Args:
+        ghosts (list): [x, y, x velocity, y velocity] of each ghost, updated in place
+        max_speed (float): maximum speed of a ghost
+        perception_radius (float): radius within which other ghosts are perceived
+        collision_distance (float): a ghost doesn't move closer than this to another ghost
+    """
+    start = [tuple(ghost) for ghost in ghosts]
+    for index, (x, y, velocity_x, velocity_y) in enumerate(start):
+        alignment, center, separation = [0.0, 0.0], [0.0, 0.0], [0.0, 0.0]
+        count = close = 0
+        for other, (other_x, other_y, other_velocity_x, other_velocity_y) in enumerate(start):
+            distance = math.sqrt((x - other_x) ** 2 + (y - other_y) ** 2)
+            if other == index or distance >= perception_radius:
+                continue
+            alignment[0] += other_velocity_x
+            alignment[1] += other_velocity_y
+            center[0] += other_x
+            center[1] += other_y
+            count += 1
+            if distance < perception_radius / 2:
+                if distance > 0:
+                    separation[0] += (x - other_x) / distance
+                    separation[1] += (y - other_y) / distance
+                close += 1
+        if count:
+            alignment = [alignment[0] / count, alignment[1] / count]
+            limit(alignment, max_speed)
+            cohesion = [center[0] / count - x, center[1] / count - y]
+        else:
+            cohesion = [0.0, 0.0]
+        if close:
+            separation = [separation[0] / close, separation[1] / close]
+        velocity = [velocity_x + alignment[0] + cohesion[0] + separation[0],
+                    velocity_y + alignment[1] + cohesion[1] + separation[1]]
+        limit(velocity, max_speed)
+        ghosts[index][2:] = velocity
+
+    for index, ghost in enumerate(ghosts):
+        target_x, target_y = ghost[0] + ghost[2], ghost[1] + ghost[3]
+        if not any(other != index and (target_x - x) ** 2 + (target_y - y) ** 2 < collision_distance ** 2
+                   for other, (x, y, _, _) in enumerate(start)):
+            ghost[0], ghost[1] = target_x, target_y
+
+
+def spawn(count, seed, max_speed):
+    """Ghosts spread with the same density whatever the count (about 60x60 pixels per ghost)"""
+    rng = random.Random(seed)
+    side = math.sqrt(count) * 60
+    return [[rng.uniform(0, side), rng.uniform(0, side), rng.uniform(-max_speed, max_speed),
+             rng.uniform(-max_speed, max_speed)] for _ in range(count)]
+
+
+def make_flock(ghosts, **parameters):
+    flock = FlockEngine(**parameters)
+    for ghost in ghosts:
+        flock.add(*ghost)
+    return flock
+
+
+# 30 ghosts test all the pairs at once, 300 search the neighbors in a grid;
+# a collision distance of 95 doesn't leave the moves within the perception radius, move searches its own pairs
+@pytest.mark.parametrize("count, collision_distance", [(30, 50), (300, 50), (300, 95)])
+def test_step_matches_rules(count, collision_distance):
+    parameters = dict(max_speed=10, perception_radius=100, collision_distance=collision_distance)
+    ghosts = spawn(count, seed=count, max_speed=10)
+    flock = make_flock(ghosts, **parameters)
+    for _ in range(10):
+        reference_tick(ghosts, **parameters)
+        flock.step()
+        expected = np.array(ghosts)
+        assert np.abs(flock.x[:count] - expected[:, 0]).max() < TOLERANCE
+        assert np.abs(flock.y[:count] - expected[:, 1]).max() < TOLERANCE
+        assert np.abs(flock.velocity_x[:count] - expected[:, 2]).max() < TOLERANCE
+        assert np.abs(flock.velocity_y[:count] - expected[:, 3]).max() < TOLERANCE
+
+
+@pytest.mark.parametrize("count", [30, 300])
+def test_steer_by_chunks_matches_step(count):
+    ghosts = spawn(count, seed=1, max_speed=10)
+    stepped, scheduled = make_flock(ghosts), make_flock(ghosts)
+    scheduler = AIScheduler(budget_ms=1e6)
+    scheduler.add_flock(scheduled, chunk_size=16)
+    for _ in range(10):
+        stepped.step()
+        scheduler.tick()
+        scheduled.move()
+    for field in ("x", "y", "velocity_x", "velocity_y"):
+        assert np.abs(getattr(stepped, field)[:count] - getattr(scheduled, field)[:count]).max() < TOLERANCE
+
+
+def test_ghosts_at_the_same_place_dont_push_each_other():
+    flock = make_flock([[100.0, 100.0, 0.0, 0.0], [100.0, 100.0, 0.0, 0.0]])
+    blocked = flock.step()
+    assert blocked.all()
+    assert (flock.velocity_x[:2] == 0).all() and (flock.velocity_y[:2] == 0).all()
@@ -1,36 +1,277 @@
 from customtkinter import CTkCanvas
 from pacman import Pacman
 from map import Map
+from world import World, DIRECTIONS
+from game_loop import GameLoop
+from profiler import PROFILER
+from render import SpriteRenderer
+from camera import Camera
+from replay import Recorder
+from pellets import PelletSprites
+from loader import AssetLoader
+from maze_render import render_maze
+from assets import ASSETS
+from sprites import SPRITES
+from shared_world import SimulationProcess
+import numpy as np
+import time
 
 class Window:
     """
     Class to manage the main window
     """
-    def __init__(self, master):
+    def __init__(self, master, record=None, seed=None, level=None, tick_rate=30, split=False):
         """
         Initialisation of the class
 
         Args:
             master (tkinter): main tkinter window
+            record (str, optional): path of a log where the session is recorded, see replay.py. Defaults to None.
+            seed (int, optional): seed of the game. Defaults to a random seed.
+            level (str, optional): path of a level file, see level.py. Defaults to the maze of map.py.
+            tick_rate (int, optional): steps per second of the game (30, 60 or 120). Defaults to 30.
+            split (bool, optional): run the World in another process, the window only draws it. Defaults to False.
         """
         self.master = master
-        self.show_game()
-        
+        self.record = record
+        self.seed = seed
+        self.level = level
+        self.tick_rate = tick_rate
+        self.split = split
+        self.loop = None
+        self.recorder = None
+        self.simulation = None
+        self.master_width, self.master_height = 600, 600
+        self.master.geometry(f"{self.master_width}x{self.master_height}")
+
+        self.main_canvas = CTkCanvas(self.master, width=self.master_width, height=self.master_height, bg="black")
+        self.main_canvas.pack(fill="both", expand=True)
+        self.load()
+
+    def load(self):
+        """
+        Function to load the images and the map in background threads, with a progress bar meanwhile
+        """
+        canvas, width, height = self.main_canvas, self.master_width, self.master_height
+        self.loading_items = [
+            canvas.create_text(width / 2, height / 2 - 20, text="Loading...", fill="white"),
+            canvas.create_rectangle(width / 4, height / 2, width * 3 / 4, height / 2 + 10, outline="white"),
+            canvas.create_rectangle(width / 4, height / 2, width / 4, height / 2 + 10, fill="white", outline=""),
+        ]
+
+        self.loader = AssetLoader(self.master)
+        # The sprites listed in map.json are only known once it is parsed
+        self.loader.add(ASSETS.load_json, "map.json",
+                        then=lambda data: self.loader.add_sprites(SPRITES.pacman_variants(data["sprites"]["pacman"])))
+        self.loader.add(self.build_world, then=self.set_world)
+        self.loader.start(self.show_progress, self.show_game, self.show_error)
+
+    def build_world(self):
+        """
+        Function to build the map and the World without tkinter, run by a loader thread
+
+        Returns:
+            World: world of the game, its map is not drawn yet
+        """
+        map_ = Map.load(None, self.level) if self.level else Map(None)
+        if map_.level is None:
+            render_maze(map_) # Drawn in the cache, the tkinter image is made from it by draw_map
+        # The World runs the game on the whole map, the canvas only draws it
+        return World(map_, pacman_position=(375, 375), seed=self.seed, tick_rate=self.tick_rate)
+
+    def set_world(self, world):
+        """
+        Function to keep the World built by the loader
+
+        Args:
+            world (World): world of the game
+        """
+        self.world = world
+
+    def show_progress(self, done, total):
+        """
+        Function to draw the progress of the loading
+
+        Args:
+            done (int): number of jobs done
+            total (int): number of jobs
+        """
+        width, height = self.master_width, self.master_height
+        self.main_canvas.coords(self.loading_items[2], width / 4, height / 2,
+                                width / 4 + width / 2 * done / total, height / 2 + 10)
+
+    def show_error(self, error):
+        """
+        Function to replace the loading text by the error of a failed job, the game doesn't start
+
+        Args:
+            error (Exception): error of the job
+        """
+        self.main_canvas.itemconfigure(self.loading_items[0], text=f"Loading failed: {error}", fill="red")
+
     def show_game(self):
         """
-        Function to display the game
+        Function to display the game, once everything is loaded
         """
-        master_width, master_height = 600, 600
-        self.master.geometry(f"{master_width}x{master_height}")
+        main_canvas, master_width, master_height = self.main_canvas, self.master_width, self.master_height
+        for item in self.loading_items:
+            main_canvas.delete(item)
 
-        main_canvas = CTkCanvas(self.master, width=master_width, height=master_height, bg="black")
-        main_canvas.pack(fill="both", expand=True)
-    
         #background = Background(main_canvas, master_width, master_height)
         #background.display_background()
-        
-        map_ = Map(main_canvas)
-        
-        pacman = Pacman(main_canvas, 375, 375, map_)
 
-        self.master.bind("<KeyPress>", pacman.move)
+        map_ = self.world.map
+        map_.canvas = main_canvas
+        map_.draw_map()
+
+        if self.split:
+            # The World of this process is only a copy of the last frame of the simulation
+            self.simulation = SimulationProcess(self.world, self.level, self.record)
+            self.simulation.start()
+        elif self.record:
+            self.recorder = Recorder(self.record, self.world)
+        # A level file has no pellets
+        self.pellet_sprites = PelletSprites(main_canvas, self.world.pellets) if self.world.pellets is not None else None
+        self.pellets_version = 0 # Version of the pellets drawn, an edit of the map changes it
+        self.renderer = SpriteRenderer(main_canvas)  # Sends the changes of the sprites once per frame
+        self.pacman = Pacman(self.renderer, self.world.pacman)
+
+        # The view follows pacman, the map chunks and the sprites are only drawn around it
+        self.camera = Camera(main_canvas, master_width, master_height, map_.width, map_.height)
+        self.camera.add(map_.draw_region)
+        if self.pellet_sprites is not None:
+            self.camera.add(self.pellet_sprites.draw_region)
+        self.camera.add(self.renderer.set_view)
+        self.camera.follow(self.world.pacman.x, self.world.pacman.y)
+
+        # The keys are kept until the next tick of the game loop
+        self.pending_inputs = []
+        self.pending_turn = None # (direction, time of the key press) not taken by pacman yet
+        self.master.bind("<KeyPress>", self.on_key_press)
+
+        self.loop = GameLoop(self.master, tick_rate=self.tick_rate, frame_rate=60)
+        self.loop.add(self.update if self.simulation is None else self.send_inputs)
+        self.loop.add_renderer(self.render)
+        self.loop.start()
+
+        # F3 shows the profiler HUD, the trace of the session is exported when it is hidden
+        PROFILER.attach_hud(main_canvas)
+        self.master.bind("<F3>", self.toggle_profiler)
+
+    def toggle_profiler(self, event):
+        """
+        Function to show or hide the profiler HUD
+
+        Args:
+            event (tkinter event): use to use the keyboard
+        """
+        PROFILER.toggle_hud()
+        if not PROFILER.enabled:
+            PROFILER.export(time.strftime("profiles/session-%Y%m%d-%H%M%S"))
+
+    def on_key_press(self, event):
+        """
+        Function to keep a key pressed for the next tick
+
+        Args:
+            event (tkinter event): use to use the keyboard
+        """
+        self.pending_inputs.append(event.keysym)
+        # The latency is measured from the first press of a direction, not from the repeats of the key
+        if event.keysym in DIRECTIONS and (self.pending_turn is None or self.pending_turn[0] != event.keysym):
+            self.pending_turn = (event.keysym, time.perf_counter())
+
+    def update(self):
+        """
+        Function to advance the World by one tick with the keys pressed since the last one
+        """
+        inputs, self.pending_inputs = self.pending_inputs, []
+        if self.recorder is not None:
+            self.recorder.record(self.world.tick, inputs)
+        score = self.world.score
+        self.world.step(inputs)
+        pacman = self.world.pacman
+        if pacman.turned and self.pending_turn is not None and self.pending_turn[0] == pacman.direction:
+            self.loop.stats.latencies.append(time.perf_counter() - self.pending_turn[1])
+            self.pending_turn = None
+        for index in self.world.eaten:
+            self.pellet_sprites.remove(index)
+        if self.pellet_sprites is not None and self.world.pellets.version != self.pellets_version:
+            # The map was edited, the pellets around the view are drawn again
+            self.pellets_version = self.world.pellets.version
+            self.pellet_sprites.draw_region(*self.camera.region())
+        if self.world.score != score:
+            self.master.title(f"Pacman - {self.world.score}")
+
+    def send_inputs(self):
+        """
+        Function to send the keys pressed since the last tick to the simulation process
+        """
+        inputs, self.pending_inputs = self.pending_inputs, []
+        self.simulation.send(inputs)
+
+    def sync(self):
+        """
+        Function to copy the last frame of the simulation process into the World drawn
+
+        Returns:
+            float: fraction of tick since the frame was published, used as alpha to draw it
+        """
+        frame = self.simulation.read()
+        if frame is None:
+            return 1.0
+        world = self.world
+        if frame.tick != world.tick:
+            world.tick = frame.tick
+            pacman = world.pacman
+            pacman.x, pacman.y = frame.x, frame.y
+            pacman.previous_x, pacman.previous_y = frame.previous_x, frame.previous_y
+            pacman.direction = frame.direction
+            # Frames can be skipped, the turn is seen on the first frame drawn in the new direction
+            if self.pending_turn is not None and self.pending_turn[0] == pacman.direction:
+                self.loop.stats.latencies.append(time.perf_counter() - self.pending_turn[1])
+                self.pending_turn = None
+            flock = world.flock
+            if flock.count == frame.ghosts:
+                for name, values in frame.ghost.items():
+                    getattr(flock, name)[:frame.ghosts] = values
+            if frame.score != world.score:
+                # The pellets eaten since the last frame drawn, the pellets are only scanned when the score changed
+                pellets = world.pellets
+                for index in np.flatnonzero(self.simulation.frames.eaten & (pellets.pellets | pellets.power)):
+                    row, column = divmod(int(index), world.map.columns)
+                    pellets.eat(column, row)
+                    self.pellet_sprites.remove(int(index))
+                world.score = frame.score
+                self.master.title(f"Pacman - {world.score}")
+        return min(max((time.perf_counter() - frame.time) * self.tick_rate, 0.0), 1.0)
+
+    def close(self):
+        """
+        Function to end the session, the recorded log is closed
+        """
+        if self.loop is not None:
+            self.loop.stop()
+        if self.simulation is not None:
+            self.simulation.close() # The simulation closes its recorded log
+            self.simulation = None
+        if self.recorder is not None:
+            self.recorder.close(self.world.tick)
+            self.recorder = None
+
+    def render(self, alpha):
+        """
+        Function to draw the current state of the World
+
+        Args:
+            alpha (float): fraction of the tick between the previous and the current state
+        """
+        with PROFILER.span("Window.render"):
+            if self.simulation is not None:
+                alpha = self.sync()
+            self.pacman.render(alpha)
+            pacman = self.world.pacman # The view follows the drawn position, between two ticks
+            self.camera.follow(pacman.previous_x + (pacman.x - pacman.previous_x) * alpha,
+                               pacman.previous_y + (pacman.y - pacman.previous_y) * alpha)
+            self.renderer.flush()
+        PROFILER.update_hud(self.loop.stats, self.renderer)
@@ -0,0 +1,288 @@
+import random
+
+import numpy as np
+
+from map import Map
+from flock import FlockEngine
+from pellets import Pellets
+from profiler import PROFILER
+
+# Move of one step for each arrow key
+DIRECTIONS = {
+    "Right": (1, 0),
+    "Left": (-1, 0),
+    "Up": (0, -1),
+    "Down": (0, 1),
+}
+# Tick rate the speeds of the ghosts are given for, a faster game moves them less per step
+REFERENCE_TICK_RATE = 30
+
+
+class PacmanState:
+    """
+    Class to manage the position of pacman, without any drawing
+
+    """
+    __slots__ = ("x", "y", "previous_x", "previous_y", "speed", "direction", "next_direction", "moving", "turned")
+
+    def __init__(self, x, y, speed=10):
+        """
+        Initialisation function of the class
+
+        Args:
+            x (int): position of pacman on x
+            y (int): position of pacman on y
+            speed (float, optional): pixels moved by each step. Defaults to 10.
+        """
+        self.x = x
+        self.y = y
+        self.previous_x = x  # Position at the previous step, used to interpolate the drawing
+        self.previous_y = y
+        self.speed = speed
+        self.direction = "Right"
+        self.next_direction = None  # Direction asked by the player, taken as soon as it is free
+        self.moving = False         # Pacman goes on in its direction every step until it hits a wall
+        self.turned = False         # True if the last step took the asked direction
+
+    def move(self, keysym, map_, width, height):
+        """
+        Function to move pacman by one step
+
+        Args:
+            keysym (str): key pressed ("Right", "Left", "Up" or "Down"), the other keys don't move pacman
+            map_ (Map): map of the game, used for the collisions
+            width (int): width of the playing area
+            height (int): height of the playing area
+
+        Returns:
+            bool: True if pacman moved, False if it was blocked
+        """
+        if keysym not in DIRECTIONS:
+            return False
+
+        self.direction = keysym
+        target = self._target(keysym, map_, width, height)
+        if target is None:
+            return False
+        self.x, self.y = target
+        return True
+
+    def _target(self, keysym, map_, width, height):
+        """Position after one step in a direction (centre of the tile before the wall if one is in the way), None if blocked"""
+        dx, dy = DIRECTIONS[keysym]
+        cell_size = map_.cell_size
+        # The whole step is swept, pacman can't jump over a wall whatever its speed. The box swept is one tile
+        # long along the move, so pacman stops at the centre of the tile in front of the wall
+        new_x, new_y, hit_x, hit_y = map_.sweep(self.x, self.y, dx * self.speed, dy * self.speed,
+                                                abs(dx) * cell_size / 2, abs(dy) * cell_size / 2)
+        # The sweep stops SWEEP_GAP short of the wall: pacman is put back on the centre, on the grid of the tiles
+        if hit_x:
+            new_x = (new_x // cell_size + 0.5) * cell_size
+        if hit_y:
+            new_y = (new_y // cell_size + 0.5) * cell_size
+
+        if (new_x, new_y) != (self.x, self.y) and 1 <= new_x <= width - 1 and 1 <= new_y <= height - 1:
+            return new_x, new_y
+        return None
+
+    def turn(self, keysym):
+        """
+        Function to ask for a direction, pacman takes it at the first step where it is free
+
+        Args:
+            keysym (str): key pressed, the keys other than the arrows are ignored
+        """
+        if keysym in DIRECTIONS:
+            self.next_direction = keysym
+
+    def advance(self, map_, width, height):
+        """
+        Function to move pacman by one step in its direction, turning first if the asked direction is free
+
+        Args:
+            map_ (Map): map of the game, used for the collisions
+            width (int): width of the playing area
+            height (int): height of the playing area
+
+        Returns:
+            bool: True if pacman moved, False if it is stopped by a wall
+        """
+        self.turned = False
+        if self.next_direction is not None and self._target(self.next_direction, map_, width, height) is not None:
+            self.direction, self.next_direction = self.next_direction, None
+            self.moving = self.turned = True
+        if self.moving:
+            self.moving = self.move(self.direction, map_, width, height)
+        return self.moving
+
+
+class World:
+    """
+    Class to manage the state of a whole game without tkinter.
+
+    The game only advances with step(inputs), one fixed step at a time, so it can run
+    faster than real time and without a display. The tkinter classes only draw this state.
+    """
+    def __init__(self, map_=None, pacman_position=(375, 375), width=None, height=None, ghost_count=0, seed=None,
+                 max_speed=10, perception_radius=100, collision_distance=50, catch_distance=24, tick_rate=30,
+                 pacman_speed=300, ghost_radius=None):
+        """
+        Initialisation function of the class
+
+        Args:
+            map_ (Map, optional): map of the game. Defaults to a Map without canvas.
+            pacman_position (tuple, optional): (x, y) start of pacman. Defaults to (375, 375).
+            width (int, optional): width of the playing area. Defaults to the width of the map.
+            height (int, optional): height of the playing area. Defaults to the height of the map.
+            ghost_count (int, optional): number of ghosts spawned on the corridors. Defaults to 0.
+            seed (int, optional): seed of the random generator used to spawn the ghosts. Defaults to a random seed.
+            max_speed (int, optional): maximum speed of a ghost, in pixels per step at REFERENCE_TICK_RATE. Defaults to 10.
+            perception_radius (int, optional): radius within which ghosts "perceive" each other. Defaults to 100.
+            collision_distance (int, optional): a ghost doesn't move closer than this to another ghost. Defaults to 50.
+            catch_distance (int, optional): a ghost closer than this to pacman catches it. Defaults to 24.
+            tick_rate (int, optional): steps per second of the game (30, 60 or 120). Defaults to 30.
+            pacman_speed (int, optional): pixels per second of pacman, the step divides it by tick_rate. Defaults to 300.
+            ghost_radius (float, optional): half size of the box of a ghost stopped by the walls. Defaults to None, the ghosts go through the walls.
+        """
+        self.map = map_ if map_ is not None else Map(None)
+        self.width = width if width is not None else self.map.width
+        self.height = height if height is not None else self.map.height
+        self.tick_rate = tick_rate
+        self.pacman = PacmanState(*pacman_position, speed=pacman_speed / tick_rate)
+        # The seed is always known, so a session can be recorded and replayed exactly
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.random = random.Random(self.seed)
+        self.options = {"pacman_position": list(pacman_position), "width": width, "height": height,
+                        "ghost_count": ghost_count, "seed": self.seed, "max_speed": max_speed,
+                        "perception_radius": perception_radius, "collision_distance": collision_distance,
+                        "catch_distance": catch_distance, "tick_rate": tick_rate, "pacman_speed": pacman_speed,
+                        "ghost_radius": ghost_radius}
+        self.flock = FlockEngine(max_speed=max_speed, perception_radius=perception_radius,
+                                 collision_distance=collision_distance, capacity=max(ghost_count, 1),
+                                 time_scale=REFERENCE_TICK_RATE / tick_rate)
+        self.tick = 0
+        self.collisions = 0 # Number of times a ghost was blocked by another one
+        self.catch_distance = catch_distance
+        self.ghost_radius = ghost_radius
+        self.caught = np.zeros(0, dtype=np.intp) # Ghosts touching pacman after the last step
+        self._overlaps = None # Pairs of ghosts overlapping after the last step, found when first read
+        self.catches = 0 # Number of steps where a ghost touched pacman
+        self.score = 0
+        self.eaten = [] # Tiles (row * columns + column) of the pellets eaten during the last step
+        # Pellets on the corridors reachable by pacman, a level file is too large to fill them all
+        self.pellets = Pellets(self.map, self.map.tile_at(*pacman_position)) if self.map.level is None else None
+        self.map.add_edit_listener(self.tile_changed)
+
+        cell_size = self.map.cell_size
+        for _ in range(ghost_count):
+            column, row = self.random_corridor()
+            self.flock.add(column * cell_size + cell_size / 2, row * cell_size + cell_size / 2)
+
+    def random_corridor(self, attempts=1000):
+        """
+        Give a random corridor tile of the map that pacman can reach from its start (Pellets.reachable),
+        so no ghost is put in a part of the map closed to pacman, like the corridors around the maze.
+        Random tiles are drawn until one is such a corridor. A level file has no pellets: the tiles of a large
+        level are not all read, any of its corridors can be drawn.
+
+        Args:
+            attempts (int, optional): number of tiles drawn before giving up. Defaults to 1000.
+
+        Raises:
+            ValueError: no corridor found, the map is (almost) only walls or pacman can reach (almost) nothing
+
+        Returns:
+            tuple: (column, row) of the tile
+        """
+        reachable = self.pellets.reachable if self.pellets is not None else None
+        for _ in range(attempts):
+            column, row = self.random.randrange(self.map.columns), self.random.randrange(self.map.rows)
+            if reachable is None:
+                if not self.map.is_wall(column, row):
+                    return column, row
+            elif reachable[row * self.map.columns + column]:
+                return column, row
+        raise ValueError(f"no corridor found in {attempts} attempts")
+
+    def step(self, inputs=()):
+        """
+        Advance the game by one fixed step, pacman moves by one step in its direction
+
+        Args:
+            inputs (iterable, optional): keys pressed since the last step, the last arrow is the direction asked. Defaults to ().
+        """
+        pacman = self.pacman
+        pacman.previous_x, pacman.previous_y = pacman.x, pacman.y
+        self.eaten.clear()
+        for keysym in inputs:
+            pacman.turn(keysym)
+        if pacman.advance(self.map, self.width, self.height) and self.pellets is not None:
+            self.eat()
+        if self.flock.count:
+            self.collisions += int(np.count_nonzero(self.flock.step()))
+            if self.ghost_radius is not None:
+                self.stop_ghosts()
+            # One point against all the ghosts: a scan of squared distances is cheaper than sorting them by cell
+            self.caught = self.flock.near(self.pacman.x, self.pacman.y, self.catch_distance)
+            if len(self.caught):
+                self.catches += 1
+        self._overlaps = None
+        self.tick += 1
+
+    @property
+    def overlaps(self):
+        """
+        Pairs of ghosts closer than collision_distance after the last step, each pair once.
+        They are searched in the grid of the ghosts (FlockEngine.overlaps) the first time they are read in a step.
+
+        Returns:
+            tuple: index of the first ghosts and index of the second ghosts, the first index is the lower
+        """
+        if self._overlaps is None:
+            self._overlaps = self.flock.overlaps()
+        return self._overlaps
+
+    def stop_ghosts(self):
+        """
+        Function to sweep the move of every ghost of the last step against the walls, in one batch.
+        A ghost stopped by a wall slides along it and loses its speed across the wall.
+        """
+        flock, n = self.flock, self.flock.count
+        previous_x, previous_y = flock.previous_x[:n], flock.previous_y[:n]
+        x, y, hit_x, hit_y = self.map.sweep_many(previous_x, previous_y, flock.x[:n] - previous_x,
+                                                 flock.y[:n] - previous_y, self.ghost_radius, self.ghost_radius)
+        flock.x[:n], flock.y[:n] = x, y
+        flock.velocity_x[:n][hit_x] = 0.0
+        flock.velocity_y[:n][hit_y] = 0.0
+
+    def tile_changed(self, column, row, wall):
+        """
+        Function called by the map after an edit, the pellets follow the corridors
+
+        Args:
+            column (int): column of the tile
+            row (int): row of the tile
+            wall (bool): True if a wall was put, False if it was removed
+        """
+        if self.pellets is not None:
+            self.pellets.set_tile(column, row, wall, self.map.tile_at(self.pacman.x, self.pacman.y))
+
+    def eat(self):
+        """
+        Function to eat the pellet under pacman, if there is one
+        """
+        column, row = self.map.tile_at(self.pacman.x, self.pacman.y)
+        points = self.pellets.eat(column, row)
+        if points:
+            self.score += points
+            self.eaten.append(row * self.map.columns + column)
+
+    @property
+    def cleared(self):
+        """True when pacman ate every pellet of the map"""
+        return self.pellets is not None and self.pellets.remaining == 0
+
+
+# Hot paths timed while the profiler is enabled
+PROFILER.instrument(PacmanState, "move")
+PROFILER.instrument(World, "step")